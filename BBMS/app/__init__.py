@@ -5,12 +5,13 @@ from flask_login import LoginManager
 from flask_mail import Mail
 from flask_migrate import Migrate
 from dotenv import load_dotenv
+from app.utils.database import RoutingSession
 
 # Load environment variables
 load_dotenv()
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
 migrate = Migrate()
@@ -34,9 +35,37 @@ def create_app():
     # File upload configuration
     app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'app/static/uploads')
     app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))
+    # Content-addressed uploads and photo variants: outside the static folder, served only by views
+    app.config['STORAGE_FOLDER'] = os.getenv('STORAGE_FOLDER', os.path.join(app.instance_path, 'storage'))
+    
+    # Database engine profile (SQLite PRAGMAs, connection pool settings)
+    from app.utils.database import configure_database, register_engine_events, register_lazy_load_guard
+    configure_database(app)
     
     # Initialize extensions with app
     db.init_app(app)
+    register_engine_events(app)
+    register_lazy_load_guard(app)
+    
+    # gzip/brotli for text responses, registered first so it runs after every other after_request hook
+    from app.utils.compression import init_compression
+    init_compression(app)
+    
+    # Per-request query count, DB time and Server-Timing header
+    from app.utils.profiling import init_query_profiler
+    init_query_profiler(app)
+    
+    # Incremental per-city shortage counters and admin alerts
+    from app.utils.shortage import init_shortage_alerts
+    init_shortage_alerts(app)
+    
+    # Appointment reminders and re-eligibility notices (optional in-process scheduler)
+    from app.utils.reminders import init_reminders
+    init_reminders(app)
+    
+    # Take expired blood units out of stock (optional in-process scheduler)
+    from app.utils.inventory import init_inventory
+    init_inventory(app)
     login_manager.init_app(app)
     mail.init_app(app)
     migrate.init_app(app, db)
@@ -49,6 +78,24 @@ def create_app():
     # Create upload directory if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    # Profile photo variants and the photo_url template helper
+    from app.utils.photos import init_photos
+    init_photos(app)
+    
+    # Content-addressed upload storage and its unreferenced-file sweeper
+    from app.utils.storage import init_storage
+    init_storage(app)
+    
+    # Fingerprinted, precompressed static assets and the asset_url template helper
+    from app.utils.assets import init_assets
+    init_assets(app)
+    
+    # Shared app cache and per-user {% cache %} template fragments
+    from app.utils.cache import init_cache
+    from app.utils.fragments import init_fragment_cache
+    init_cache(app)
+    init_fragment_cache(app)
+    
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.donor import donor_bp
@@ -72,76 +119,16 @@ def create_app():
     from app.error_handlers import register_error_handlers
     register_error_handlers(app)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        
-        # Create admin user if not exists
-        from app.models.user import User
-        from app.models.admin import Admin
-        from werkzeug.security import generate_password_hash
-        
-        admin_email = os.getenv('ADMIN_EMAIL', 'admin@bbms.com')
-        admin_user = User.query.filter_by(email=admin_email).first()
-        
-        if not admin_user:
-            admin_user = User(
-                name='Admin',
-                email=admin_email,
-                password_hash=generate_password_hash(os.getenv('ADMIN_PASSWORD', 'admin123')),
-                role='admin',
-                is_verified=True
-            )
-            db.session.add(admin_user)
-            db.session.commit()
-            
-            admin = Admin(user_id=admin_user.id)
-            db.session.add(admin)
-            db.session.commit()
-    
-    # Register CLI commands
-    @app.cli.command('clear-db')
-    def clear_database():
-        """Clear all data from the database"""
-        with app.app_context():
-            from app.models.user import User
-            from app.models.donor import Donor
-            from app.models.hospital import Hospital
-            from app.models.admin import Admin
-            from app.models.common import Appointment, BloodRequest, Notification
-            
-            print("🗑️  Clearing database...")
-            
-            try:
-                # Delete in order to avoid foreign key constraints
-                Notification.query.delete()
-                print("✅ Cleared notifications")
-                
-                BloodRequest.query.delete()
-                print("✅ Cleared blood requests")
-                
-                Appointment.query.delete()
-                print("✅ Cleared appointments")
-                
-                Donor.query.delete()
-                print("✅ Cleared donors")
-                
-                Hospital.query.delete()
-                print("✅ Cleared hospitals")
-                
-                Admin.query.delete()
-                print("✅ Cleared admins")
-                
-                # Delete all users except admin
-                User.query.filter(User.role != 'admin').delete()
-                print("✅ Cleared regular users")
-                
-                # Commit the changes
-                db.session.commit()
-                print("✅ Database cleared successfully!")
-                
-            except Exception as e:
-                print(f"❌ Error clearing database: {e}")
-                db.session.rollback()
+    # Keep the full-text search index in sync with model writes
+    from app.utils.search import register_search_events
+    register_search_events()
+    
+    # Shared Jinja bytecode cache and template precompilation
+    from app.utils.templates import init_templates
+    init_templates(app)
+    
+    # Register CLI commands (schema and admin seeding live in `flask bootstrap`)
+    from app.cli import register_cli_commands
+    register_cli_commands(app)
     
     return app 
\ No newline at end of file
@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify, request
+from datetime import datetime, timedelta
 from app.utils.helpers import get_cities, get_hospitals_by_city
+from app.utils.slots import get_available_slots
 
 api_bp = Blueprint('api', __name__)
 
@@ -25,6 +27,26 @@ def hospitals_by_city(city):
     
     return jsonify({'hospitals': hospital_list})
 
+@api_bp.route('/hospitals/<int:hospital_id>/slots')
+def available_slots(hospital_id):
+    """Get a hospital's free donation slots between two dates (at most 31 days)"""
+    try:
+        start = datetime.strptime(request.args.get('start', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d')
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if 'end' in request.args \
+            else start + timedelta(days=7)
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    end = min(end, start + timedelta(days=31))
+    
+    slots = get_available_slots(hospital_id, start, end)
+    return jsonify({'slots': [{
+        'id': slot.id,
+        'start': slot.slot_start.isoformat(timespec='minutes'),
+        'end': slot.slot_end.isoformat(timespec='minutes'),
+        'capacity': slot.capacity,
+        'remaining': slot.remaining
+    } for slot in slots]})
+
 @api_bp.route('/search/cities')
 def search_cities():
     """Search cities with query parameter"""
@@ -1,10 +1,11 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from app import db
 from app.models.donor import Donor
 from app.models.hospital import Hospital
 from app.models.common import BloodTransfusionRequest, DonationAppointment, BloodDonationRecord
 from app.utils.helpers import role_required
+from app.utils.database import use_read_replica
 from datetime import datetime, timedelta
 
 stats_bp = Blueprint('stats', __name__)
@@ -12,6 +13,7 @@ stats_bp = Blueprint('stats', __name__)
 @stats_bp.route('/inventory')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def inventory():
     """Get blood inventory statistics"""
     blood_groups = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
@@ -45,6 +47,7 @@ def inventory():
 @stats_bp.route('/requests')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def requests():
     """Get request statistics"""
     # Request status counts
@@ -93,6 +96,7 @@ def requests():
 @stats_bp.route('/donations')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def donations():
     """Get donation statistics"""
     # Total donations by blood group
@@ -134,6 +138,7 @@ def donations():
 @stats_bp.route('/city-stats')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def city_stats():
     """Get city-wise statistics"""
     # Donors by city
@@ -163,6 +168,7 @@ def city_stats():
 @stats_bp.route('/user-activity')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def user_activity():
     """Get user activity statistics"""
     # Recent registrations (last 30 days)
@@ -196,4 +202,19 @@ def user_activity():
             'donors': active_donors,
             'hospitals': active_hospitals
         }
-    }) 
\ No newline at end of file
+    })
+
+@stats_bp.route('/forecast')
+@login_required
+@role_required(['admin'])
+@use_read_replica
+def forecast():
+    """Get projected blood shortfall per blood group and city"""
+    from app.utils.forecast import get_forecast
+    
+    window = min(max(request.args.get('window', 28, type=int), 1), 365)
+    horizon = min(max(request.args.get('horizon', 14, type=int), 1), 90)
+    history = min(max(request.args.get('history', 365, type=int), window), 5 * 365)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    
+    return jsonify(get_forecast(window=window, horizon=horizon, history=history, limit=limit))
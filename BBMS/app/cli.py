@@ -0,0 +1,418 @@
+import click
+from app import db
+
+def register_cli_commands(app):
+    """Register maintenance CLI commands for the application"""
+
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """Create the database schema and the admin account; run once per deploy, not per worker"""
+        from app.utils.bootstrap import create_schema, seed_admin
+
+        created = create_schema()
+        if created:
+            print(f"✅ Created {len(created)} tables")
+        else:
+            print("✅ Schema already exists; run `flask db upgrade` to apply new migrations")
+        if seed_admin():
+            print("✅ Created the admin account")
+        else:
+            print("✅ Admin account already exists")
+
+    @app.cli.command('clear-db')
+    def clear_database():
+        """Clear all data from the database except admin accounts"""
+        from datetime import datetime
+        from app.models.user import User
+        from app.models.donor import Donor
+        from app.models.hospital import Hospital
+        from app.models.common import (BloodDonationRecord, BloodTransfusionRequest, BloodUnit, DonationAppointment,
+                                       DonationSlot, Feedback, Notification, Recipient, Reservation, StoredFile)
+        from app.utils.search import rebuild_search_index
+        from app.utils.shortage import rebuild_shortage_counters
+
+        print("🗑️  Clearing database...")
+
+        # Children before parents, so foreign keys never point at deleted rows
+        tables = [
+            (Notification, "notifications"),
+            (Feedback, "feedback"),
+            (Reservation, "reservations"),
+            (BloodUnit, "blood units"),
+            (BloodTransfusionRequest, "blood requests"),
+            (Recipient, "recipients"),
+            (BloodDonationRecord, "donation records"),
+            (DonationAppointment, "appointments"),
+            (DonationSlot, "donation slots"),
+            (Donor, "donors"),
+            (Hospital, "hospitals")
+        ]
+        try:
+            for model, label in tables:
+                model.query.delete()
+                print(f"✅ Cleared {label}")
+
+            # Delete all users except admin
+            User.query.filter(User.role != 'admin').delete()
+            print("✅ Cleared regular users")
+
+            # Bulk deletes skip the photo release hook; nothing references a stored file any more
+            StoredFile.query.update({'ref_count': 0, 'updated_at': datetime.utcnow()})
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Error clearing database: {e}")
+            db.session.rollback()
+            return
+
+        rebuild_search_index()
+        rebuild_shortage_counters()
+        print("✅ Database cleared successfully!")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the full-text search index from the database"""
+        from app.utils.search import rebuild_search_index
+        rebuild_search_index()
+        print("✅ Search index rebuilt successfully!")
+
+    @app.cli.command('expire-units')
+    def expire_units_command():
+        """Mark out-of-date blood units expired and take them out of stock"""
+        from app.utils.inventory import run_expiry_sweep
+        print(f"✅ Expired {run_expiry_sweep()} blood units")
+
+    @app.cli.command('rebuild-shortage-counters')
+    def rebuild_shortage_counters_command():
+        """Recompute shortage counters from requests and blood units"""
+        from app.utils.inventory import run_expiry_sweep
+        from app.utils.shortage import rebuild_shortage_counters
+        # Expire first, so the stock counters drop the same units the shortage counters do
+        run_expiry_sweep()
+        count = rebuild_shortage_counters()
+        print(f"✅ Rebuilt shortage counters for {count} blood group/city pairs")
+
+    @app.cli.command('run-reminders')
+    @click.option('--no-email', is_flag=True, help='Only create in-app notifications.')
+    def run_reminders_command(no_email):
+        """Send due appointment reminders and re-eligibility notices"""
+        from app.utils.reminders import run_reminders
+
+        counts = run_reminders(email=False if no_email else None)
+        print(f"✅ Sent {counts['appointment_reminders']} appointment reminders and "
+              f"{counts['eligibility_notices']} re-eligibility notices")
+
+    @app.cli.command('process-photos')
+    def process_photos_command():
+        """Move photos uploaded before variants existed into storage and build their variants"""
+        import os
+        from werkzeug.datastructures import FileStorage
+        from app.models.donor import Donor
+        from app.utils.photos import process_donor_photo
+        from app.utils.storage import store_upload
+
+        legacy = [(donor.id, donor.photo) for donor in Donor.query.filter(Donor.photo.like('%.%'))]
+        processed = 0
+        for donor_id, photo in legacy:
+            path = os.path.join(app.config['UPLOAD_FOLDER'], photo)
+            if not os.path.exists(path):
+                print(f"⚠️  Missing upload for donor {donor_id}: {photo}")
+                continue
+            with open(path, 'rb') as stream:
+                sha256, blob = store_upload(FileStorage(stream, filename=photo))
+            db.session.commit()
+            if process_donor_photo(app, donor_id, sha256, blob):
+                processed += 1
+        print(f"✅ Processed {processed} of {len(legacy)} legacy photos")
+
+    @app.cli.command('move-uploads')
+    def move_uploads_command():
+        """Move stored uploads and photo variants out of the public static folder"""
+        from app.utils.storage import move_public_uploads
+
+        print(f"✅ Moved {move_public_uploads()} files to {app.config['STORAGE_FOLDER']}")
+
+    @app.cli.command('clear-cache')
+    def clear_cache_command():
+        """Empty the app cache, including every cached template fragment"""
+        from app.utils.cache import get_cache
+        print(f"✅ Removed {get_cache().clear()} cache entries")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint static files, precompress them and write the asset manifest"""
+        from app.utils.assets import brotli, build_assets
+
+        built = build_assets(app)
+        for filename, fingerprinted, sizes in built:
+            compressed = ''.join(f", {name} {sizes[name] / 1024:.1f} KB" for name in ('gzip', 'br') if name in sizes)
+            print(f"  {filename} -> {fingerprinted} ({sizes['raw'] / 1024:.1f} KB{compressed})")
+        if brotli is None:
+            print("⚠️  brotli is not installed; only gzip copies were written")
+        print(f"✅ Built {len(built)} assets; restart the app to serve them")
+
+    @app.cli.command('sweep-uploads')
+    @click.option('--grace-minutes', type=int, default=None,
+                  help='Keep unreferenced files younger than this (default STORAGE_SWEEP_GRACE_MINUTES).')
+    def sweep_uploads_command(grace_minutes):
+        """Delete stored uploads no longer referenced by any record"""
+        from app.utils.storage import sweep_unreferenced_files
+
+        files, freed = sweep_unreferenced_files(grace_minutes)
+        print(f"✅ Removed {files} unreferenced files, freeing {freed / 1024:.0f} KB")
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help='Print the full plan of every query.')
+    def check_query_plans_command(verbose):
+        """Fail if any hot query falls back to a full table scan (SQLite only)"""
+        from app.utils.query_plans import check_query_plans
+
+        if db.engine.dialect.name != 'sqlite':
+            print("⚠️  Query plan checks only run against SQLite.")
+            return
+
+        failures = 0
+        for result in check_query_plans():
+            if result['table_scans']:
+                failures += 1
+                print(f"❌ {result['name']}: full scan of {', '.join(result['table_scans'])}")
+            else:
+                print(f"✅ {result['name']}")
+            if verbose or result['table_scans']:
+                for line in result['plan']:
+                    print(f"      {line}")
+
+        if failures:
+            print(f"❌ {failures} hot queries regressed to a table scan")
+            raise SystemExit(1)
+        print("✅ All hot queries use an index")
+
+    @app.cli.command('bench-db-writes')
+    @click.option('--workers', '-w', multiple=True, type=int, default=(1, 4, 8),
+                  help='Number of concurrent writer processes (repeatable).')
+    @click.option('--writes', default=500, show_default=True, help='Committed writes per worker.')
+    def bench_db_writes_command(workers, writes):
+        """Benchmark concurrent commit throughput with the current engine profile"""
+        from app.utils.benchmarks import benchmark_concurrent_writes
+
+        if db.engine.dialect.name == 'sqlite':
+            print(f"SQLite profile: journal_mode={app.config['SQLITE_JOURNAL_MODE']} "
+                  f"synchronous={app.config['SQLITE_SYNCHRONOUS']} "
+                  f"busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}ms")
+        else:
+            print(f"Pool: size={app.config['DB_POOL_SIZE']} overflow={app.config['DB_MAX_OVERFLOW']}")
+
+        print(f"{'workers':>8} {'writes':>8} {'errors':>7} {'seconds':>8} {'writes/s':>10}")
+        for count in workers:
+            result = benchmark_concurrent_writes(app, count, writes)
+            print(f"{result['workers']:>8} {result['committed']:>8} {result['errors']:>7} "
+                  f"{result['seconds']:>8.2f} {result['writes_per_second']:>10.0f}")
+
+    @app.cli.command('bench-workflows')
+    @click.option('--workers', '-w', multiple=True, type=int, default=(1, 4, 8),
+                  help='Number of concurrent hospital worker processes (repeatable).')
+    @click.option('--appointments', default=100, show_default=True,
+                  help='Appointments each worker confirms and completes.')
+    def bench_workflows_command(workers, appointments):
+        """Benchmark appointment workflow throughput under concurrent hospitals"""
+        from app.utils.benchmarks import benchmark_workflows
+
+        print(f"{'workers':>8} {'ops':>7} {'errors':>7} {'seconds':>8} {'ops/s':>8} {'commits/op':>11}")
+        for count in workers:
+            result = benchmark_workflows(app, count, appointments)
+            print(f"{result['workers']:>8} {result['operations']:>7} {result['errors']:>7} "
+                  f"{result['seconds']:>8.2f} {result['operations_per_second']:>8.0f} "
+                  f"{result['commits_per_operation']:>11.2f}")
+
+    @app.cli.command('bench-forecast')
+    @click.option('--years', default=5, show_default=True, help='Years of daily history.')
+    @click.option('--blood-groups', default=8, show_default=True, help='Blood groups.')
+    @click.option('--cities', default=200, show_default=True, help='Cities per blood group.')
+    def bench_forecast_command(years, blood_groups, cities):
+        """Benchmark the demand forecast on synthetic history"""
+        from app.utils.benchmarks import benchmark_forecast
+
+        result = benchmark_forecast(years, blood_groups, cities)
+        print(f"{result['series']} series x {result['days']} days: {result['seconds'] * 1000:.1f} ms")
+        if result['seconds'] >= 1:
+            print("❌ Forecast took longer than a second")
+            raise SystemExit(1)
+        print("✅ Forecast finished in under a second")
+
+    @app.cli.command('bench-reminders')
+    @click.option('--donors', default=1000000, show_default=True, help='Donors to seed.')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Notifications per transaction.')
+    def bench_reminders_command(donors, chunk_size):
+        """Benchmark a reminder run over a large donor base"""
+        from app.utils.benchmarks import benchmark_reminders
+
+        result = benchmark_reminders(app, donors, chunk_size)
+        print(f"Seeded {result['donors']} donors in {result['seed_seconds']:.1f}s")
+        for label, run in (('first run', result['first']), ('rerun', result['rerun'])):
+            print(f"  {label:<9}: {run['reminders']} reminders, {run['notices']} notices "
+                  f"in {run['seconds']:.2f}s")
+
+        if result['rerun']['reminders'] or result['rerun']['notices']:
+            print("❌ Rerun sent duplicate notifications")
+            raise SystemExit(1)
+        print("✅ Rerun sent nothing new")
+
+    @app.cli.command('bench-photos')
+    @click.option('--width', default=4000, show_default=True, help='Source photo width in pixels.')
+    @click.option('--height', default=3000, show_default=True, help='Source photo height in pixels.')
+    def bench_photos_command(width, height):
+        """Benchmark photo variant generation and the bytes each page saves"""
+        from app.utils.benchmarks import benchmark_photo_variants
+
+        result = benchmark_photo_variants(width, height)
+        print(f"{result['width']}x{result['height']} source: {result['source_bytes'] / 1024:.0f} KB, "
+              f"all variants built in {result['seconds'] * 1000:.0f}ms")
+        for (size_name, fmt), size in result['variants'].items():
+            print(f"  {size_name:<7} {fmt:<5} {size / 1024:>8.1f} KB  "
+                  f"({result['source_bytes'] / size:.0f}x smaller)")
+
+    @app.cli.command('bench-compression')
+    @click.option('--path', 'paths', multiple=True,
+                  default=('/api/stats/inventory', '/api/stats/requests', '/api/stats/city-stats',
+                           '/admin/export-data?type=donors'),
+                  show_default=True, help='Page to fetch (repeatable); use --email for role pages.')
+    @click.option('--email', default=None, help='User to fetch pages as (default: the first admin).')
+    @click.option('--repeat', default=20, show_default=True, help='Compressions timed per response.')
+    def bench_compression_command(paths, email, repeat):
+        """Benchmark bytes saved and CPU spent compressing typical responses"""
+        from app.utils.benchmarks import benchmark_compression
+
+        for row in benchmark_compression(app, paths, email, repeat):
+            if row['status'] != 200:
+                print(f"⚠️  {row['path']}: HTTP {row['status']}, skipped")
+                continue
+            print(f"{row['path']} ({row['mimetype']}, {row['raw'] / 1024:.1f} KB)"
+                  f"{'' if row['compressed'] else ' - sent uncompressed'}")
+            for encoding, result in row['encodings'].items():
+                print(f"  {encoding:<5} {result['bytes'] / 1024:>7.1f} KB  "
+                      f"saves {1 - result['bytes'] / max(row['raw'], 1):>4.0%}  "
+                      f"{result['cpu_ms']:.2f} ms CPU")
+
+    @app.cli.command('bench-template-startup')
+    @click.option('--path', 'paths', multiple=True, default=('/', '/auth/login', '/auth/register'),
+                  show_default=True, help='Page to request after boot (repeatable).')
+    @click.option('--email', default=None, help='User to request pages as (default: anonymous).')
+    def bench_template_startup_command(paths, email):
+        """Benchmark a restarted worker's first requests with and without template caching"""
+        from app.utils.benchmarks import benchmark_template_startup
+
+        print(f"{'scenario':<31} {'boot':>8} {'first request':>14} {'second':>8}  (ms, mean per path)")
+        for label, boot, first, second in benchmark_template_startup(app, paths, email):
+            print(f"{label:<31} {boot * 1000:>8.0f} {sum(first) * 1000 / len(first):>14.1f} "
+                  f"{sum(second) * 1000 / len(second):>8.1f}")
+
+    @app.cli.command('bench-startup')
+    @click.option('--workers', default=5, show_default=True, help='Worker processes to start, one after another.')
+    @click.option('--path', default='/', show_default=True, help='Page each worker serves first.')
+    @click.option('--bootstrap', is_flag=True,
+                  help='Also create the schema and admin account in every worker, as create_app used to.')
+    def bench_startup_command(workers, path, bootstrap):
+        """Benchmark import plus app factory time of freshly started workers"""
+        from app.utils.benchmarks import benchmark_startup
+
+        results = benchmark_startup(app, workers, path, bootstrap)
+        print(f"{'worker':<7} {'import':>8} {'factory':>8} {'total':>8} {'first request':>14}  (ms)")
+        for number, row in enumerate(results, 1):
+            print(f"{number:<7} {row['import'] * 1000:>8.0f} {row['factory'] * 1000:>8.0f} "
+                  f"{(row['import'] + row['factory']) * 1000:>8.0f} {row['first_request'] * 1000:>14.1f}")
+        mean = {key: sum(row[key] for row in results) * 1000 / len(results)
+                for key in ('import', 'factory', 'first_request')}
+        print(f"{'mean':<7} {mean['import']:>8.0f} {mean['factory']:>8.0f} "
+              f"{mean['import'] + mean['factory']:>8.0f} {mean['first_request']:>14.1f}")
+        if results[-1]['status'] != 200:
+            print(f"⚠️  {path} answered HTTP {results[-1]['status']}")
+        if results[-1]['heavy_modules']:
+            print(f"⚠️  Loaded by the first request: {', '.join(results[-1]['heavy_modules'])}")
+
+    @app.cli.command('stress-reservations')
+    @click.option('--approvers', default=16, show_default=True, help='Concurrent approver processes.')
+    @click.option('--stock', default=50, show_default=True, help='Units in stock before approvals start.')
+    @click.option('--requests', 'requests_per_approver', default=5, show_default=True,
+                  help='One-unit requests each approver tries to approve.')
+    def stress_reservations_command(approvers, stock, requests_per_approver):
+        """Check that concurrent approvals never reserve more units than exist"""
+        from app.utils.benchmarks import stress_reservations
+
+        result = stress_reservations(app, approvers, stock, requests_per_approver)
+        print(f"{result['approvers']} approvers, {result['requests']} requests for {result['stock']} units "
+              f"in {result['seconds']:.2f}s")
+        print(f"  approved={result['approved']} insufficient={result['insufficient']} "
+              f"gave up after retries={result['conflicts']}")
+        print(f"  reserved={result['reserved']:g} allocated_units={result['allocated_units']} "
+              f"inventory available={result['available_units']:g} reserved={result['reserved_units']:g}")
+
+        if result['over_allocated']:
+            print("❌ Stock was over-allocated")
+            raise SystemExit(1)
+        print("✅ No over-allocation")
+
+    @app.cli.command('stress-slot-booking')
+    @click.option('--donors', default=32, show_default=True, help='Donor processes booking the same slot at once.')
+    @click.option('--capacity', default=10, show_default=True, help='Places in the contested slot.')
+    def stress_slot_booking_command(donors, capacity):
+        """Check that concurrent bookings never overfill a slot"""
+        from app.utils.benchmarks import stress_slot_booking
+
+        result = stress_slot_booking(app, donors, capacity)
+        print(f"{result['donors']} donors for {result['capacity']} places: booked={result['booked']} "
+              f"full={result['full']} gave up after retries={result['conflict']} "
+              f"slowest={result['slowest'] * 1000:.0f}ms")
+        print(f"  slot counter={result['slot_booked']} appointments={result['appointments']}")
+
+        if result['overbooked']:
+            print("❌ Slot was overbooked")
+            raise SystemExit(1)
+        print("✅ No overbooking")
+
+    @app.cli.command('stress-duplicate-booking')
+    @click.option('--submissions', default=16, show_default=True, help='Simultaneous bookings for one donor.')
+    def stress_duplicate_booking_command(submissions):
+        """Check that parallel submissions leave a donor exactly one booking"""
+        from app.utils.benchmarks import stress_duplicate_booking
+
+        result = stress_duplicate_booking(app, submissions)
+        print(f"{result['submissions']} submissions: booked={result['booked']} duplicate={result['duplicate']} "
+              f"gave up after retries={result['conflict']} retried={result['retried']} "
+              f"slowest={result['slowest'] * 1000:.0f}ms")
+        print(f"  active appointments for the donor={result['active']}")
+
+        if result['booked'] != 1 or result['active'] != 1:
+            print("❌ Expected exactly one booking to win")
+            raise SystemExit(1)
+        print("✅ Exactly one booking won")
+
+    @app.cli.command('query-report')
+    @click.option('--log', 'log_path', default=None, help='Slow-query log to read (defaults to SLOW_QUERY_LOG).')
+    @click.option('--top', default=10, show_default=True, help='Number of fingerprints to show.')
+    @click.option('--sort', 'sort_by', type=click.Choice(['total', 'count', 'p95']), default='total',
+                  show_default=True, help='Rank fingerprints by total time, count or p95 latency.')
+    def query_report_command(log_path, top, sort_by):
+        """Summarise the slow-query log by normalized query fingerprint"""
+        from app.utils.profiling import build_query_report
+
+        log_path = log_path or app.config['SLOW_QUERY_LOG']
+        if not log_path:
+            print("❌ SLOW_QUERY_LOG is not set; slow queries are going to the app log")
+            raise SystemExit(1)
+        try:
+            with open(log_path) as log_file:
+                report = build_query_report(log_file, sort_by=sort_by, top=top)
+        except FileNotFoundError:
+            print(f"❌ No slow-query log at {log_path}")
+            raise SystemExit(1)
+
+        if not report:
+            print("✅ No slow queries logged")
+            return
+
+        print(f"{'fingerprint':<13} {'count':>7} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9}  endpoints")
+        for row in report:
+            endpoints = ', '.join(f'{name} ({count})' for name, count in
+                                  sorted(row['endpoints'].items(), key=lambda item: item[1], reverse=True)[:3])
+            print(f"{row['fingerprint']:<13} {row['count']:>7} {row['total_ms']:>10.1f} "
+                  f"{row['mean_ms']:>9.1f} {row['p95_ms']:>9.1f}  {endpoints}")
+            print(f"    {row['statement'][:160]}")
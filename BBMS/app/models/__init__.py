@@ -1 +1,5 @@
-# Models package 
\ No newline at end of file
+# Models package
+
+# Import every model so relationships declared by class name (e.g. User.admin) resolve
+# no matter which model module a caller imports first
+from app.models import admin, common, donor, hospital, user  # noqa: F401
@@ -3,6 +3,9 @@ from app import db
 
 class Admin(db.Model):
     __tablename__ = 'admins'
+    __table_args__ = (
+        db.Index('ix_admins_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
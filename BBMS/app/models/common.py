@@ -3,6 +3,10 @@ from app import db
 
 class OTPVerification(db.Model):
     __tablename__ = 'otp_verifications'
+    __table_args__ = (
+        db.Index('ix_otp_verifications_email_type_is_used', 'email', 'type', 'is_used'),
+        db.Index('ix_otp_verifications_expires_at', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), nullable=False)
@@ -15,15 +19,54 @@ class OTPVerification(db.Model):
     def __repr__(self):
         return f'<OTPVerification {self.email}>'
 
+class DonationSlot(db.Model):
+    __tablename__ = 'donation_slots'
+    __table_args__ = (
+        db.Index('ix_donation_slots_hospital_id_slot_start', 'hospital_id', 'slot_start', unique=True),
+        db.CheckConstraint('booked >= 0 AND booked <= capacity', name='ck_donation_slots_booked'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
+    slot_start = db.Column(db.DateTime, nullable=False)
+    slot_end = db.Column(db.DateTime, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    hospital = db.relationship('Hospital', backref=db.backref('slots', lazy='dynamic', cascade='all, delete-orphan'))
+    
+    @property
+    def remaining(self):
+        return self.capacity - self.booked
+    
+    def __repr__(self):
+        return f'<DonationSlot {self.hospital_id} {self.slot_start} - {self.booked}/{self.capacity}>'
+
 class DonationAppointment(db.Model):
     __tablename__ = 'donation_appointments'
+    __table_args__ = (
+        db.Index('ix_donation_appointments_donor_id_status_date', 'donor_id', 'status', 'appointment_date'),
+        db.Index('ix_donation_appointments_hospital_id_status_date', 'hospital_id', 'status', 'appointment_date'),
+        db.Index('ix_donation_appointments_hospital_id_date', 'hospital_id', 'appointment_date'),
+        db.Index('ix_donation_appointments_status_date', 'status', 'appointment_date'),
+        db.Index('ix_donation_appointments_created_at', 'created_at'),
+        db.Index('ix_donation_appointments_slot_id', 'slot_id'),
+        # At most one active (pending or confirmed) appointment per donor
+        db.Index('ix_donation_appointments_donor_id_active', 'donor_id', unique=True,
+                 sqlite_where=db.text("status IN ('pending', 'confirmed')"),
+                 postgresql_where=db.text("status IN ('pending', 'confirmed')")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     donor_id = db.Column(db.Integer, db.ForeignKey('donors.id'), nullable=False)
     hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
+    slot_id = db.Column(db.Integer, db.ForeignKey('donation_slots.id'))  # None for bookings made before slots
     appointment_date = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, completed, cancelled
     notes = db.Column(db.Text)
+    reminder_sent_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -35,6 +78,12 @@ class DonationAppointment(db.Model):
 
 class BloodDonationRecord(db.Model):
     __tablename__ = 'blood_donation_records'
+    __table_args__ = (
+        db.Index('ix_blood_donation_records_appointment_id', 'appointment_id'),
+        db.Index('ix_blood_donation_records_donor_id_date', 'donor_id', 'donation_date'),
+        db.Index('ix_blood_donation_records_blood_group_date', 'blood_group', 'donation_date'),
+        db.Index('ix_blood_donation_records_donation_date', 'donation_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(db.Integer, db.ForeignKey('donation_appointments.id'), nullable=False)
@@ -52,8 +101,39 @@ class BloodDonationRecord(db.Model):
     def __repr__(self):
         return f'<BloodDonationRecord {self.donor.user.name} - {self.quantity} units>'
 
+class BloodUnit(db.Model):
+    __tablename__ = 'blood_units'
+    __table_args__ = (
+        # FEFO allocation: equality on blood group and status, range/order on expiry
+        db.Index('ix_blood_units_blood_group_status_expiry_date', 'blood_group', 'status', 'expiry_date'),
+        db.Index('ix_blood_units_donation_record_id', 'donation_record_id'),
+        db.Index('ix_blood_units_request_id', 'request_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    donation_record_id = db.Column(db.Integer, db.ForeignKey('blood_donation_records.id'), nullable=False)
+    request_id = db.Column(db.Integer, db.ForeignKey('blood_transfusion_requests.id'))
+    blood_group = db.Column(db.String(5), nullable=False)
+    component_type = db.Column(db.String(20), nullable=False, default='whole_blood')  # whole_blood, red_cells, plasma, platelets
+    collection_date = db.Column(db.Date, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='available')  # available, allocated, used, expired, discarded
+    location = db.Column(db.String(100))
+    allocated_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    donation_record = db.relationship('BloodDonationRecord', backref=db.backref('units', lazy='dynamic', cascade='all, delete-orphan'))
+    request = db.relationship('BloodTransfusionRequest', backref=db.backref('allocated_units', lazy='dynamic'))
+    
+    def __repr__(self):
+        return f'<BloodUnit {self.blood_group} {self.component_type} - expires {self.expiry_date}>'
+
 class Recipient(db.Model):
     __tablename__ = 'recipients'
+    __table_args__ = (
+        db.Index('ix_recipients_hospital_id_created_at', 'hospital_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
@@ -73,6 +153,14 @@ class Recipient(db.Model):
 
 class BloodTransfusionRequest(db.Model):
     __tablename__ = 'blood_transfusion_requests'
+    __table_args__ = (
+        db.Index('ix_blood_transfusion_requests_hospital_id_status', 'hospital_id', 'status'),
+        db.Index('ix_blood_transfusion_requests_hospital_id_created_at', 'hospital_id', 'created_at'),
+        db.Index('ix_blood_transfusion_requests_status_urgency_created_at', 'status', 'urgency', 'created_at'),
+        db.Index('ix_blood_transfusion_requests_blood_group_status', 'blood_group', 'status'),
+        db.Index('ix_blood_transfusion_requests_recipient_id', 'recipient_id'),
+        db.Index('ix_blood_transfusion_requests_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
@@ -102,13 +190,60 @@ class BloodInventory(db.Model):
     total_units = db.Column(db.Float, default=0)
     available_units = db.Column(db.Float, default=0)
     reserved_units = db.Column(db.Float, default=0)
+    # Bumped on every update; a stale version makes the flush fail (compare-and-swap)
+    version = db.Column(db.Integer, nullable=False, default=1)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f'<BloodInventory {self.blood_group} - {self.available_units} units>'
 
+class Reservation(db.Model):
+    __tablename__ = 'reservations'
+    __table_args__ = (
+        db.Index('ix_reservations_request_id', 'request_id'),
+        db.Index('ix_reservations_blood_group_status', 'blood_group', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('blood_transfusion_requests.id'), nullable=False)
+    blood_group = db.Column(db.String(5), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)  # in units
+    status = db.Column(db.String(20), nullable=False, default='active')  # active, fulfilled, released
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    request = db.relationship('BloodTransfusionRequest', backref=db.backref('reservations', lazy='dynamic', cascade='all, delete-orphan'))
+    
+    def __repr__(self):
+        return f'<Reservation {self.blood_group} - {self.quantity} units>'
+
+class ShortageCounter(db.Model):
+    __tablename__ = 'shortage_counters'
+    __table_args__ = (
+        db.UniqueConstraint('blood_group', 'city', name='uq_shortage_counters_blood_group_city'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    blood_group = db.Column(db.String(5), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    supply_units = db.Column(db.Float, nullable=False, default=0)  # available, unallocated units
+    demand_units = db.Column(db.Float, nullable=False, default=0)  # units in pending requests
+    alert_active = db.Column(db.Boolean, nullable=False, default=False)
+    last_alert_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ShortageCounter {self.blood_group} {self.city} - {self.demand_units}/{self.supply_units}>'
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_notifications_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -123,6 +258,9 @@ class Notification(db.Model):
 
 class Feedback(db.Model):
     __tablename__ = 'feedback'
+    __table_args__ = (
+        db.Index('ix_feedback_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -132,4 +270,23 @@ class Feedback(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Feedback {self.name} - {self.subject}>' 
\ No newline at end of file
+        return f'<Feedback {self.name} - {self.subject}>' 
+
+class StoredFile(db.Model):
+    __tablename__ = 'stored_files'
+    __table_args__ = (
+        db.Index('ix_stored_files_sha256', 'sha256', unique=True),
+        # Sweeper: unreferenced blobs, oldest first
+        db.Index('ix_stored_files_ref_count_updated_at', 'ref_count', 'updated_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)  # content hash, also the blob's file name
+    extension = db.Column(db.String(10), nullable=False, default='')
+    size = db.Column(db.Integer, nullable=False)  # bytes
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # last upload or release
+    
+    def __repr__(self):
+        return f'<StoredFile {self.sha256[:12]} refs={self.ref_count}>'
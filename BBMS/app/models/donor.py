@@ -3,6 +3,14 @@ from app import db
 
 class Donor(db.Model):
     __tablename__ = 'donors'
+    __table_args__ = (
+        db.Index('ix_donors_user_id', 'user_id'),
+        db.Index('ix_donors_blood_group_is_available_city', 'blood_group', 'is_available', 'city'),
+        db.Index('ix_donors_city', 'city'),
+        db.Index('ix_donors_created_at', 'created_at'),
+        db.Index('ix_donors_updated_at', 'updated_at'),
+        db.Index('ix_donors_last_donation_date', 'last_donation_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -15,6 +23,7 @@ class Donor(db.Model):
     photo = db.Column(db.String(255))  # Profile image path
     date_of_birth = db.Column(db.Date)
     last_donation_date = db.Column(db.Date)
+    eligibility_notified_on = db.Column(db.Date)  # last_donation_date the re-eligibility notice was sent for
     medical_conditions = db.Column(db.Text)
     is_available = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
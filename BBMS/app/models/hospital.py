@@ -3,6 +3,12 @@ from app import db
 
 class Hospital(db.Model):
     __tablename__ = 'hospitals'
+    __table_args__ = (
+        db.Index('ix_hospitals_user_id', 'user_id'),
+        db.Index('ix_hospitals_city_is_verified', 'city', 'is_verified'),
+        db.Index('ix_hospitals_created_at', 'created_at'),
+        db.Index('ix_hospitals_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
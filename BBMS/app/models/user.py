@@ -5,6 +5,9 @@ from app import db, login_manager
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role', 'role'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -32,4 +35,8 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id)) 
\ No newline at end of file
+    # Load the role profile with the user; nearly every page reads it
+    return User.query.options(
+        db.joinedload(User.donor),
+        db.joinedload(User.hospital)
+    ).get(int(user_id)) 
\ No newline at end of file
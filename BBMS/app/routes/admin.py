@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, send_file
+from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
@@ -7,15 +7,22 @@ from app.models.hospital import Hospital
 from app.models.common import BloodTransfusionRequest, DonationAppointment, BloodDonationRecord, Notification, Feedback, BloodInventory
 from app.utils.helpers import role_required, format_date, format_datetime, get_status_color, get_cities
 from app.utils.email import send_notification_email
+from app.utils.search import build_match_query, search_filter, global_search
+from app.utils.database import use_read_replica
+from app.utils import workflows
+from app.utils.inventory import InsufficientStockError
+from app.utils.transactions import ConcurrentUpdateError
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import csv
-from io import BytesIO
+from io import StringIO
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/admin/dashboard')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def dashboard():
     """Admin dashboard with analytics"""
     
@@ -40,8 +47,13 @@ def dashboard():
         }
     
     # Recent activities
-    recent_requests = BloodTransfusionRequest.query.order_by(BloodTransfusionRequest.created_at.desc()).limit(5).all()
-    recent_appointments = DonationAppointment.query.order_by(DonationAppointment.created_at.desc()).limit(5).all()
+    recent_requests = BloodTransfusionRequest.query.options(
+        joinedload(BloodTransfusionRequest.hospital).joinedload(Hospital.user)
+    ).order_by(BloodTransfusionRequest.created_at.desc()).limit(5).all()
+    recent_appointments = DonationAppointment.query.options(
+        joinedload(DonationAppointment.donor).joinedload(Donor.user),
+        joinedload(DonationAppointment.hospital).joinedload(Hospital.user)
+    ).order_by(DonationAppointment.created_at.desc()).limit(5).all()
     recent_feedback = Feedback.query.order_by(Feedback.created_at.desc()).limit(5).all()
     
     # City-wise statistics
@@ -68,8 +80,9 @@ def donors():
     page = request.args.get('page', 1, type=int)
     blood_group_filter = request.args.get('blood_group', '')
     city_filter = request.args.get('city', '')
+    search_query = request.args.get('search', '')
     
-    query = Donor.query
+    query = Donor.query.options(joinedload(Donor.user))
     
     if blood_group_filter:
         query = query.filter_by(blood_group=blood_group_filter)
@@ -77,6 +90,9 @@ def donors():
     if city_filter:
         query = query.filter_by(city=city_filter)
     
+    if search_query:
+        query = query.filter(search_filter('users', Donor.user_id, search_query))
+    
     donors = query.order_by(Donor.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
@@ -89,7 +105,8 @@ def donors():
                          blood_groups=blood_groups,
                          cities=cities,
                          blood_group_filter=blood_group_filter,
-                         city_filter=city_filter)
+                         city_filter=city_filter,
+                         search_query=search_query)
 
 @admin_bp.route('/admin/hospitals')
 @login_required
@@ -99,8 +116,9 @@ def hospitals():
     page = request.args.get('page', 1, type=int)
     city_filter = request.args.get('city', '')
     verified_filter = request.args.get('verified', '')
+    search_query = request.args.get('search', '')
     
-    query = Hospital.query
+    query = Hospital.query.options(joinedload(Hospital.user))
     
     if city_filter:
         query = query.filter_by(city=city_filter)
@@ -110,6 +128,12 @@ def hospitals():
     elif verified_filter == 'unverified':
         query = query.filter_by(is_verified=False)
     
+    if search_query:
+        query = query.filter(db.or_(
+            search_filter('users', Hospital.user_id, search_query),
+            search_filter('hospitals', Hospital.id, search_query)
+        ))
+    
     hospitals = query.order_by(Hospital.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
@@ -120,7 +144,32 @@ def hospitals():
                          hospitals=hospitals,
                          cities=cities,
                          city_filter=city_filter,
-                         verified_filter=verified_filter)
+                         verified_filter=verified_filter,
+                         search_query=search_query)
+
+@admin_bp.route('/admin/search')
+@login_required
+@role_required(['admin'])
+@use_read_replica
+def search():
+    """Search donors, hospitals, recipients and requests with facet counts"""
+    search_query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 5, type=int), 50))
+    filters = {
+        'blood_group': request.args.get('blood_group', ''),
+        'city': request.args.get('city', ''),
+        'status': request.args.get('status', '')
+    }
+    
+    if not search_query:
+        return jsonify({'error': 'Search query is required'}), 400
+    
+    # Punctuation alone would scan and facet every table for nothing useful
+    if not build_match_query(search_query):
+        return jsonify({'error': 'Search query must contain a letter or digit'}), 400
+    
+    results = global_search(search_query, limit=limit, filters=filters)
+    return jsonify({'query': search_query, 'results': results})
 
 @admin_bp.route('/admin/verify-hospital/<int:hospital_id>')
 @login_required
@@ -129,26 +178,7 @@ def verify_hospital(hospital_id):
     """Verify hospital"""
     hospital = Hospital.query.get_or_404(hospital_id)
     
-    hospital.is_verified = True
-    db.session.commit()
-    
-    # Send notification to hospital
-    notification = Notification(
-        user_id=hospital.user_id,
-        title="Hospital Verification Approved",
-        message="Your hospital has been verified by the admin. You can now submit blood requests.",
-        type="success"
-    )
-    db.session.add(notification)
-    db.session.commit()
-    
-    # Send email notification
-    send_notification_email(
-        hospital.user.email,
-        "Hospital Verification Approved",
-        "Your hospital has been verified by the admin. You can now submit blood requests.",
-        "success"
-    )
+    workflows.verify_hospital(hospital)
     
     flash('Hospital verified successfully!', 'success')
     return redirect(url_for('admin.hospitals'))
@@ -161,8 +191,11 @@ def requests():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
     urgency_filter = request.args.get('urgency', '')
+    search_query = request.args.get('search', '')
     
-    query = BloodTransfusionRequest.query
+    query = BloodTransfusionRequest.query.options(
+        joinedload(BloodTransfusionRequest.hospital).joinedload(Hospital.user)
+    )
     
     if status_filter:
         query = query.filter_by(status=status_filter)
@@ -170,6 +203,12 @@ def requests():
     if urgency_filter:
         query = query.filter_by(urgency=urgency_filter)
     
+    if search_query:
+        query = query.join(BloodTransfusionRequest.hospital).filter(db.or_(
+            search_filter('recipients', BloodTransfusionRequest.recipient_id, search_query),
+            search_filter('users', Hospital.user_id, search_query)
+        ))
+    
     requests = query.order_by(BloodTransfusionRequest.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
@@ -177,7 +216,8 @@ def requests():
     return render_template('admin/requests.html',
                          requests=requests,
                          status_filter=status_filter,
-                         urgency_filter=urgency_filter)
+                         urgency_filter=urgency_filter,
+                         search_query=search_query)
 
 @admin_bp.route('/admin/approve-request/<int:request_id>')
 @login_required
@@ -190,30 +230,44 @@ def approve_request(request_id):
         flash('Request is not pending for approval.', 'warning')
         return redirect(url_for('admin.requests'))
     
-    blood_request.status = 'approved'
-    db.session.commit()
-    
-    # Send notification to hospital
-    notification = Notification(
-        user_id=blood_request.hospital.user_id,
-        title="Blood Request Approved",
-        message=f"Your blood request for {blood_request.blood_group} has been approved.",
-        type="success"
-    )
-    db.session.add(notification)
-    db.session.commit()
-    
-    # Send email notification
-    send_notification_email(
-        blood_request.hospital.user.email,
-        "Blood Request Approved",
-        f"Your blood request for {blood_request.blood_group} has been approved.",
-        "success"
-    )
+    try:
+        workflows.approve_request(blood_request)
+    except InsufficientStockError as e:
+        flash(f'Cannot approve request: {e}.', 'warning')
+        return redirect(url_for('admin.requests'))
+    except workflows.InvalidStatusError:
+        flash('Request is not pending for approval.', 'warning')
+        return redirect(url_for('admin.requests'))
+    except ConcurrentUpdateError:
+        flash('Stock for this blood group is being updated by someone else. Please try again.', 'warning')
+        return redirect(url_for('admin.requests'))
     
     flash('Request approved successfully!', 'success')
     return redirect(url_for('admin.requests'))
 
+@admin_bp.route('/admin/fulfil-request/<int:request_id>', methods=['POST'])
+@login_required
+@role_required(['admin'])
+def fulfil_request(request_id):
+    """Mark an approved request fulfilled once its units are handed over"""
+    blood_request = BloodTransfusionRequest.query.get_or_404(request_id)
+    
+    if blood_request.status != 'approved':
+        flash('Only approved requests can be fulfilled.', 'warning')
+        return redirect(url_for('admin.requests'))
+    
+    try:
+        workflows.fulfil_request(blood_request)
+    except workflows.InvalidStatusError:
+        flash('Only approved requests can be fulfilled.', 'warning')
+        return redirect(url_for('admin.requests'))
+    except ConcurrentUpdateError:
+        flash('Stock for this blood group is being updated by someone else. Please try again.', 'warning')
+        return redirect(url_for('admin.requests'))
+    
+    flash('Request marked as fulfilled.', 'success')
+    return redirect(url_for('admin.requests'))
+
 @admin_bp.route('/admin/reject-request/<int:request_id>', methods=['GET', 'POST'])
 @login_required
 @role_required(['admin'])
@@ -221,34 +275,21 @@ def reject_request(request_id):
     """Reject blood transfusion request"""
     blood_request = BloodTransfusionRequest.query.get_or_404(request_id)
     
-    if blood_request.status != 'pending':
-        flash('Request is not pending for approval.', 'warning')
+    if blood_request.status not in ('pending', 'approved'):
+        flash('Request can no longer be rejected.', 'warning')
         return redirect(url_for('admin.requests'))
     
     if request.method == 'POST':
         remarks = request.form.get('remarks', '')
         
-        blood_request.status = 'rejected'
-        blood_request.admin_remarks = remarks
-        db.session.commit()
-        
-        # Send notification to hospital
-        notification = Notification(
-            user_id=blood_request.hospital.user_id,
-            title="Blood Request Rejected",
-            message=f"Your blood request for {blood_request.blood_group} has been rejected. Reason: {remarks}",
-            type="error"
-        )
-        db.session.add(notification)
-        db.session.commit()
-        
-        # Send email notification
-        send_notification_email(
-            blood_request.hospital.user.email,
-            "Blood Request Rejected",
-            f"Your blood request for {blood_request.blood_group} has been rejected. Reason: {remarks}",
-            "error"
-        )
+        try:
+            workflows.reject_request(blood_request, remarks)
+        except workflows.InvalidStatusError:
+            flash('Request can no longer be rejected.', 'warning')
+            return redirect(url_for('admin.requests'))
+        except ConcurrentUpdateError:
+            flash('Stock for this blood group is being updated by someone else. Please try again.', 'warning')
+            return redirect(url_for('admin.requests'))
         
         flash('Request rejected successfully!', 'success')
         return redirect(url_for('admin.requests'))
@@ -263,7 +304,10 @@ def appointments():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
     
-    query = DonationAppointment.query
+    query = DonationAppointment.query.options(
+        joinedload(DonationAppointment.donor).joinedload(Donor.user),
+        joinedload(DonationAppointment.hospital).joinedload(Hospital.user)
+    )
     
     if status_filter:
         query = query.filter_by(status=status_filter)
@@ -288,16 +332,36 @@ def feedback():
     
     return render_template('admin/feedback.html', feedback_messages=feedback_messages)
 
+def _csv_response(filename, rows):
+    """Stream a list of same-keyed dicts as a CSV download, a block of rows at a time"""
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        if rows:
+            writer.writerow(rows[0].keys())  # Header
+        for row in rows:
+            writer.writerow(row.values())
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    response = Response(generate(), mimetype='text/csv')
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    return response
+
 @admin_bp.route('/admin/export-data')
 @login_required
 @role_required(['admin'])
+@use_read_replica
 def export_data():
     """Export data as CSV"""
     data_type = request.args.get('type', 'donors')
     
     if data_type == 'donors':
         # Export donors data
-        donors = Donor.query.all()
+        donors = Donor.query.options(joinedload(Donor.user)).all()
         data = []
         for donor in donors:
             data.append({
@@ -310,23 +374,11 @@ def export_data():
                 'Created': donor.created_at.strftime('%Y-%m-%d')
             })
         
-        output = BytesIO()
-        writer = csv.writer(output)
-        writer.writerow(data[0].keys())  # Header
-        for row in data:
-            writer.writerow(row.values())
-        output.seek(0)
-        
-        return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'donors_export_{datetime.now().strftime("%Y%m%d")}.csv'
-        )
+        return _csv_response(f'donors_export_{datetime.now().strftime("%Y%m%d")}.csv', data)
     
     elif data_type == 'hospitals':
         # Export hospitals data
-        hospitals = Hospital.query.all()
+        hospitals = Hospital.query.options(joinedload(Hospital.user)).all()
         data = []
         for hospital in hospitals:
             data.append({
@@ -340,23 +392,13 @@ def export_data():
                 'Created': hospital.created_at.strftime('%Y-%m-%d')
             })
         
-        output = BytesIO()
-        writer = csv.writer(output)
-        writer.writerow(data[0].keys())  # Header
-        for row in data:
-            writer.writerow(row.values())
-        output.seek(0)
-        
-        return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'hospitals_export_{datetime.now().strftime("%Y%m%d")}.csv'
-        )
+        return _csv_response(f'hospitals_export_{datetime.now().strftime("%Y%m%d")}.csv', data)
     
     elif data_type == 'requests':
         # Export blood requests data
-        requests = BloodTransfusionRequest.query.all()
+        requests = BloodTransfusionRequest.query.options(
+            joinedload(BloodTransfusionRequest.hospital).joinedload(Hospital.user)
+        ).all()
         data = []
         for req in requests:
             data.append({
@@ -369,19 +411,7 @@ def export_data():
                 'Required By': req.required_by_date.strftime('%Y-%m-%d') if req.required_by_date else ''
             })
         
-        output = BytesIO()
-        writer = csv.writer(output)
-        writer.writerow(data[0].keys())  # Header
-        for row in data:
-            writer.writerow(row.values())
-        output.seek(0)
-        
-        return send_file(
-            BytesIO(output.getvalue()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'requests_export_{datetime.now().strftime("%Y%m%d")}.csv'
-        )
+        return _csv_response(f'requests_export_{datetime.now().strftime("%Y%m%d")}.csv', data)
     
     flash('Invalid export type.', 'danger')
     return redirect(url_for('admin.dashboard'))
@@ -392,7 +422,7 @@ def export_data():
 def notifications():
     """View all notifications"""
     page = request.args.get('page', 1, type=int)
-    notifications = Notification.query.order_by(Notification.created_at.desc()).paginate(
+    notifications = Notification.query.options(joinedload(Notification.user)).order_by(Notification.created_at.desc()).paginate(
         page=page, per_page=50, error_out=False
     )
     
@@ -1,10 +1,9 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
-from app import db
-from app.models.common import DonationAppointment, BloodDonationRecord, Notification
+from app.models.common import DonationAppointment
 from app.utils.helpers import role_required, format_datetime, get_status_color
-from app.utils.email import send_notification_email
-from datetime import datetime
+from app.utils import workflows
+from app.utils.transactions import ConcurrentUpdateError
 
 appointments_bp = Blueprint('appointments', __name__)
 
@@ -24,26 +23,14 @@ def confirm_appointment(appointment_id):
         flash('Appointment is not pending for confirmation.', 'warning')
         return redirect(url_for('hospital.dashboard'))
     
-    appointment.status = 'confirmed'
-    db.session.commit()
-    
-    # Send notification to donor
-    notification = Notification(
-        user_id=appointment.donor.user_id,
-        title="Appointment Confirmed",
-        message=f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been confirmed.",
-        type="success"
-    )
-    db.session.add(notification)
-    db.session.commit()
-    
-    # Send email notification
-    send_notification_email(
-        appointment.donor.user.email,
-        "Appointment Confirmed",
-        f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been confirmed.",
-        "success"
-    )
+    try:
+        workflows.confirm_appointment(appointment)
+    except workflows.InvalidStatusError:
+        flash('Appointment is not pending for confirmation.', 'warning')
+        return redirect(url_for('hospital.dashboard'))
+    except ConcurrentUpdateError:
+        flash('This appointment is being updated by someone else. Please try again.', 'warning')
+        return redirect(url_for('hospital.dashboard'))
     
     flash('Appointment confirmed successfully!', 'success')
     return redirect(url_for('hospital.dashboard'))
@@ -79,41 +66,14 @@ def complete_appointment(appointment_id):
             flash('Invalid quantity. Please enter a valid number.', 'danger')
             return render_template('appointments/complete_appointment.html', appointment=appointment)
         
-        # Mark appointment as completed
-        appointment.status = 'completed'
-        db.session.commit()
-        
-        # Create blood donation record
-        donation_record = BloodDonationRecord(
-            appointment_id=appointment.id,
-            donor_id=appointment.donor.id,
-            quantity=quantity,
-            blood_group=appointment.donor.blood_group,
-            donation_date=datetime.now()
-        )
-        db.session.add(donation_record)
-        
-        # Update donor's last donation date
-        appointment.donor.last_donation_date = datetime.now().date()
-        db.session.commit()
-        
-        # Send notification to donor
-        notification = Notification(
-            user_id=appointment.donor.user_id,
-            title="Donation Completed",
-            message=f"Thank you for your blood donation! {quantity} units of {appointment.donor.blood_group} blood have been recorded.",
-            type="success"
-        )
-        db.session.add(notification)
-        db.session.commit()
-        
-        # Send email notification
-        send_notification_email(
-            appointment.donor.user.email,
-            "Donation Completed",
-            f"Thank you for your blood donation! {quantity} units of {appointment.donor.blood_group} blood have been recorded.",
-            "success"
-        )
+        try:
+            workflows.complete_appointment(appointment, quantity)
+        except workflows.InvalidStatusError:
+            flash('Appointment must be confirmed before completion.', 'warning')
+            return redirect(url_for('hospital.dashboard'))
+        except ConcurrentUpdateError:
+            flash('Blood stock is being updated by someone else. Please try again.', 'warning')
+            return render_template('appointments/complete_appointment.html', appointment=appointment)
         
         flash('Appointment completed successfully!', 'success')
         return redirect(url_for('hospital.dashboard'))
@@ -140,25 +100,95 @@ def cancel_appointment(appointment_id):
         flash('Appointment cannot be cancelled.', 'warning')
         return redirect(url_for('donor.dashboard' if current_user.role == 'donor' else 'hospital.dashboard'))
     
-    appointment.status = 'cancelled'
-    db.session.commit()
+    try:
+        workflows.cancel_appointment(appointment, current_user.role)
+    except workflows.InvalidStatusError:
+        flash('Appointment cannot be cancelled.', 'warning')
+        return redirect(url_for('donor.dashboard' if current_user.role == 'donor' else 'hospital.dashboard'))
+    except ConcurrentUpdateError:
+        flash('This appointment is being updated by someone else. Please try again.', 'warning')
+        return redirect(url_for('donor.dashboard' if current_user.role == 'donor' else 'hospital.dashboard'))
     
-    # Send notification to the other party
-    if current_user.role == 'donor':
-        notification_user_id = appointment.hospital.user_id
-        notification_message = f"Blood donation appointment with {appointment.donor.user.name} has been cancelled."
+    flash('Appointment cancelled successfully!', 'success')
+    return redirect(url_for('donor.dashboard' if current_user.role == 'donor' else 'hospital.dashboard'))
+
+def _selected_appointment_ids():
+    """Appointment ids ticked on the hospital appointments page"""
+    ids = set()
+    for value in request.form.getlist('appointment_ids'):
+        try:
+            ids.add(int(value))
+        except ValueError:
+            continue
+    return ids
+
+def _run_batch(action, *args):
+    """Run a batch workflow and flash its outcome"""
+    try:
+        count = action(current_user.hospital, *args)
+    except workflows.AppointmentBatchError as e:
+        flash(f'No appointments were changed. These cannot take this action: {", ".join(map(str, e.appointment_ids))}.', 'danger')
+    except ConcurrentUpdateError:
+        flash('Blood stock is being updated by someone else. Please try again.', 'warning')
     else:
-        notification_user_id = appointment.donor.user_id
-        notification_message = f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been cancelled."
-    
-    notification = Notification(
-        user_id=notification_user_id,
-        title="Appointment Cancelled",
-        message=notification_message,
-        type="warning"
-    )
-    db.session.add(notification)
-    db.session.commit()
+        return count
+    return None
+
+@appointments_bp.route('/appointments/bulk/confirm', methods=['POST'])
+@login_required
+@role_required(['hospital'])
+def bulk_confirm_appointments():
+    """Confirm selected donation appointments"""
+    appointment_ids = _selected_appointment_ids()
+    
+    if not appointment_ids or not current_user.hospital:
+        flash('Please select at least one appointment.', 'warning')
+        return redirect(url_for('hospital.appointments'))
+    
+    count = _run_batch(workflows.bulk_confirm_appointments, appointment_ids)
+    if count:
+        flash(f'{count} appointments confirmed successfully!', 'success')
+    return redirect(url_for('hospital.appointments'))
+
+@appointments_bp.route('/appointments/bulk/complete', methods=['POST'])
+@login_required
+@role_required(['hospital'])
+def bulk_complete_appointments():
+    """Complete selected donation appointments with per-donor quantities"""
+    appointment_ids = _selected_appointment_ids()
     
-    flash('Appointment cancelled successfully!', 'success')
-    return redirect(url_for('donor.dashboard' if current_user.role == 'donor' else 'hospital.dashboard')) 
\ No newline at end of file
+    if not appointment_ids or not current_user.hospital:
+        flash('Please select at least one appointment.', 'warning')
+        return redirect(url_for('hospital.appointments'))
+    
+    quantities = {}
+    for appointment_id in appointment_ids:
+        try:
+            quantity = float(request.form.get(f'quantity_{appointment_id}', ''))
+            if quantity <= 0:
+                raise ValueError("Quantity must be positive")
+        except ValueError:
+            flash(f'Invalid quantity for appointment {appointment_id}. Please enter a valid number.', 'danger')
+            return redirect(url_for('hospital.appointments'))
+        quantities[appointment_id] = quantity
+    
+    count = _run_batch(workflows.bulk_complete_appointments, quantities)
+    if count:
+        flash(f'{count} appointments completed successfully!', 'success')
+    return redirect(url_for('hospital.appointments'))
+
+@appointments_bp.route('/appointments/bulk/cancel', methods=['POST'])
+@login_required
+@role_required(['hospital'])
+def bulk_cancel_appointments():
+    """Cancel selected donation appointments"""
+    appointment_ids = _selected_appointment_ids()
+    
+    if not appointment_ids or not current_user.hospital:
+        flash('Please select at least one appointment.', 'warning')
+        return redirect(url_for('hospital.appointments'))
+    
+    count = _run_batch(workflows.bulk_cancel_appointments, appointment_ids)
+    if count:
+        flash(f'{count} appointments cancelled successfully!', 'success')
+    return redirect(url_for('hospital.appointments'))
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, send_file
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, send_file, send_from_directory
 from flask_login import login_required, current_user
 from app import db
 from app.models.donor import Donor
@@ -6,10 +6,18 @@ from app.models.hospital import Hospital
 from app.models.common import DonationAppointment, BloodDonationRecord, Notification
 from app.models.hospital import Hospital
 from app.models.user import User
-from app.utils.helpers import role_required, format_date, format_datetime, get_status_color, get_cities, get_hospitals_by_city
+from app.utils.helpers import role_required, format_date, format_datetime, get_status_color, get_cities, get_hospitals_by_city, get_appointment_counts
 from app.utils.certificate import generate_html_certificate, generate_pdf_certificate
-from app.utils.helpers import save_uploaded_file, is_allowed_file
+from app.utils.helpers import is_allowed_file
+from app.utils.photos import ALLOWED_PHOTO_EXTENSIONS, photo_folder, queue_donor_photo
+from app.utils.search import search_filter
+from app.utils.profiling import query_budget
+from app.utils.slots import SlotUnavailableError
+from app.utils.transactions import ConcurrentUpdateError
+from app.utils import workflows
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
+from functools import partial
 import os
 from io import BytesIO
 
@@ -18,6 +26,7 @@ donor_bp = Blueprint('donor', __name__)
 @donor_bp.route('/donor/dashboard')
 @login_required
 @role_required(['donor'])
+@query_budget(8)
 def dashboard():
     """Donor dashboard"""
     donor = current_user.donor
@@ -26,28 +35,31 @@ def dashboard():
         flash('Please complete your profile first.', 'warning')
         return redirect(url_for('auth.complete_profile'))
     
-    # Get recent appointments
-    recent_appointments = donor.appointments.order_by(DonationAppointment.appointment_date.desc()).limit(5).all()
-    
-    # Get recent donations
-    recent_donations = donor.donation_records.order_by(BloodDonationRecord.donation_date.desc()).limit(5).all()
-    
     # Get unread notifications
     unread_notifications = current_user.notifications.filter_by(is_read=False).order_by(Notification.created_at.desc()).limit(5).all()
     
-    # Statistics
-    total_donations = donor.donation_records.count()
-    total_appointments = donor.appointments.count()
-    pending_appointments = donor.appointments.filter_by(status='pending').count()
-    
+    # Stat cards and recent lists are cached fragments; their loaders only run on a miss
     return render_template('donor/dashboard.html',
                          donor=donor,
-                         recent_appointments=recent_appointments,
-                         recent_donations=recent_donations,
-                         unread_notifications=unread_notifications,
-                         total_donations=total_donations,
-                         total_appointments=total_appointments,
-                         pending_appointments=pending_appointments)
+                         load_stats=partial(_dashboard_stats, donor),
+                         load_recent=partial(_dashboard_recent, donor),
+                         unread_notifications=unread_notifications)
+
+def _dashboard_stats(donor):
+    appointment_counts = get_appointment_counts(donor.appointments)
+    return {
+        'total_donations': donor.donation_records.count(),
+        'total_appointments': appointment_counts['all'],
+        'pending_appointments': appointment_counts['pending']
+    }
+
+def _dashboard_recent(donor):
+    return {
+        'appointments': donor.appointments.options(
+            joinedload(DonationAppointment.hospital).joinedload(Hospital.user)
+        ).order_by(DonationAppointment.appointment_date.desc()).limit(5).all(),
+        'donations': donor.donation_records.order_by(BloodDonationRecord.donation_date.desc()).limit(5).all()
+    }
 
 @donor_bp.route('/donor/profile', methods=['GET', 'POST'])
 @login_required
@@ -87,23 +99,14 @@ def profile():
         if new_blood_group and new_blood_group != donor.blood_group:
             donor.blood_group = new_blood_group
         
-        # Handle profile photo upload
+        # Handle profile photo upload; resized variants are built in the background
         if 'photo' in request.files:
             file = request.files['photo']
             if file and file.filename:
-                if is_allowed_file(file.filename, {'.jpg', '.jpeg', '.png', '.gif'}):
-                    # Delete old photo if exists
-                    if donor.photo:
-                        old_photo_path = os.path.join(current_app.config['UPLOAD_FOLDER'], donor.photo)
-                        if os.path.exists(old_photo_path):
-                            os.remove(old_photo_path)
-                    
-                    # Save new photo
-                    filename = save_uploaded_file(file, current_app.config['UPLOAD_FOLDER'])
-                    if filename:
-                        donor.photo = filename
+                if is_allowed_file(file.filename, ALLOWED_PHOTO_EXTENSIONS):
+                    queue_donor_photo(donor, file)
                 else:
-                    flash('Invalid file type. Please upload JPG, PNG, or GIF images only.', 'danger')
+                    flash('Invalid file type. Please upload JPG, PNG, GIF or WebP images only.', 'danger')
         
         db.session.commit()
         flash('Profile updated successfully!', 'success')
@@ -114,6 +117,18 @@ def profile():
     
     return render_template('donor/profile.html', donor=donor, cities=cities, blood_groups=blood_groups)
 
+@donor_bp.route('/photos/<filename>')
+@login_required
+def photo(filename):
+    """Serve a profile photo variant with long-lived cache headers"""
+    response = send_from_directory(os.path.abspath(photo_folder()), filename,
+                                   max_age=current_app.config['PHOTO_CACHE_MAX_AGE'])
+    # Variants are never rewritten under the same name; only signed-in users may see them
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
 @donor_bp.route('/donor/book-appointment', methods=['GET', 'POST'])
 @login_required
 @role_required(['donor'])
@@ -135,6 +150,15 @@ def book_appointment():
             flash('Please fill in all required fields.', 'warning')
             return render_template('donor/book_appointment.html')
         
+        # The id comes from a form field, so it may not be a number or a hospital
+        try:
+            hospital_id = int(hospital_id)
+        except ValueError:
+            hospital_id = None
+        if hospital_id is None or db.session.get(Hospital, hospital_id) is None:
+            flash('Please choose a hospital from the list.', 'danger')
+            return render_template('donor/book_appointment.html')
+        
         # Combine date and time
         try:
             appointment_datetime = datetime.strptime(f"{appointment_date} {appointment_time}", "%Y-%m-%d %H:%M")
@@ -160,22 +184,24 @@ def book_appointment():
                 flash(f'You must wait {remaining_days} more days before your next donation.', 'warning')
                 return render_template('donor/book_appointment.html')
         
-        # Create appointment
-        appointment = DonationAppointment(
-            donor_id=donor.id,
-            hospital_id=hospital_id,
-            appointment_date=appointment_datetime,
-            notes=notes
-        )
-        
-        db.session.add(appointment)
-        db.session.commit()
+        # Create appointment, taking a place in the hospital's slot
+        try:
+            workflows.book_appointment(donor, hospital_id, appointment_datetime, notes)
+        except SlotUnavailableError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('donor.book_appointment'))
+        except workflows.DuplicateAppointmentError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('donor.appointments'))
+        except ConcurrentUpdateError:
+            flash('That slot is being booked by many donors right now. Please try again.', 'warning')
+            return redirect(url_for('donor.book_appointment'))
         
         flash('Appointment booked successfully! You will receive a confirmation email.', 'success')
         return redirect(url_for('donor.appointments'))
     
     # Get all hospitals for the dropdown
-    hospitals = Hospital.query.all()
+    hospitals = Hospital.query.options(joinedload(Hospital.user)).all()
     cities = get_cities()
     today = datetime.now().strftime('%Y-%m-%d')
     return render_template('donor/book_appointment.html', hospitals=hospitals, cities=cities, today=today)
@@ -183,6 +209,7 @@ def book_appointment():
 @donor_bp.route('/donor/appointments')
 @login_required
 @role_required(['donor'])
+@query_budget(6)
 def appointments():
     """View donor appointments with filtering"""
     donor = current_user.donor
@@ -199,7 +226,10 @@ def appointments():
     page = request.args.get('page', 1, type=int)
     
     # Build query
-    query = donor.appointments
+    query = donor.appointments.options(
+        joinedload(DonationAppointment.hospital).joinedload(Hospital.user),
+        joinedload(DonationAppointment.donor)
+    )
     
     # Apply status filter
     if status_filter == 'upcoming':
@@ -213,8 +243,8 @@ def appointments():
     
     # Apply search filter
     if search_query:
-        query = query.join(DonationAppointment.hospital).join(Hospital.user)
-        query = query.filter(User.name.ilike(f'%{search_query}%'))
+        query = query.join(DonationAppointment.hospital)
+        query = query.filter(search_filter('users', Hospital.user_id, search_query))
     
     # Apply date range filter
     if date_from:
@@ -237,13 +267,11 @@ def appointments():
     )
     
     # Get counts for each tab
-    upcoming_count = donor.appointments.filter(
-        DonationAppointment.status.in_(['pending', 'confirmed']),
-        DonationAppointment.appointment_date >= datetime.now()
-    ).count()
-    completed_count = donor.appointments.filter_by(status='completed').count()
-    cancelled_count = donor.appointments.filter_by(status='cancelled').count()
-    all_count = donor.appointments.count()
+    counts = get_appointment_counts(donor.appointments)
+    upcoming_count = counts['upcoming']
+    completed_count = counts['completed']
+    cancelled_count = counts['cancelled']
+    all_count = counts['all']
     
     return render_template('donor/appointments.html', 
                          appointments=appointments,
@@ -259,6 +287,7 @@ def appointments():
 @donor_bp.route('/donor/donations')
 @login_required
 @role_required(['donor'])
+@query_budget(6)
 def donations():
     """View donation history"""
     donor = current_user.donor
@@ -268,7 +297,9 @@ def donations():
         return redirect(url_for('auth.complete_profile'))
     
     page = request.args.get('page', 1, type=int)
-    donations = donor.donation_records.order_by(BloodDonationRecord.donation_date.desc()).paginate(
+    donations = donor.donation_records.options(
+        joinedload(BloodDonationRecord.appointment).joinedload(DonationAppointment.hospital).joinedload(Hospital.user)
+    ).order_by(BloodDonationRecord.donation_date.desc()).paginate(
         page=page, per_page=10, error_out=False
     )
     
@@ -2,17 +2,23 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required, current_user
 from app import db
 from app.models.hospital import Hospital
-from app.models.common import BloodTransfusionRequest, Recipient, Notification, DonationAppointment
+from app.models.common import BloodTransfusionRequest, Recipient, Notification, DonationAppointment, DonationSlot
 from app.models.donor import Donor
 from app.models.user import User
-from app.utils.helpers import role_required, format_date, format_datetime, get_status_color, get_cities, get_donors_by_blood_group
+from app.utils.helpers import role_required, format_date, format_datetime, get_status_color, get_cities, get_donors_by_blood_group, get_appointment_counts, get_request_counts
+from app.utils.search import search_filter
+from app.utils.profiling import query_budget
+from app.utils.slots import generate_slots
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
+from functools import partial
 
 hospital_bp = Blueprint('hospital', __name__)
 
 @hospital_bp.route('/hospital/dashboard')
 @login_required
 @role_required(['hospital'])
+@query_budget(8)
 def dashboard():
     """Hospital dashboard"""
     hospital = current_user.hospital
@@ -21,30 +27,29 @@ def dashboard():
         flash('Please complete your profile first.', 'warning')
         return redirect(url_for('auth.complete_profile'))
     
-    # Get recent requests
-    recent_requests = hospital.transfusion_requests.order_by(BloodTransfusionRequest.created_at.desc()).limit(5).all()
-    
-    # Get recent recipients
-    recent_recipients = hospital.recipients.order_by(Recipient.created_at.desc()).limit(5).all()
-    
     # Get unread notifications
     unread_notifications = current_user.notifications.filter_by(is_read=False).order_by(Notification.created_at.desc()).limit(5).all()
     
-    # Statistics
-    total_requests = hospital.transfusion_requests.count()
-    pending_requests = hospital.transfusion_requests.filter_by(status='pending').count()
-    approved_requests = hospital.transfusion_requests.filter_by(status='approved').count()
-    total_recipients = hospital.recipients.count()
-    
+    # Stat cards and recent requests are cached fragments; their loaders only run on a miss
     return render_template('hospital/dashboard.html',
                          hospital=hospital,
-                         recent_requests=recent_requests,
-                         recent_recipients=recent_recipients,
-                         unread_notifications=unread_notifications,
-                         total_requests=total_requests,
-                         pending_requests=pending_requests,
-                         approved_requests=approved_requests,
-                         total_recipients=total_recipients)
+                         load_stats=partial(_dashboard_stats, hospital),
+                         load_recent_requests=partial(_dashboard_recent_requests, hospital),
+                         unread_notifications=unread_notifications)
+
+def _dashboard_stats(hospital):
+    request_counts = get_request_counts(hospital.transfusion_requests)
+    return {
+        'total_requests': request_counts['all'],
+        'pending_requests': request_counts['pending'],
+        'approved_requests': request_counts['approved'],
+        'total_recipients': hospital.recipients.count()
+    }
+
+def _dashboard_recent_requests(hospital):
+    return hospital.transfusion_requests.options(
+        joinedload(BloodTransfusionRequest.recipient)
+    ).order_by(BloodTransfusionRequest.created_at.desc()).limit(5).all()
 
 @hospital_bp.route('/hospital/profile', methods=['GET', 'POST'])
 @login_required
@@ -204,6 +209,47 @@ def requests():
     
     return render_template('hospital/requests.html', requests=requests, status_filter=status_filter)
 
+@hospital_bp.route('/hospital/slots', methods=['GET', 'POST'])
+@login_required
+@role_required(['hospital'])
+def slots():
+    """Publish donation slots and view their bookings"""
+    hospital = current_user.hospital
+    
+    if not hospital:
+        flash('Please complete your profile first.', 'warning')
+        return redirect(url_for('auth.complete_profile'))
+    
+    if request.method == 'POST':
+        try:
+            day = datetime.strptime(request.form.get('date', ''), '%Y-%m-%d').date()
+            first_start = datetime.strptime(request.form.get('first_start', ''), '%H:%M').time()
+            last_start = datetime.strptime(request.form.get('last_start', ''), '%H:%M').time()
+            length = int(request.form.get('length', 30))
+            capacity = int(request.form.get('capacity', 1))
+            if length <= 0 or capacity <= 0:
+                raise ValueError("Length and capacity must be positive")
+        except ValueError:
+            flash('Please enter a valid date, times, slot length and capacity.', 'danger')
+            return redirect(url_for('hospital.slots'))
+        
+        if datetime.combine(day, first_start) <= datetime.now():
+            flash('Slots must start in the future.', 'danger')
+            return redirect(url_for('hospital.slots'))
+        
+        created = generate_slots(hospital.id, day, first_start, last_start, length, capacity)
+        db.session.commit()
+        
+        flash(f'{len(created)} slots published successfully!', 'success')
+        return redirect(url_for('hospital.slots'))
+    
+    upcoming_slots = hospital.slots.filter(DonationSlot.slot_start >= datetime.now()).order_by(
+        DonationSlot.slot_start
+    ).limit(200).all()
+    
+    return render_template('hospital/slots.html', slots=upcoming_slots,
+                           today=datetime.now().strftime('%Y-%m-%d'))
+
 @hospital_bp.route('/hospital/recipients', methods=['GET', 'POST'])
 @login_required
 @role_required(['hospital'])
@@ -388,6 +434,7 @@ def suggested_donors(blood_group):
 @hospital_bp.route('/hospital/appointments')
 @login_required
 @role_required(['hospital'])
+@query_budget(6)
 def appointments():
     """View hospital appointments with filtering"""
     hospital = current_user.hospital
@@ -404,7 +451,9 @@ def appointments():
     page = request.args.get('page', 1, type=int)
     
     # Build query
-    query = hospital.appointments
+    query = hospital.appointments.options(
+        joinedload(DonationAppointment.donor).joinedload(Donor.user)
+    )
     
     # Apply status filter
     if status_filter == 'upcoming':
@@ -418,8 +467,8 @@ def appointments():
     
     # Apply search filter
     if search_query:
-        query = query.join(DonationAppointment.donor).join(Donor.user)
-        query = query.filter(User.name.ilike(f'%{search_query}%'))
+        query = query.join(DonationAppointment.donor)
+        query = query.filter(search_filter('users', Donor.user_id, search_query))
     
     # Apply date range filter
     if date_from:
@@ -441,13 +490,11 @@ def appointments():
         page=page, per_page=5, error_out=False)
     
     # Get counts for each tab
-    upcoming_count = hospital.appointments.filter(
-        DonationAppointment.status.in_(['pending', 'confirmed']),
-        DonationAppointment.appointment_date >= datetime.now()
-    ).count()
-    completed_count = hospital.appointments.filter_by(status='completed').count()
-    cancelled_count = hospital.appointments.filter_by(status='cancelled').count()
-    all_count = hospital.appointments.count()
+    counts = get_appointment_counts(hospital.appointments)
+    upcoming_count = counts['upcoming']
+    completed_count = counts['completed']
+    cancelled_count = counts['cancelled']
+    all_count = counts['all']
     
     return render_template('hospital/appointments.html', 
                          appointments=appointments,
@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip copies are always written
+    brotli = None
+
+# Build output, under the static folder: fingerprinted files plus manifest.json
+ASSET_DIST_FOLDER = 'dist'
+ASSET_MANIFEST = 'manifest.json'
+
+# Text formats worth precompressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+
+# Precompressed copies in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def _dist_folder(app):
+    return os.path.join(app.static_folder, ASSET_DIST_FOLDER)
+
+def fingerprint_filename(filename, digest):
+    """``css/style.css`` -> ``css/style.<digest>.css``"""
+    root, extension = os.path.splitext(filename)
+    return f'{root}.{digest}{extension}'
+
+def _source_assets(app):
+    """Static files to build, as paths relative to the static folder (uploads and output skipped)"""
+    skip = {os.path.realpath(_dist_folder(app)), os.path.realpath(app.config['UPLOAD_FOLDER'])}
+    for root, dirs, files in os.walk(app.static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) not in skip)
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), app.static_folder).replace(os.sep, '/')
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as output:
+        output.write(data)
+    os.replace(f'{path}.tmp', path)
+
+def load_manifest(app):
+    """The last build's ``{filename: fingerprinted filename}``, or {} before any build"""
+    try:
+        with open(os.path.join(_dist_folder(app), ASSET_MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+def build_assets(app):
+    """Fingerprint every static file and write gzip/brotli copies of the text ones
+
+    Each file is copied to ``static/dist/`` with the first 12 hex digits of
+    its SHA-256 in the name, so its URL changes exactly when its content does
+    and browsers can cache it forever. Files from the previous build are
+    kept, so pages rendered just before a deploy still load. Returns a list
+    of ``(filename, fingerprinted, sizes)`` where sizes maps ``'raw'``,
+    ``'gzip'`` and ``'br'`` to bytes.
+    """
+    dist = _dist_folder(app)
+    previous = load_manifest(app)
+    manifest = {}
+    built = []
+    for filename in _source_assets(app):
+        with open(os.path.join(app.static_folder, filename), 'rb') as source:
+            data = source.read()
+        fingerprinted = fingerprint_filename(filename, hashlib.sha256(data).hexdigest()[:12])
+        manifest[filename] = fingerprinted
+
+        path = os.path.join(dist, fingerprinted)
+        _write_file(path, data)
+        sizes = {'raw': len(data)}
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            # mtime=0 keeps the gzip bytes identical across builds of the same file
+            compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(data, quality=11)
+            for name, suffix in ENCODINGS:
+                # Tiny files can come out larger; those are served as they are
+                if name in compressed and len(compressed[name]) < len(data):
+                    _write_file(f'{path}{suffix}', compressed[name])
+                    sizes[name] = len(compressed[name])
+        built.append((filename, fingerprinted, sizes))
+
+    _write_file(os.path.join(dist, ASSET_MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    _prune_dist(dist, set(manifest.values()) | set(previous.values()))
+    app.extensions['asset_manifest'] = manifest
+    return built
+
+def _prune_dist(dist, keep):
+    """Remove built files that neither this build nor the previous one uses"""
+    for root, dirs, files in os.walk(dist, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, dist).replace(os.sep, '/')
+            for _, suffix in ENCODINGS:
+                filename = filename.removesuffix(suffix)
+            if filename != ASSET_MANIFEST and filename not in keep:
+                os.remove(path)
+        if root != dist and not os.listdir(root):
+            shutil.rmtree(root)
+
+def asset_url(filename):
+    """URL of a static file: its fingerprinted build when one exists, else the plain static URL"""
+    fingerprinted = current_app.extensions.get('asset_manifest', {}).get(filename)
+    if fingerprinted is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=fingerprinted)
+
+def serve_asset(filename):
+    """Serve a fingerprinted asset, precompressed when the client accepts it
+
+    The URL names the file's content, so it is cached for a year and never
+    revalidated.
+    """
+    dist = _dist_folder(current_app)
+    accepted = request.accept_encodings
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if accepted[name] and os.path.isfile(os.path.join(dist, f'{filename}{suffix}')):
+            encoding, filename = name, f'{filename}{suffix}'
+            break
+
+    response = send_from_directory(dist, filename, mimetype=mimetype,
+                                   max_age=current_app.config['ASSET_CACHE_MAX_AGE'])
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_assets(app):
+    """The ``asset_url`` template helper and the route serving fingerprinted builds"""
+    app.config.setdefault('ASSET_CACHE_MAX_AGE', int(os.getenv('ASSET_CACHE_MAX_AGE', 31536000)))
+    # Read once at startup. The debug server ignores it, so edited files show up without a rebuild
+    app.extensions['asset_manifest'] = {} if app.debug else load_manifest(app)
+    app.add_url_rule(f'{app.static_url_path}/{ASSET_DIST_FOLDER}/<path:filename>',
+                     endpoint='asset', view_func=serve_asset)
+    app.add_template_global(asset_url)
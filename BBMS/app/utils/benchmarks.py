@@ -0,0 +1,743 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from app import db
+
+BENCH_TABLE = 'bench_writes'
+BENCH_EMAIL_DOMAIN = 'bench.invalid'
+# Stock created by benchmarks uses its own blood group so real inventory is untouched
+BENCH_BLOOD_GROUP = 'BX'
+
+def _write_worker(app, worker_id, writes, start, results):
+    """Commit ``writes`` single-row transactions, like one gunicorn worker"""
+    with app.app_context():
+        # Never reuse connections inherited from the parent process
+        db.engine.dispose(close=False)
+        insert = db.text(f'INSERT INTO {BENCH_TABLE} (worker, payload) VALUES (:worker, :payload)')
+        errors = 0
+        start.wait()
+        began = time.perf_counter()
+        for i in range(writes):
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert, {'worker': worker_id, 'payload': f'write {i}'})
+            except OperationalError:
+                errors += 1
+        results.put((time.perf_counter() - began, errors))
+
+def benchmark_concurrent_writes(app, workers, writes_per_worker):
+    """Measure commit throughput with ``workers`` processes writing at once
+
+    Returns a dict with the committed write count, wall time, writes/second
+    and the number of writes that failed with a lock error.
+    """
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(db.text(f'DROP TABLE IF EXISTS {BENCH_TABLE}'))
+            connection.execute(db.text(
+                f'CREATE TABLE {BENCH_TABLE} (id INTEGER PRIMARY KEY, worker INTEGER, payload VARCHAR(50))'))
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_write_worker, args=(app, worker_id, writes_per_worker, start, results))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            committed = connection.execute(db.text(f'SELECT count(*) FROM {BENCH_TABLE}')).scalar()
+            connection.execute(db.text(f'DROP TABLE {BENCH_TABLE}'))
+
+    return {
+        'workers': workers,
+        'committed': committed,
+        'errors': sum(errors for _, errors in outcomes),
+        'seconds': elapsed,
+        'writes_per_second': committed / elapsed if elapsed else 0
+    }
+
+def _seed_workflow_data(workers, appointments_per_worker):
+    """Create one hospital per worker, each with its own pending appointments
+
+    Every appointment has its own donor, since a donor can hold only one
+    active appointment.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment
+
+    appointment_ids = []
+    for worker_id in range(workers):
+        hospital_user = User(name=f'Bench Hospital {worker_id}', email=f'hospital{worker_id}@{BENCH_EMAIL_DOMAIN}',
+                             password_hash='-', role='hospital', is_verified=True)
+        hospital = Hospital(user=hospital_user, phone='0', address='Bench', city='Bench', is_verified=True)
+        appointments = [
+            DonationAppointment(
+                donor=Donor(user=User(name=f'Bench Donor {worker_id}-{i}', email=f'donor{worker_id}-{i}@{BENCH_EMAIL_DOMAIN}',
+                                      password_hash='-', role='donor', is_verified=True),
+                            blood_group=BENCH_BLOOD_GROUP, city='Bench'),
+                hospital=hospital, status='pending',
+                appointment_date=datetime.now() + timedelta(days=1, minutes=i))
+            for i in range(appointments_per_worker)
+        ]
+        db.session.add_all(appointments)
+        db.session.flush()
+        appointment_ids.append([appointment.id for appointment in appointments])
+    db.session.commit()
+    return appointment_ids
+
+def _remove_workflow_data():
+    from app.models.user import User
+    from app.models.common import BloodInventory
+    for user in User.query.filter(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}')).all():
+        db.session.delete(user)
+    BloodInventory.query.filter_by(blood_group=BENCH_BLOOD_GROUP).delete()
+    db.session.commit()
+
+def _workflow_worker(app, appointment_ids, start, results):
+    """Confirm then complete each appointment, like one hospital's staff"""
+    from app.models.common import DonationAppointment
+    from app.utils import workflows
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        app.extensions['mail'].suppress = True
+        commits = []
+        count_commit = lambda db_session: commits.append(1)
+        event.listen(db.session, 'after_commit', count_commit)
+
+        errors = 0
+        start.wait()
+        began = time.perf_counter()
+        for appointment_id in appointment_ids:
+            try:
+                appointment = db.session.get(DonationAppointment, appointment_id)
+                workflows.confirm_appointment(appointment)
+                workflows.complete_appointment(appointment, 1.0)
+            except OperationalError:
+                errors += 1
+        elapsed = time.perf_counter() - began
+        event.remove(db.session, 'after_commit', count_commit)
+        results.put((elapsed, errors, len(commits)))
+
+def benchmark_workflows(app, workers, appointments_per_worker):
+    """Measure confirm + complete throughput with ``workers`` hospitals at once
+
+    Each worker is a separate process handling its own hospital's
+    appointments. Returns operations/second, the number of operations that
+    failed with a lock error and the commits made per operation.
+    """
+    # Bench stock must not raise shortage alerts for real admins
+    app.config['SHORTAGE_ALERTS'] = False
+    with app.app_context():
+        _remove_workflow_data()
+        appointment_ids = _seed_workflow_data(workers, appointments_per_worker)
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_workflow_worker, args=(app, ids, start, results))
+        for ids in appointment_ids
+    ]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        _remove_workflow_data()
+
+    # Two business operations (confirm, complete) per appointment
+    operations = workers * appointments_per_worker * 2
+    errors = sum(errors for _, errors, _ in outcomes)
+    commits = sum(commits for _, _, commits in outcomes)
+    return {
+        'workers': workers,
+        'operations': operations,
+        'errors': errors,
+        'seconds': elapsed,
+        'operations_per_second': (operations - errors) / elapsed if elapsed else 0,
+        'commits_per_operation': commits / operations if operations else 0
+    }
+
+def _seed_reservation_data(stock, request_count):
+    """Create ``stock`` bench units and ``request_count`` one-unit pending requests"""
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment, BloodDonationRecord, BloodTransfusionRequest
+    from app.utils.inventory import add_units_for_donation
+
+    donor = Donor(user=User(name='Bench Donor', email=f'donor@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                            role='donor', is_verified=True),
+                  blood_group=BENCH_BLOOD_GROUP, city='Bench')
+    hospital = Hospital(user=User(name='Bench Hospital', email=f'hospital@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                                  role='hospital', is_verified=True),
+                        phone='0', address='Bench', city='Bench', is_verified=True)
+    appointment = DonationAppointment(donor=donor, hospital=hospital, status='completed', appointment_date=datetime.now())
+    record = BloodDonationRecord(appointment=appointment, donor=donor, quantity=stock,
+                                 blood_group=BENCH_BLOOD_GROUP, donation_date=datetime.now())
+    db.session.add(record)
+    add_units_for_donation(record, location='Bench')
+
+    requests = [
+        BloodTransfusionRequest(hospital=hospital, blood_group=BENCH_BLOOD_GROUP, quantity=1, status='pending')
+        for _ in range(request_count)
+    ]
+    db.session.add_all(requests)
+    db.session.commit()
+    return [blood_request.id for blood_request in requests]
+
+def _approval_worker(app, request_ids, start, results):
+    """Approve a batch of requests, like one admin clicking through a queue"""
+    from app.models.common import BloodTransfusionRequest
+    from app.utils import workflows
+    from app.utils.inventory import InsufficientStockError
+    from app.utils.transactions import ConcurrentUpdateError
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        app.extensions['mail'].suppress = True
+        outcomes = {'approved': 0, 'insufficient': 0, 'conflicts': 0}
+        start.wait()
+        for request_id in request_ids:
+            try:
+                workflows.approve_request(db.session.get(BloodTransfusionRequest, request_id))
+                outcomes['approved'] += 1
+            except InsufficientStockError:
+                outcomes['insufficient'] += 1
+            except ConcurrentUpdateError:
+                outcomes['conflicts'] += 1
+        results.put(outcomes)
+
+def stress_reservations(app, approvers, stock, requests_per_approver):
+    """Race ``approvers`` processes for ``stock`` units and audit the result
+
+    Every request asks for one unit and there are more requests than units,
+    so approvals must stop exactly when stock runs out. Returns the approval
+    outcomes plus the audited reservation, allocation and inventory totals;
+    ``over_allocated`` is True if any unit was promised twice.
+    """
+    app.config['SHORTAGE_ALERTS'] = False
+    from app.models.common import BloodInventory, BloodUnit, Reservation
+
+    with app.app_context():
+        _remove_workflow_data()
+        request_ids = _seed_reservation_data(stock, approvers * requests_per_approver)
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_approval_worker, args=(app, request_ids[i::approvers], start, results))
+        for i in range(approvers)
+    ]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        inventory = BloodInventory.query.filter_by(blood_group=BENCH_BLOOD_GROUP).one()
+        reserved = db.session.query(db.func.coalesce(db.func.sum(Reservation.quantity), 0)).filter(
+            Reservation.blood_group == BENCH_BLOOD_GROUP).scalar()
+        allocated = BloodUnit.query.filter_by(blood_group=BENCH_BLOOD_GROUP, status='allocated').count()
+        audit = {
+            'reserved': reserved,
+            'allocated_units': allocated,
+            'available_units': inventory.available_units,
+            'reserved_units': inventory.reserved_units
+        }
+        _remove_workflow_data()
+
+    approved = sum(outcome['approved'] for outcome in outcomes)
+    return {
+        'approvers': approvers,
+        'stock': stock,
+        'requests': len(request_ids),
+        'approved': approved,
+        'insufficient': sum(outcome['insufficient'] for outcome in outcomes),
+        'conflicts': sum(outcome['conflicts'] for outcome in outcomes),
+        'seconds': elapsed,
+        **audit,
+        'over_allocated': (reserved > stock or allocated != reserved or allocated != approved
+                           or audit['available_units'] < 0
+                           or audit['available_units'] + audit['reserved_units'] != stock)
+    }
+
+def benchmark_forecast(years, blood_groups, cities, window=28, horizon=14, repeat=5):
+    """Time compute_forecast() on synthetic daily series of the given size
+
+    Returns the series count, days of history and the best of ``repeat``
+    runs in seconds.
+    """
+    import numpy as np
+    from datetime import date, timedelta
+    from app.utils.forecast import compute_forecast
+
+    days = years * 365
+    rng = np.random.default_rng(0)
+    supply = rng.poisson(2.0, size=(blood_groups * cities, days)).astype(float)
+    demand = rng.poisson(2.2, size=(blood_groups * cities, days)).astype(float)
+    first_day = date.today() - timedelta(days=days)
+
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        compute_forecast(supply, demand, first_day, window=window, horizon=horizon)
+        timings.append(time.perf_counter() - began)
+    return {'series': blood_groups * cities, 'days': days, 'seconds': min(timings)}
+
+def _booking_worker(app, donor_id, hospital_id, slot_start, start, results):
+    """Book the contested slot once, like one donor pressing submit"""
+    from app.models.donor import Donor
+    from app.utils import workflows
+    from app.utils.slots import SlotUnavailableError
+    from app.utils.transactions import ConcurrentUpdateError
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        donor = db.session.get(Donor, donor_id)
+        start.wait()
+        began = time.perf_counter()
+        try:
+            workflows.book_appointment(donor, hospital_id, slot_start)
+            outcome = 'booked'
+        except SlotUnavailableError:
+            outcome = 'full'
+        except ConcurrentUpdateError:
+            outcome = 'conflict'
+        results.put((outcome, time.perf_counter() - began))
+
+def stress_slot_booking(app, donors, capacity):
+    """Have ``donors`` processes book one slot of ``capacity`` places at once
+
+    Returns booking outcomes, the slowest booking in seconds and the audited
+    slot counter and appointment count; ``overbooked`` is True if the slot
+    holds more bookings than places or the counter disagrees with them.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment, DonationSlot
+
+    app.config['SHORTAGE_ALERTS'] = False
+    slot_start = (datetime.now() + timedelta(days=1)).replace(second=0, microsecond=0)
+    with app.app_context():
+        _remove_workflow_data()
+        hospital = Hospital(user=User(name='Bench Hospital', email=f'hospital@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                                      role='hospital', is_verified=True),
+                            phone='0', address='Bench', city='Bench', is_verified=True)
+        slot = DonationSlot(hospital=hospital, slot_start=slot_start, slot_end=slot_start + timedelta(hours=1),
+                            capacity=capacity, booked=0)
+        bench_donors = [
+            Donor(user=User(name=f'Bench Donor {i}', email=f'donor{i}@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                            role='donor', is_verified=True),
+                  blood_group=BENCH_BLOOD_GROUP, city='Bench')
+            for i in range(donors)
+        ]
+        db.session.add_all([slot, *bench_donors])
+        db.session.commit()
+        hospital_id, slot_id = hospital.id, slot.id
+        donor_ids = [donor.id for donor in bench_donors]
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_booking_worker, args=(app, donor_id, hospital_id, slot_start, start, results))
+        for donor_id in donor_ids
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        booked = db.session.get(DonationSlot, slot_id).booked
+        appointments = DonationAppointment.query.filter_by(slot_id=slot_id).count()
+        _remove_workflow_data()
+
+    counts = {name: sum(1 for outcome, _ in outcomes if outcome == name) for name in ('booked', 'full', 'conflict')}
+    return {
+        'donors': donors,
+        'capacity': capacity,
+        **counts,
+        'slowest': max(seconds for _, seconds in outcomes),
+        'slot_booked': booked,
+        'appointments': appointments,
+        'overbooked': booked > capacity or appointments != booked or counts['booked'] != booked
+    }
+
+def _duplicate_booking_worker(app, donor_id, hospital_id, appointment_date, start, results):
+    """Submit one booking for the shared donor, like one more open tab"""
+    from app.models.donor import Donor
+    from app.utils import workflows
+    from app.utils.transactions import ConcurrentUpdateError
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+        inserts = []
+        def count_insert(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO donation_appointments'):
+                inserts.append(1)
+        event.listen(db.engine, 'before_cursor_execute', count_insert)
+
+        donor = db.session.get(Donor, donor_id)
+        start.wait()
+        began = time.perf_counter()
+        try:
+            workflows.book_appointment(donor, hospital_id, appointment_date)
+            outcome = 'booked'
+        except workflows.DuplicateAppointmentError:
+            outcome = 'duplicate'
+        except ConcurrentUpdateError:
+            outcome = 'conflict'
+        elapsed = time.perf_counter() - began
+        event.remove(db.engine, 'before_cursor_execute', count_insert)
+        results.put((outcome, elapsed, len(inserts)))
+
+def stress_duplicate_booking(app, submissions):
+    """Have ``submissions`` processes book for the same donor at once
+
+    Returns booking outcomes, the slowest submission in seconds, how many
+    submissions had to retry their INSERT, and the donor's active
+    appointment count afterwards, which must be exactly one.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment
+
+    app.config['SHORTAGE_ALERTS'] = False
+    with app.app_context():
+        _remove_workflow_data()
+        hospital = Hospital(user=User(name='Bench Hospital', email=f'hospital@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                                      role='hospital', is_verified=True),
+                            phone='0', address='Bench', city='Bench', is_verified=True)
+        donor = Donor(user=User(name='Bench Donor', email=f'donor@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                                role='donor', is_verified=True),
+                      blood_group=BENCH_BLOOD_GROUP, city='Bench')
+        db.session.add_all([hospital, donor])
+        db.session.commit()
+        hospital_id, donor_id = hospital.id, donor.id
+        db.session.remove()
+        db.engine.dispose()
+
+    first = (datetime.now() + timedelta(days=1)).replace(second=0, microsecond=0)
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=_duplicate_booking_worker,
+                        args=(app, donor_id, hospital_id, first + timedelta(minutes=i), start, results))
+        for i in range(submissions)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    with app.app_context():
+        active = DonationAppointment.query.filter(
+            DonationAppointment.donor_id == donor_id,
+            DonationAppointment.status.in_(['pending', 'confirmed'])
+        ).count()
+        _remove_workflow_data()
+
+    counts = {name: sum(1 for outcome, _, _ in outcomes if outcome == name)
+              for name in ('booked', 'duplicate', 'conflict')}
+    return {
+        'submissions': submissions,
+        **counts,
+        'retried': sum(1 for _, _, inserts in outcomes if inserts > 1),
+        'slowest': max(seconds for _, seconds, _ in outcomes),
+        'active': active
+    }
+
+def _seed_reminder_data(donors, chunk_size=10000):
+    """Bulk-insert donors with last donations spread over the past year, one in 100 with a confirmed appointment"""
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment
+
+    hospital_user = User(name='Bench Hospital', email=f'hospital@{BENCH_EMAIL_DOMAIN}', password_hash='-',
+                         role='hospital', is_verified=True)
+    hospital = Hospital(user=hospital_user, phone='0', address='Bench', city='Bench', is_verified=True)
+    db.session.add(hospital)
+    db.session.flush()
+
+    today = date.today()
+    now = datetime.now()
+    for start in range(0, donors, chunk_size):
+        numbers = range(start, min(start + chunk_size, donors))
+        user_ids = db.session.scalars(
+            db.insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{'name': f'Bench Donor {n}', 'email': f'donor{n}@{BENCH_EMAIL_DOMAIN}', 'password_hash': '-',
+              'role': 'donor', 'is_verified': True} for n in numbers]
+        ).all()
+        donor_ids = db.session.scalars(
+            db.insert(Donor).returning(Donor.id, sort_by_parameter_order=True),
+            [{'user_id': user_id, 'blood_group': BENCH_BLOOD_GROUP, 'city': 'Bench', 'is_available': True,
+              'last_donation_date': today - timedelta(days=n % 365)} for n, user_id in zip(numbers, user_ids)]
+        ).all()
+        # Appointments spread over the next ten days
+        db.session.execute(db.insert(DonationAppointment), [
+            {'donor_id': donor_id, 'hospital_id': hospital.id, 'status': 'confirmed',
+             'appointment_date': now + timedelta(minutes=1 + n // 100 % 14400)}
+            for n, donor_id in zip(numbers, donor_ids) if n % 100 == 0
+        ])
+    db.session.commit()
+
+def _remove_reminder_data():
+    # Core deletes: removing a million donors through the ORM would dwarf the benchmark
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment, Notification
+
+    bench_users = db.select(User.id).where(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}'))
+    bench_donors = db.select(Donor.id).where(Donor.user_id.in_(bench_users))
+    db.session.execute(db.delete(Notification).where(Notification.user_id.in_(bench_users)))
+    db.session.execute(db.delete(DonationAppointment).where(DonationAppointment.donor_id.in_(bench_donors)))
+    db.session.execute(db.delete(Donor).where(Donor.user_id.in_(bench_users)))
+    db.session.execute(db.delete(Hospital).where(Hospital.user_id.in_(bench_users)))
+    db.session.execute(db.delete(User).where(User.email.like(f'%@{BENCH_EMAIL_DOMAIN}')))
+    db.session.commit()
+
+def benchmark_reminders(app, donors, chunk_size=1000):
+    """Time a reminder run, and an idempotent rerun, over ``donors`` seeded donors
+
+    Only the bench donors (their own blood group) are reminded, and no
+    emails are sent, so the timing is the database work alone.
+    """
+    from app.utils.reminders import send_appointment_reminders, send_eligibility_notices
+
+    with app.app_context():
+        app.config['SHORTAGE_ALERTS'] = False
+        _remove_reminder_data()
+        started = time.perf_counter()
+        _seed_reminder_data(donors)
+        seed_seconds = time.perf_counter() - started
+
+        runs = []
+        try:
+            for _ in range(2):
+                started = time.perf_counter()
+                reminders = send_appointment_reminders(app.config['REMINDER_LEAD_HOURS'], chunk_size,
+                                                       email=False, blood_group=BENCH_BLOOD_GROUP)
+                notices = send_eligibility_notices(app.config['REMINDER_LOOKBACK_DAYS'], chunk_size,
+                                                   email=False, blood_group=BENCH_BLOOD_GROUP)
+                runs.append({'reminders': reminders, 'notices': notices,
+                             'seconds': time.perf_counter() - started})
+        finally:
+            _remove_reminder_data()
+
+    return {'donors': donors, 'seed_seconds': seed_seconds, 'first': runs[0], 'rerun': runs[1]}
+
+def benchmark_photo_variants(width, height):
+    """Time variant generation for a synthetic camera-sized JPEG and compare file sizes"""
+    from PIL import Image
+    from app.utils.photos import PHOTO_FORMATS, PHOTO_SIZES, render_photo_variants, variant_filename
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Coarse and fine noise over a colour gradient: detail at every scale, like a
+        # real phone photo, so neither the source nor the variants compress unrealistically
+        source = os.path.join(folder, 'source.jpg')
+        gradient = Image.merge('RGB', [Image.linear_gradient('L').rotate(angle).resize((width, height))
+                                       for angle in (0, 90, 180)])
+        coarse = Image.merge('RGB', [Image.effect_noise((width // 64, height // 64), 96)
+                                     .resize((width, height), Image.BICUBIC) for _ in range(3)])
+        fine = Image.effect_noise((width, height), 32).convert('RGB')
+        Image.blend(Image.blend(gradient, coarse, 0.5), fine, 0.25).save(source, 'JPEG', quality=95)
+
+        started = time.perf_counter()
+        render_photo_variants(source, folder, 'bench')
+        seconds = time.perf_counter() - started
+
+        variants = {
+            (size_name, fmt): os.path.getsize(os.path.join(folder, variant_filename('bench', size_name, fmt)))
+            for size_name in PHOTO_SIZES for fmt in PHOTO_FORMATS
+        }
+        return {'width': width, 'height': height, 'source_bytes': os.path.getsize(source),
+                'seconds': seconds, 'variants': variants}
+
+def benchmark_compression(app, paths, email=None, repeat=20):
+    """Fetch ``paths`` and measure what compressing each body saves and costs
+
+    Pages are fetched logged in as ``email`` (default: the first admin).
+    Returns one row per path with its status, mimetype, raw size and, for
+    each available encoding, the compressed size and CPU milliseconds per
+    response (mean of ``repeat`` runs). ``compressed`` says whether the
+    middleware would compress that response at all.
+    """
+    from app.models.user import User
+    from app.utils.compression import COMPRESSIBLE_MIMETYPES, available_encodings, compress_body
+
+    with app.app_context():
+        user = (User.query.filter_by(email=email) if email else User.query.filter_by(role='admin')).first()
+        if user is None:
+            raise RuntimeError(f"No user {email or 'with the admin role'} to fetch pages as")
+        user_id = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    results = []
+    for path in paths:
+        response = client.get(path, headers={'Accept-Encoding': 'identity'})
+        body = response.get_data()
+        row = {'path': path, 'status': response.status_code, 'mimetype': response.mimetype,
+               'raw': len(body), 'encodings': {},
+               'compressed': response.status_code == 200 and response.mimetype in COMPRESSIBLE_MIMETYPES
+                             and len(body) >= app.config['COMPRESS_MIN_SIZE']}
+        if response.status_code == 200:
+            with app.app_context():
+                for encoding in available_encodings():
+                    started = time.process_time()
+                    for _ in range(repeat):
+                        compressed = compress_body(body, encoding)
+                    row['encodings'][encoding] = {'bytes': len(compressed),
+                                                  'cpu_ms': (time.process_time() - started) * 1000 / repeat}
+        results.append(row)
+    return results
+
+def _startup_worker(environ, paths, user_id, results):
+    """Boot a fresh app like a restarted worker and time its first requests"""
+    from app import create_app
+
+    os.environ.update(environ)
+    began = time.perf_counter()
+    app = create_app()
+    boot = time.perf_counter() - began
+
+    client = app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    first, second = [], []
+    for timings in (first, second):
+        for path in paths:
+            began = time.perf_counter()
+            client.get(path)
+            timings.append(time.perf_counter() - began)
+    results.put((boot, first, second))
+
+def benchmark_template_startup(app, paths, email=None):
+    """First-request latency of a restarted worker with and without template caching
+
+    Each scenario boots a new app in a forked process (as a worker restart
+    does) and requests ``paths`` twice, logged in as ``email`` if given.
+    Returns ``(label, boot_seconds, first_request_seconds, second_request_seconds)``
+    rows, request times per path.
+    """
+    from app.models.user import User
+
+    user_id = None
+    if email:
+        with app.app_context():
+            user = User.query.filter_by(email=email).first()
+            if user is None:
+                raise RuntimeError(f"No user {email} to fetch pages as")
+            user_id = user.id
+
+    context = multiprocessing.get_context('fork')
+    rows = []
+    with tempfile.TemporaryDirectory() as cache:
+        scenarios = [
+            ('compile on first request', {'TEMPLATE_BYTECODE_CACHE': '', 'TEMPLATE_WARMUP': 'False'}),
+            ('warm-up, empty bytecode cache', {'TEMPLATE_BYTECODE_CACHE': cache, 'TEMPLATE_WARMUP': 'True'}),
+            ('bytecode cache only', {'TEMPLATE_BYTECODE_CACHE': cache, 'TEMPLATE_WARMUP': 'False'}),
+            ('warm-up from bytecode cache', {'TEMPLATE_BYTECODE_CACHE': cache, 'TEMPLATE_WARMUP': 'True'})
+        ]
+        for label, environ in scenarios:
+            results = context.Queue()
+            process = context.Process(target=_startup_worker, args=(environ, paths, user_id, results))
+            process.start()
+            boot, first, second = results.get()
+            process.join()
+            rows.append((label, boot, first, second))
+    return rows
+
+# Run by benchmark_startup in a fresh interpreter: argv is the path to request
+# and "1" to also do the schema/admin work create_app used to do on every boot
+_STARTUP_SCRIPT = '''
+import json, sys, time
+began = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+if sys.argv[2] == "1":
+    from app.utils.bootstrap import create_schema, seed_admin
+    with app.app_context():
+        create_schema()
+        seed_admin()
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+finished = time.perf_counter()
+heavy = [name for name in ("reportlab", "qrcode", "PIL", "numpy") if name in sys.modules]
+print(json.dumps({"import": imported - began, "factory": created - imported,
+                  "first_request": finished - created, "status": status, "heavy_modules": heavy}))
+'''
+
+def benchmark_startup(app, workers, path, bootstrap=False):
+    """Import and app factory time of ``workers`` freshly started worker processes
+
+    Each worker is a new Python interpreter, as under gunicorn without
+    --preload, booted one after another against this app's database. With
+    ``bootstrap`` each also creates the schema and admin account, as every
+    worker did before ``flask bootstrap``. Returns one dict per worker with
+    ``import``, ``factory`` and ``first_request`` seconds, the first
+    request's ``status`` and the ``heavy_modules`` loaded by then.
+    """
+    import json
+    import subprocess
+    import sys
+
+    environ = dict(os.environ, DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'])
+    results = []
+    for _ in range(workers):
+        worker = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, path, '1' if bootstrap else '0'],
+                                cwd=os.path.dirname(app.root_path), env=environ,
+                                capture_output=True, text=True, check=True)
+        results.append(json.loads(worker.stdout.splitlines()[-1]))
+    return results
@@ -0,0 +1,49 @@
+import os
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+def create_schema():
+    """Create missing tables; a brand-new database is also stamped at the latest migration
+
+    Returns the names of the tables created. Databases that already have a
+    schema are left to ``flask db upgrade``.
+    """
+    from flask_migrate import stamp
+    from app import models  # noqa: F401 (registers every table with the metadata)
+
+    existing = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    created = sorted(set(inspect(db.engine).get_table_names()) - existing)
+    if not existing:
+        # create_all built the schema the migrations describe, so none of them should run on it
+        stamp()
+    return created
+
+def seed_admin(email=None, password=None):
+    """Create the admin account (ADMIN_EMAIL/ADMIN_PASSWORD) unless it exists; returns True if created"""
+    from werkzeug.security import generate_password_hash
+    from app.models.user import User
+    from app.models.admin import Admin
+
+    email = email or os.getenv('ADMIN_EMAIL', 'admin@bbms.com')
+    if User.query.filter_by(email=email).first():
+        return False
+
+    admin_user = User(
+        name='Admin',
+        email=email,
+        password_hash=generate_password_hash(password or os.getenv('ADMIN_PASSWORD', 'admin123')),
+        role='admin',
+        is_verified=True
+    )
+    try:
+        db.session.add(admin_user)
+        db.session.flush()
+        db.session.add(Admin(user_id=admin_user.id))
+        db.session.commit()
+    except IntegrityError:
+        # Another bootstrap created it first
+        db.session.rollback()
+        return False
+    return True
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from flask import current_app
+
+class NullCache:
+    """Cache that stores nothing, for CACHE_TYPE=null"""
+
+    def get(self, key):
+        return None
+
+    def get_many(self, *keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, timeout=None):
+        return False
+
+    def delete(self, key):
+        return False
+
+    def clear(self):
+        return 0
+
+class FileSystemCache:
+    """Pickled values, one file per key, in a directory every worker process shares
+
+    A write goes to a temp file renamed over the entry, so readers in other
+    workers see the old value or the new one, never half of it. Expired
+    entries read as misses and are removed by a scan every ``prune_every``
+    writes.
+    """
+
+    def __init__(self, directory, default_timeout=300, prune_every=500):
+        self.directory = directory
+        self.default_timeout = default_timeout
+        self.prune_every = prune_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry:
+                expires = pickle.load(entry)
+                if expires and expires < time.time():
+                    return None
+                return pickle.load(entry)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError):
+            # Written by an incompatible version; treat as a miss
+            self._remove(path)
+            return None
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        """Store ``value`` for ``timeout`` seconds (default_timeout if None, 0 for ever)"""
+        timeout = self.default_timeout if timeout is None else timeout
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as entry:
+            pickle.dump(time.time() + timeout if timeout else 0, entry)
+            pickle.dump(value, entry, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, self._path(key))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+        return True
+
+    def delete(self, key):
+        return self._remove(self._path(key))
+
+    def prune(self):
+        """Remove expired entries; returns how many were removed"""
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                with open(entry.path, 'rb') as stream:
+                    expires = pickle.load(stream)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                expires = 1
+            if expires and expires < now and self._remove(entry.path):
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Remove every entry; returns how many were removed"""
+        return sum(self._remove(entry.path) for entry in os.scandir(self.directory))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+def get_cache():
+    """The application's cache (see init_cache)"""
+    return current_app.extensions['cache']
+
+def init_cache(app):
+    """Set up the app cache shared by all workers: ``filesystem`` (default) or ``null``"""
+    app.config.setdefault('CACHE_TYPE', os.getenv('CACHE_TYPE', 'filesystem'))
+    app.config.setdefault('CACHE_DIR', os.getenv('CACHE_DIR', os.path.join(app.instance_path, 'cache')))
+    app.config.setdefault('CACHE_DEFAULT_TIMEOUT', int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300)))  # seconds
+
+    if app.config['CACHE_TYPE'] == 'null':
+        app.extensions['cache'] = NullCache()
+    elif app.config['CACHE_TYPE'] == 'filesystem':
+        app.extensions['cache'] = FileSystemCache(app.config['CACHE_DIR'], app.config['CACHE_DEFAULT_TIMEOUT'])
+    else:
+        raise ValueError(f"Unknown CACHE_TYPE {app.config['CACHE_TYPE']!r}; use 'filesystem' or 'null'")
@@ -1,15 +1,10 @@
-import qrcode
 import uuid
 from datetime import datetime
 from io import BytesIO
 import base64
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+# qrcode and reportlab are imported where they are used: loading them costs
+# every worker ~100ms at boot for pages few requests ever ask for
 
 def generate_certificate_id():
     """Generate unique certificate ID"""
@@ -17,6 +12,8 @@ def generate_certificate_id():
 
 def create_qr_code(data):
     """Create QR code for certificate"""
+    import qrcode
+    
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -173,6 +170,12 @@ def generate_html_certificate(donation_record):
 
 def generate_pdf_certificate(donation_record):
     """Generate PDF certificate"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    
     certificate_id = generate_certificate_id()
     qr_data = f"Certificate ID: {certificate_id}\nDonor: {donation_record.donor.user.name}\nDate: {donation_record.donation_date.strftime('%B %d, %Y')}\nBlood Group: {donation_record.blood_group}\nQuantity: {donation_record.quantity} units"
     qr_code = create_qr_code(qr_data)
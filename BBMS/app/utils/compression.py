@@ -0,0 +1,103 @@
+import os
+import zlib
+from flask import current_app, request
+from app.utils.database import get_env_bool
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always offered
+    brotli = None
+
+# Only text formats are compressed: PDFs, images and archives are compressed already
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+}
+
+def available_encodings():
+    """Content-Encodings this process can produce, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def _compressor(encoding):
+    """A streaming compressor with ``compress(chunk)`` and ``flush()`` for ``encoding``"""
+    config = current_app.config
+    if encoding == 'br':
+        return _BrotliCompressor(config['COMPRESS_BR_QUALITY'])
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    return zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+class _BrotliCompressor:
+    """brotli.Compressor behind the zlib compressobj interface"""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+def compress_body(data, encoding):
+    """Compress a whole response body with ``encoding``"""
+    compressor = _compressor(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+def _compress_stream(chunks, compressor):
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def _choose_encoding():
+    # Client preference first; on a tie the server's order (brotli before gzip) wins
+    return request.accept_encodings.best_match(available_encodings())
+
+def _compress_response(response):
+    config = current_app.config
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES or response.status_code != 200
+            or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+        return response
+    # The body depends on Accept-Encoding whether or not this client gets it compressed
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Generators and send_file bodies are compressed chunk by chunk as they are sent
+        if response.content_length is not None and response.content_length < config['COMPRESS_MIN_SIZE']:
+            return response
+        body = response.response
+        response.response = _compress_stream(response.iter_encoded(), _compressor(encoding))
+        response.direct_passthrough = False
+        if hasattr(body, 'close'):
+            response.call_on_close(body.close)
+        response.headers.pop('Content-Length', None)
+        response.headers.pop('Accept-Ranges', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(compress_body(data, encoding))
+
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The compressed bytes differ, so a strong validator no longer matches them
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_compression(app):
+    """Negotiate gzip/brotli for text responses above COMPRESS_MIN_SIZE"""
+    app.config.setdefault('COMPRESS_RESPONSES', get_env_bool('COMPRESS_RESPONSES', True))
+    # Bodies below this many bytes gain less than the Content-Encoding costs
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.getenv('COMPRESS_MIN_SIZE', 500)))
+    # Fast settings for per-request work; build-time copies of static assets use the maximum
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', int(os.getenv('COMPRESS_GZIP_LEVEL', 6)))
+    app.config.setdefault('COMPRESS_BR_QUALITY', int(os.getenv('COMPRESS_BR_QUALITY', 4)))
+
+    if app.config['COMPRESS_RESPONSES']:
+        # after_request handlers run in reverse order, so registering early makes this run last
+        app.after_request(_compress_response)
@@ -0,0 +1,192 @@
+import os
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session, before_render_template, template_rendered
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+def get_env_bool(name, default):
+    """Read a True/False environment variable"""
+    return os.getenv(name, str(default)).lower() == 'true'
+
+def dialect_insert(table):
+    """INSERT for the session's dialect, with ON CONFLICT support"""
+    from app import db
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def load_database_config(app):
+    """Read the database engine profile from the environment into app.config"""
+    # SQLite: applied as PRAGMAs on every new connection
+    app.config.setdefault('SQLITE_JOURNAL_MODE', os.getenv('SQLITE_JOURNAL_MODE', 'WAL'))
+    app.config.setdefault('SQLITE_SYNCHRONOUS', os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'))
+    app.config.setdefault('SQLITE_BUSY_TIMEOUT', int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)))  # ms
+    app.config.setdefault('SQLITE_CACHE_SIZE', int(os.getenv('SQLITE_CACHE_SIZE', -64000)))  # negative = KiB
+    app.config.setdefault('SQLITE_MMAP_SIZE', int(os.getenv('SQLITE_MMAP_SIZE', 268435456)))  # bytes
+
+    # PostgreSQL (and other server databases): connection pool settings
+    app.config.setdefault('DB_POOL_SIZE', int(os.getenv('DB_POOL_SIZE', 10)))
+    app.config.setdefault('DB_MAX_OVERFLOW', int(os.getenv('DB_MAX_OVERFLOW', 20)))
+    app.config.setdefault('DB_POOL_TIMEOUT', int(os.getenv('DB_POOL_TIMEOUT', 30)))
+    app.config.setdefault('DB_POOL_RECYCLE', int(os.getenv('DB_POOL_RECYCLE', 1800)))
+    app.config.setdefault('DB_POOL_PRE_PING', get_env_bool('DB_POOL_PRE_PING', True))
+
+    # Read replica: used only by endpoints marked with @use_read_replica
+    app.config.setdefault('REPLICA_DATABASE_URL', os.getenv('REPLICA_DATABASE_URL'))
+    app.config.setdefault('REPLICA_MAX_LAG', float(os.getenv('REPLICA_MAX_LAG', 5)))  # seconds
+    app.config.setdefault('REPLICA_HEALTH_TTL', float(os.getenv('REPLICA_HEALTH_TTL', 10)))  # seconds
+    app.config.setdefault('REPLICA_STICKY_SECONDS', float(os.getenv('REPLICA_STICKY_SECONDS', 10)))
+
+    # Fail on lazy relationship loads while a template renders (for tests/CI)
+    app.config.setdefault('SQLALCHEMY_RAISE_ON_LAZY', get_env_bool('SQLALCHEMY_RAISE_ON_LAZY', False))
+
+def get_engine_options(app, uri):
+    """Build SQLAlchemy engine options for a database URI"""
+    if uri.startswith('sqlite'):
+        # busy_timeout is set by PRAGMA; the driver timeout (seconds) matches it
+        return {'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+
+    return {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING']
+    }
+
+def get_sqlite_pragmas(app):
+    """PRAGMA statements applied to each new SQLite connection"""
+    return [
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT']}",
+        f"PRAGMA cache_size={app.config['SQLITE_CACHE_SIZE']}",
+        f"PRAGMA mmap_size={app.config['SQLITE_MMAP_SIZE']}"
+    ]
+
+def configure_database(app):
+    """Set engine options for the configured database before db.init_app()"""
+    load_database_config(app)
+    options = get_engine_options(app, app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+    replica_url = app.config['REPLICA_DATABASE_URL']
+    if replica_url:
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault('replica', {'url': replica_url, **get_engine_options(app, replica_url)})
+
+def register_engine_events(app):
+    """Apply the SQLite PRAGMA profile to every engine the app uses"""
+    from app import db
+    pragmas = get_sqlite_pragmas(app)
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', set_sqlite_pragmas)
+
+class LazyLoadInTemplateError(RuntimeError):
+    """Raised when a template triggers a lazy load with SQLALCHEMY_RAISE_ON_LAZY on"""
+
+def _template_started(sender, template, context, **extra):
+    g.rendering_templates = g.get('rendering_templates', 0) + 1
+
+def _template_finished(sender, template, context, **extra):
+    g.rendering_templates = g.get('rendering_templates', 1) - 1
+
+def _raise_on_template_lazy_load(orm_execute_state):
+    if (orm_execute_state.is_select and orm_execute_state.lazy_loaded_from is not None and has_request_context()
+            and g.get('rendering_templates', 0) > 0 and current_app.config['SQLALCHEMY_RAISE_ON_LAZY']):
+        state = orm_execute_state.lazy_loaded_from
+        raise LazyLoadInTemplateError(
+            f"Lazy load from {state.class_.__name__} while rendering a template; "
+            f"add joinedload()/selectinload() to the view's query")
+
+def register_lazy_load_guard(app):
+    """With SQLALCHEMY_RAISE_ON_LAZY, make lazy loads inside templates fail"""
+    if not app.config['SQLALCHEMY_RAISE_ON_LAZY']:
+        return
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    if not event.contains(RoutingSession, 'do_orm_execute', _raise_on_template_lazy_load):
+        event.listen(RoutingSession, 'do_orm_execute', _raise_on_template_lazy_load)
+
+def _mark_primary_write(db_session, flush_context):
+    # Read-your-writes: after a write, keep this request and the user's next
+    # few requests on the primary so they never read stale replica data
+    if has_request_context() and 'replica' in current_app.config.get('SQLALCHEMY_BINDS', {}):
+        g.wrote_to_primary = True
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+def use_read_replica(f):
+    """Decorator routing an endpoint's reads to the replica bind, if configured"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Replica health checks, cached per engine URL: url -> (checked_at, healthy)
+_replica_health = {}
+
+def get_replica_lag(engine):
+    """Return replication lag in seconds (0 when it cannot be measured)"""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            lag = connection.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )).scalar()
+            return float(lag or 0)
+        connection.execute(text('SELECT 1'))
+        return 0
+
+def replica_is_healthy(engine):
+    """Check (at most every REPLICA_HEALTH_TTL seconds) that the replica is usable"""
+    key = str(engine.url)
+    now = time.monotonic()
+    checked = _replica_health.get(key)
+    if checked and now - checked[0] < current_app.config['REPLICA_HEALTH_TTL']:
+        return checked[1]
+
+    try:
+        healthy = get_replica_lag(engine) <= current_app.config['REPLICA_MAX_LAG']
+    except Exception as e:
+        current_app.logger.warning(f"Read replica unavailable, using primary: {e}")
+        healthy = False
+    _replica_health[key] = (now, healthy)
+    return healthy
+
+def _should_read_from_replica():
+    return (
+        has_request_context()
+        and g.get('use_read_replica', False)
+        and not g.get('wrote_to_primary', False)
+        and session.get('_primary_until', 0) < time.time()
+    )
+
+class RoutingSession(Session):
+    """Session sending reads of @use_read_replica endpoints to the replica bind
+
+    Flushes, any request that has already written, and users who wrote in
+    the last REPLICA_STICKY_SECONDS always use the primary. So does every
+    request while the replica is lagging or unreachable.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _should_read_from_replica():
+            replica = self._db.engines.get('replica')
+            if replica is not None and replica_is_healthy(replica):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+event.listen(RoutingSession, 'after_flush', _mark_primary_write)
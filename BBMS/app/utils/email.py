@@ -81,8 +81,8 @@ def send_email_otp(email, otp, purpose="verification"):
             current_app.logger.error(f"SMTP fallback failed: {e2}")
             return False
 
-def send_notification_email(email, subject, message, notification_type="info"):
-    """Send notification emails"""
+def _notification_message(email, subject, message, notification_type="info"):
+    """Build a notification email"""
     
     color_map = {
         "info": "#17a2b8",
@@ -115,15 +115,30 @@ def send_notification_email(email, subject, message, notification_type="info"):
     </html>
     """
     
+    return Message(
+        subject=subject,
+        recipients=[email],
+        html=html_content,
+        sender=current_app.config.get('MAIL_USERNAME')
+    )
+
+def send_notification_email(email, subject, message, notification_type="info"):
+    """Send notification emails"""
     try:
-        msg = Message(
-            subject=subject,
-            recipients=[email],
-            html=html_content,
-            sender=current_app.config.get('MAIL_USERNAME')
-        )
-        mail.send(msg)
+        mail.send(_notification_message(email, subject, message, notification_type))
         return True
     except Exception as e:
         current_app.logger.error(f"Failed to send notification email: {e}")
-        return False 
\ No newline at end of file
+        return False
+
+def send_notification_emails(notifications):
+    """Send ``(email, subject, message, notification_type)`` notifications over one SMTP connection"""
+    sent = 0
+    try:
+        with mail.connect() as connection:
+            for notification in notifications:
+                connection.send(_notification_message(*notification))
+                sent += 1
+    except Exception as e:
+        current_app.logger.error(f"Failed to send notification emails ({sent}/{len(notifications)} sent): {e}")
+    return sent
@@ -0,0 +1,146 @@
+import numpy as np
+from datetime import date, datetime, time, timedelta
+from app import db
+from app.utils.cache import get_cache
+
+def load_daily_series(start, end):
+    """Daily donated (supply) and requested (demand) units per blood group and city
+
+    One UNION ALL query, grouped in the database by day, blood group and the
+    hospital's city. Returns ``(keys, supply, demand)``: ``keys`` is a list of
+    ``(blood_group, city)`` and the two arrays have shape
+    ``(len(keys), days)`` with one column per day from ``start`` to ``end``.
+    """
+    from app.models.hospital import Hospital
+    from app.models.common import BloodDonationRecord, BloodTransfusionRequest, DonationAppointment
+
+    donation_day = db.func.date(BloodDonationRecord.donation_date)
+    request_day = db.func.date(BloodTransfusionRequest.created_at)
+    donations = (
+        db.select(db.literal(0).label('kind'), donation_day.label('day'), BloodDonationRecord.blood_group,
+                  Hospital.city, db.func.sum(BloodDonationRecord.quantity))
+        .join(DonationAppointment, BloodDonationRecord.appointment_id == DonationAppointment.id)
+        .join(Hospital, DonationAppointment.hospital_id == Hospital.id)
+        .where(BloodDonationRecord.donation_date >= start, BloodDonationRecord.donation_date < end + timedelta(days=1))
+        .group_by(donation_day, BloodDonationRecord.blood_group, Hospital.city)
+    )
+    requests = (
+        db.select(db.literal(1).label('kind'), request_day.label('day'), BloodTransfusionRequest.blood_group,
+                  Hospital.city, db.func.sum(BloodTransfusionRequest.quantity))
+        .join(Hospital, BloodTransfusionRequest.hospital_id == Hospital.id)
+        .where(BloodTransfusionRequest.created_at >= start,
+               BloodTransfusionRequest.created_at < end + timedelta(days=1),
+               BloodTransfusionRequest.status != 'rejected')
+        .group_by(request_day, BloodTransfusionRequest.blood_group, Hospital.city)
+    )
+    rows = db.session.execute(db.union_all(donations, requests)).all()
+
+    days = (end - start).days + 1
+    if not rows:
+        return [], np.zeros((0, days)), np.zeros((0, days))
+
+    kinds, row_days, blood_groups, cities, quantities = zip(*rows)
+    # SQLite returns date() as text, PostgreSQL as a date; both format as YYYY-MM-DD
+    day_index = (np.array([str(day) for day in row_days], dtype='datetime64[D]')
+                 - np.datetime64(start, 'D')).astype(int)
+    pairs = np.array([f'{group}\t{city}' for group, city in zip(blood_groups, cities)])
+    labels, series_index = np.unique(pairs, return_inverse=True)
+
+    series = np.zeros((2, len(labels), days))
+    np.add.at(series, (np.array(kinds), series_index.ravel(), day_index), np.array(quantities, dtype=float))
+    keys = [tuple(label.split('\t', 1)) for label in labels]
+    return keys, series[0], series[1]
+
+def moving_average(series, window):
+    """Trailing moving average along the last axis (NaN until ``window`` days exist)"""
+    cumulative = np.cumsum(series, axis=-1)
+    averages = np.full(series.shape, np.nan)
+    averages[..., window - 1] = cumulative[..., window - 1] / window
+    averages[..., window:] = (cumulative[..., window:] - cumulative[..., :-window]) / window
+    return averages
+
+def weekday_factors(series, first_weekday):
+    """Day-of-week seasonality: each weekday's mean divided by the overall mean
+
+    Returns an array of shape ``(series, 7)`` indexed by ``date.weekday()``;
+    series with no history get a flat factor of 1.
+    """
+    weekdays = (first_weekday + np.arange(series.shape[-1])) % 7
+    one_hot = np.eye(7)[weekdays]
+    weekday_means = (series @ one_hot) / one_hot.sum(axis=0).clip(min=1)
+    overall = series.mean(axis=-1, keepdims=True)
+    return np.divide(weekday_means, overall, out=np.ones_like(weekday_means), where=overall > 0)
+
+def compute_forecast(supply, demand, first_day, window=28, horizon=14):
+    """Project supply, demand and shortfall for the next ``horizon`` days
+
+    The trailing ``window``-day moving average is the level, scaled by each
+    series' weekday seasonality. Every step is an array operation over all
+    series at once. Returns a dict of 1-D arrays, one entry per series.
+    """
+    window = min(window, supply.shape[-1])
+    history_end = first_day + timedelta(days=supply.shape[-1])
+    future_weekdays = (history_end.weekday() + np.arange(horizon)) % 7
+
+    supply_level = moving_average(supply, window)[:, -1]
+    demand_level = moving_average(demand, window)[:, -1]
+    projected_supply = supply_level[:, None] * weekday_factors(supply, first_day.weekday())[:, future_weekdays]
+    projected_demand = demand_level[:, None] * weekday_factors(demand, first_day.weekday())[:, future_weekdays]
+
+    projected_supply = projected_supply.sum(axis=1)
+    projected_demand = projected_demand.sum(axis=1)
+    return {
+        'supply_average': supply_level,
+        'demand_average': demand_level,
+        'projected_supply': projected_supply,
+        'projected_demand': projected_demand,
+        'projected_shortfall': np.clip(projected_demand - projected_supply, 0, None)
+    }
+
+def get_forecast(window=28, horizon=14, history=365, limit=50):
+    """Shortfall forecast per blood group and city, cached for the rest of the day
+
+    Cached in the shared app cache, so every worker reuses it and entries
+    expire at midnight. Callers clamp the parameters (see api/dashboard_stats),
+    which bounds the number of keys.
+    """
+    today = date.today()
+    cache = get_cache()
+    cache_key = f'forecast:{today.isoformat()}:{window}:{horizon}:{history}:{limit}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    start = today - timedelta(days=history)
+    end = today - timedelta(days=1)
+    keys, supply, demand = load_daily_series(start, end)
+    forecast = compute_forecast(supply, demand, start, window=window, horizon=horizon)
+
+    blood_groups, group_index = np.unique(np.array([key[0] for key in keys], dtype=str), return_inverse=True)
+    group_shortfall = np.bincount(group_index.ravel(), weights=forecast['projected_shortfall'],
+                                  minlength=len(blood_groups))
+
+    # Worst shortfalls first
+    order = np.argsort(-forecast['projected_shortfall'])[:limit]
+    result = {
+        'generated_on': today.isoformat(),
+        'window_days': window,
+        'horizon_days': horizon,
+        'history_days': history,
+        'blood_groups': [{'blood_group': str(blood_groups[i]), 'projected_shortfall': round(float(group_shortfall[i]), 2)}
+                         for i in np.argsort(-group_shortfall)],
+        'series': [{
+            'blood_group': keys[i][0],
+            'city': keys[i][1],
+            'supply_average': round(float(forecast['supply_average'][i]), 3),
+            'demand_average': round(float(forecast['demand_average'][i]), 3),
+            'projected_supply': round(float(forecast['projected_supply'][i]), 2),
+            'projected_demand': round(float(forecast['projected_demand'][i]), 2),
+            'projected_shortfall': round(float(forecast['projected_shortfall'][i]), 2)
+        } for i in order]
+    }
+
+    # Only today's forecasts are worth keeping
+    midnight = datetime.combine(today + timedelta(days=1), time.min)
+    cache.set(cache_key, result, timeout=max(int((midnight - datetime.now()).total_seconds()), 1))
+    return result
@@ -0,0 +1,157 @@
+import uuid
+from flask import current_app, g, has_app_context, has_request_context
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event, inspect
+from app.utils.cache import get_cache
+from app.utils.database import RoutingSession
+
+# Which cached owner a row belongs to: table -> (owner kind, column holding the owner's id).
+# A committed write to one of these rows invalidates that owner's fragments.
+FRAGMENT_OWNERS = {
+    'donors': ('donor', 'id'),
+    'donation_appointments': ('donor', 'donor_id'),
+    'blood_donation_records': ('donor', 'donor_id'),
+    'hospitals': ('hospital', 'id'),
+    'blood_transfusion_requests': ('hospital', 'hospital_id'),
+    'recipients': ('hospital', 'hospital_id')
+}
+
+# Owner scope invalidated by writes that cannot be traced to single owners (bulk UPDATE/DELETE)
+ALL_OWNERS = '*'
+
+# Columns shown inside other owners' fragments, such as the hospital's name in a
+# donor's recent appointments: changing them invalidates every owner.
+SHARED_COLUMNS = {
+    'users': ('name',)
+}
+
+def fragment_owner(user):
+    """The cache scope of a user's fragments: their donor or hospital profile, else the user"""
+    if user.role == 'donor' and user.donor:
+        return f'donor:{user.donor.id}'
+    if user.role == 'hospital' and user.hospital:
+        return f'hospital:{user.hospital.id}'
+    return f'user:{user.id}'
+
+def _version_key(owner):
+    return f'fragment-version:{owner}'
+
+def _owner_version(owner):
+    """Current version of an owner's fragments, combined with the global one; read once per request"""
+    versions = g.setdefault('fragment_versions', {})
+    if owner not in versions:
+        cache = get_cache()
+        everyone, own = cache.get_many(_version_key(ALL_OWNERS), _version_key(owner))
+        versions[owner] = f'{everyone or 0}.{own or 0}'
+    return versions[owner]
+
+def render_fragment(name, ttl, render):
+    """Return the cached HTML of fragment ``name`` for the current user, rendering it on a miss
+
+    The key carries the owner's version, so invalidation is one version
+    bump and stale entries simply expire.
+    """
+    if not current_user.is_authenticated:
+        return render()
+    owner = fragment_owner(current_user)
+    key = f'fragment:{owner}:{_owner_version(owner)}:{name}'
+    cache = get_cache()
+    html = cache.get(key)
+    if html is None:
+        html = str(render())
+        cache.set(key, html, ttl)
+    return Markup(html)
+
+class FragmentCacheExtension(Extension):
+    """``{% cache name[, ttl] %}...{% endcache %}``: cache a block of HTML per user
+
+    Queries for the block belong inside it (call a loader passed by the
+    view), so a hit skips them as well as the rendering. ``ttl`` defaults
+    to CACHE_DEFAULT_TIMEOUT seconds.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, name, ttl, caller):
+        return render_fragment(name, ttl, caller)
+
+def _pending_invalidations(db_session):
+    return db_session.info.setdefault('fragment_invalidations', set())
+
+def _owners_of_rows(table, rows):
+    """Owner scopes for inserted rows, or ALL_OWNERS when a row does not name its owner"""
+    kind, column = FRAGMENT_OWNERS[table]
+    owners = set()
+    for row in rows:
+        if row.get(column) is None:
+            return {ALL_OWNERS}
+        owners.add(f'{kind}:{row[column]}')
+    return owners
+
+def _collect_flushed_owners(db_session, flush_context):
+    pending = _pending_invalidations(db_session)
+    for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        owner = FRAGMENT_OWNERS.get(table)
+        if owner:
+            pending.add(f'{owner[0]}:{getattr(instance, owner[1])}')
+        elif table in SHARED_COLUMNS and instance not in db_session.new:
+            state = inspect(instance)
+            if instance in db_session.deleted or any(state.attrs[column].history.has_changes()
+                                                     for column in SHARED_COLUMNS[table]):
+                pending.add(ALL_OWNERS)
+
+def _collect_statement_owners(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement.table, 'name', None)
+    if table in SHARED_COLUMNS and not orm_execute_state.is_insert:
+        _pending_invalidations(orm_execute_state.session).add(ALL_OWNERS)
+        return
+    if table not in FRAGMENT_OWNERS:
+        return
+    pending = _pending_invalidations(orm_execute_state.session)
+    if orm_execute_state.is_insert:
+        rows = orm_execute_state.parameters
+        if isinstance(rows, dict):
+            rows = [rows] if rows else []
+        # Single-row inserts built with .values() carry their row in the statement
+        pending.update(_owners_of_rows(table, rows or [orm_execute_state.statement.compile().params]))
+    else:
+        pending.add(ALL_OWNERS)
+
+def _bump_versions(db_session):
+    owners = db_session.info.pop('fragment_invalidations', None)
+    if not owners or not has_app_context() or 'cache' not in current_app.extensions:
+        return
+    cache = get_cache()
+    for owner in owners:
+        # A fresh token rather than a counter: concurrent bumps cannot cancel out
+        cache.set(_version_key(owner), uuid.uuid4().hex, 0)
+    if has_request_context():
+        g.pop('fragment_versions', None)
+
+def _discard_invalidations(db_session):
+    db_session.info.pop('fragment_invalidations', None)
+
+def init_fragment_cache(app):
+    """Enable ``{% cache %}`` in templates and invalidate fragments when their rows change"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    # Versions are bumped only after commit, so a concurrent render can never
+    # cache pre-commit data under the new version
+    for name, listener in (('after_flush', _collect_flushed_owners),
+                           ('do_orm_execute', _collect_statement_owners),
+                           ('after_commit', _bump_versions),
+                           ('after_rollback', _discard_invalidations)):
+        if not event.contains(RoutingSession, name, listener):
+            event.listen(RoutingSession, name, listener)
@@ -1,6 +1,8 @@
 from functools import wraps
 from flask import flash, redirect, url_for, abort
 from flask_login import current_user
+from app import db
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 import os
 import csv
@@ -50,6 +52,47 @@ def get_request_statuses():
     """Get list of request statuses"""
     return ['pending', 'approved', 'fulfilled', 'rejected']
 
+def get_status_counts(query, status_column, buckets=None):
+    """Count rows per status in a single GROUP BY query.
+
+    ``buckets`` maps extra tab names to SQL conditions that are counted in the
+    same pass (e.g. the "upcoming" appointments tab). The result always has an
+    ``all`` key with the total row count.
+    """
+    buckets = buckets or {}
+    columns = [status_column, db.func.count()]
+    columns += [db.func.sum(db.case((condition, 1), else_=0)) for condition in buckets.values()]
+    
+    counts = {'all': 0}
+    counts.update({name: 0 for name in buckets})
+    for row in query.with_entities(*columns).group_by(status_column).all():
+        status, total = row[0], row[1]
+        counts[status] = total
+        counts['all'] += total
+        for name, value in zip(buckets, row[2:]):
+            counts[name] += value or 0
+    return counts
+
+def get_appointment_counts(query):
+    """Get appointment tab counts (upcoming, per status and all) in one query"""
+    from app.models.common import DonationAppointment
+    upcoming = db.and_(
+        DonationAppointment.status.in_(['pending', 'confirmed']),
+        DonationAppointment.appointment_date >= datetime.now()
+    )
+    counts = get_status_counts(query, DonationAppointment.status, {'upcoming': upcoming})
+    for status in get_appointment_statuses():
+        counts.setdefault(status, 0)
+    return counts
+
+def get_request_counts(query):
+    """Get blood request counts per status in one query"""
+    from app.models.common import BloodTransfusionRequest
+    counts = get_status_counts(query, BloodTransfusionRequest.status)
+    for status in get_request_statuses():
+        counts.setdefault(status, 0)
+    return counts
+
 def get_cities():
     """Get list of cities from CSV file"""
     try:
@@ -79,12 +122,12 @@ def get_fallback_cities():
 def get_hospitals_by_city(city):
     """Get hospitals in a specific city"""
     from app.models.hospital import Hospital
-    return Hospital.query.filter_by(city=city, is_verified=True).all()
+    return Hospital.query.options(joinedload(Hospital.user)).filter_by(city=city, is_verified=True).all()
 
 def get_donors_by_blood_group(blood_group, city=None):
     """Get donors by blood group and optionally by city"""
     from app.models.donor import Donor
-    query = Donor.query.filter_by(blood_group=blood_group, is_available=True)
+    query = Donor.query.options(joinedload(Donor.user)).filter_by(blood_group=blood_group, is_available=True)
     if city:
         query = query.filter_by(city=city)
     return query.all()
@@ -105,6 +148,61 @@ def is_valid_donation_interval(last_donation_date, min_interval_days=56):
     days_since_last = (today - last_donation_date).days
     return days_since_last >= min_interval_days
 
+def _running_cli_command():
+    """Whether the app was loaded by a ``flask`` command other than ``flask run``"""
+    import click
+    
+    context = click.get_current_context(silent=True)
+    return context is not None and context.info_name != 'run'
+
+def _running_reloader_watcher(app):
+    """Whether this is the ``flask run`` reloader's watcher process, which serves no requests
+
+    The reloader runs when ``--reload`` is given, or by default in debug
+    mode; its serving child has WERKZEUG_RUN_MAIN set.
+    """
+    import click
+    
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        return False
+    context = click.get_current_context(silent=True)
+    if context is None or context.info_name != 'run':
+        return False
+    reload = context.params.get('reload')
+    return app.debug if reload is None else reload
+
+def start_periodic_job(app, name, interval_minutes, job):
+    """Run ``job()`` in an app context every ``interval_minutes`` on a daemon thread
+
+    Does nothing unless SCHEDULER_ENABLED is set, when the interval is 0,
+    or when a ``flask`` command (``db upgrade``, ``bootstrap``...) loaded
+    the app. Enable it in one process only, not in every gunicorn worker;
+    otherwise run the matching ``flask`` command from cron. When the
+    reloader is on, only its child process, which serves requests, starts
+    the thread.
+    """
+    import threading
+    import time
+    from app.utils.database import get_env_bool
+    
+    app.config.setdefault('SCHEDULER_ENABLED', get_env_bool('SCHEDULER_ENABLED', False))
+    if not app.config['SCHEDULER_ENABLED'] or interval_minutes <= 0 or _running_cli_command():
+        return
+    if _running_reloader_watcher(app):
+        return
+    
+    def loop():
+        while True:
+            time.sleep(interval_minutes * 60)
+            with app.app_context():
+                try:
+                    result = job()
+                    app.logger.info(f"{name}: {result}")
+                except Exception as e:
+                    app.logger.error(f"{name} failed: {e}")
+    
+    threading.Thread(target=loop, name=name, daemon=True).start()
+
 def generate_unique_filename(original_filename):
     """Generate unique filename for uploads"""
     from datetime import datetime
@@ -0,0 +1,295 @@
+import math
+import os
+from datetime import datetime, date, timedelta
+from app import db
+from app.models.common import BloodUnit, BloodInventory, Reservation
+from app.utils.database import dialect_insert
+from app.utils.shortage import apply_shortage_deltas, record_supply_change
+from app.utils.transactions import retry_on_conflict, unit_of_work
+
+# Storage life in days from collection, per component type
+COMPONENT_SHELF_LIFE = {
+    'whole_blood': 35,
+    'red_cells': 42,
+    'plasma': 365,
+    'platelets': 5
+}
+
+class InsufficientStockError(RuntimeError):
+    """Raised when there are not enough unexpired units to allocate"""
+
+    def __init__(self, blood_group, requested, available):
+        super().__init__(f"Only {available} unexpired {blood_group} units available, {requested} requested")
+        self.blood_group = blood_group
+        self.requested = requested
+        self.available = available
+
+def units_for_quantity(quantity):
+    """Number of bags needed for a quantity in units (partial bags count as one)"""
+    return max(1, math.ceil(quantity))
+
+def get_inventory(blood_group):
+    """Inventory row for a blood group, created empty on first use"""
+    inventory = BloodInventory.query.filter_by(blood_group=blood_group).first()
+    if inventory is None:
+        # Two first donations may race to create the row; the loser's insert does nothing
+        db.session.execute(
+            dialect_insert(BloodInventory.__table__)
+            .values(blood_group=blood_group, total_units=0, available_units=0, reserved_units=0, version=1)
+            .on_conflict_do_nothing(index_elements=['blood_group'])
+        )
+        inventory = BloodInventory.query.filter_by(blood_group=blood_group).one()
+    return inventory
+
+def add_units_for_donation(donation_record, location=None, city=None, component_type='whole_blood'):
+    """Create one available blood unit per bag collected in a donation
+
+    ``city`` is where the donation was collected, for the shortage counters.
+    """
+    collection_date = donation_record.donation_date.date()
+    expiry_date = collection_date + timedelta(days=COMPONENT_SHELF_LIFE[component_type])
+    units = [
+        BloodUnit(
+            donation_record=donation_record,
+            blood_group=donation_record.blood_group,
+            component_type=component_type,
+            collection_date=collection_date,
+            expiry_date=expiry_date,
+            status='available',
+            location=location
+        )
+        for _ in range(units_for_quantity(donation_record.quantity))
+    ]
+    db.session.add_all(units)
+
+    # Versioned update: fails the flush if another transaction changed the row
+    inventory = get_inventory(donation_record.blood_group)
+    inventory.total_units += len(units)
+    inventory.available_units += len(units)
+    record_supply_change(donation_record.blood_group, city, len(units))
+    return units
+
+def add_units_for_donations(donations, location=None, city=None, component_type='whole_blood'):
+    """Bulk add_units_for_donation for ``(record_id, blood_group, quantity, donation_date)`` rows
+
+    All units go in with one multi-row INSERT, and each blood group's
+    inventory row gets a single versioned update. Returns the units added.
+    """
+    rows = []
+    added = {}
+    for record_id, blood_group, quantity, donation_date in donations:
+        collection_date = donation_date.date()
+        count = units_for_quantity(quantity)
+        rows.extend({
+            'donation_record_id': record_id,
+            'blood_group': blood_group,
+            'component_type': component_type,
+            'collection_date': collection_date,
+            'expiry_date': collection_date + timedelta(days=COMPONENT_SHELF_LIFE[component_type]),
+            'status': 'available',
+            'location': location
+        } for _ in range(count))
+        added[blood_group] = added.get(blood_group, 0) + count
+    if not rows:
+        return 0
+    db.session.execute(db.insert(BloodUnit), rows)
+
+    for blood_group, count in added.items():
+        inventory = get_inventory(blood_group)
+        inventory.total_units += count
+        inventory.available_units += count
+    apply_shortage_deltas({(blood_group, city): (count, 0) for blood_group, count in added.items()})
+    return len(rows)
+
+def reserve_stock(blood_request):
+    """Move a request's units from available to reserved stock
+
+    The inventory row is updated with a compare-and-swap on its version
+    column, checked when the session flushes here. A concurrent change makes
+    the flush fail with StaleDataError; callers retry the whole unit of work
+    with @retry_on_conflict. Raises InsufficientStockError if stock is short.
+    """
+    needed = units_for_quantity(blood_request.quantity)
+    inventory = BloodInventory.query.filter_by(blood_group=blood_request.blood_group).first()
+    available = inventory.available_units if inventory else 0
+    if available < needed:
+        raise InsufficientStockError(blood_request.blood_group, needed, int(available))
+
+    inventory.available_units -= needed
+    inventory.reserved_units += needed
+    reservation = Reservation(request=blood_request, blood_group=blood_request.blood_group, quantity=needed)
+    db.session.add(reservation)
+    db.session.flush()
+    return reservation
+
+def allocate_units(blood_request, component_type='whole_blood'):
+    """Allocate units to a request, first-expiry-first-out
+
+    Picks the soonest-expiring unexpired units with one range scan of
+    ix_blood_units_blood_group_status_expiry_date and claims them in the same
+    UPDATE, so concurrent approvals can never take the same bag. On
+    PostgreSQL the candidate rows are locked with FOR UPDATE SKIP LOCKED;
+    SQLite serializes the statement under its write lock. Raises
+    InsufficientStockError when stock runs short; run it inside a unit of
+    work so the partial claim is rolled back.
+    """
+    needed = units_for_quantity(blood_request.quantity)
+    candidates = (
+        db.select(BloodUnit.id)
+        .where(BloodUnit.blood_group == blood_request.blood_group,
+               BloodUnit.status == 'available',
+               BloodUnit.component_type == component_type,
+               BloodUnit.expiry_date >= date.today())
+        .order_by(BloodUnit.expiry_date)
+        .limit(needed)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.session.scalars(
+        db.update(BloodUnit)
+        .where(BloodUnit.id.in_(candidates), BloodUnit.status == 'available')
+        .values(status='allocated', request_id=blood_request.id, allocated_at=datetime.now())
+        .returning(BloodUnit.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    if len(claimed) < needed:
+        raise InsufficientStockError(blood_request.blood_group, needed, len(claimed))
+    _record_unit_supply(blood_request.blood_group, claimed, -1)
+    return len(claimed)
+
+def _settle_reservations(blood_request, status):
+    """Move a request's active reservations to ``status``; returns the units they held
+
+    Conditional on the reservation still being active, so of two concurrent
+    settlements only one moves any units.
+    """
+    quantities = db.session.scalars(
+        db.update(Reservation)
+        .where(Reservation.request_id == blood_request.id, Reservation.status == 'active')
+        .values(status=status)
+        .returning(Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return sum(quantities)
+
+def fulfil_reservation(blood_request):
+    """Hand over a request's reserved units: they leave stock and are marked used
+
+    The reservation becomes fulfilled and the inventory row drops the units
+    from reserved and total stock, with the same versioned compare-and-swap
+    as reserve_stock. Returns the units handed over.
+    """
+    reserved = _settle_reservations(blood_request, 'fulfilled')
+    db.session.execute(
+        db.update(BloodUnit)
+        .where(BloodUnit.request_id == blood_request.id, BloodUnit.status == 'allocated')
+        .values(status='used')
+        .execution_options(synchronize_session=False)
+    )
+    if reserved:
+        inventory = get_inventory(blood_request.blood_group)
+        inventory.reserved_units -= reserved
+        inventory.total_units -= reserved
+        db.session.flush()
+    return reserved
+
+def release_reservation(blood_request):
+    """Return an approved request's units to stock when it will not be fulfilled
+
+    The reservation becomes released. Allocated units go back to available,
+    except those that expired meanwhile, which are marked expired and leave
+    total stock. The inventory row is updated with the versioned
+    compare-and-swap. Returns the units released.
+    """
+    reserved = _settle_reservations(blood_request, 'released')
+    allocated = (BloodUnit.request_id == blood_request.id, BloodUnit.status == 'allocated')
+    expired = db.session.execute(
+        db.update(BloodUnit)
+        .where(*allocated, BloodUnit.expiry_date < date.today())
+        .values(status='expired', request_id=None, allocated_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    returned = db.session.scalars(
+        db.update(BloodUnit)
+        .where(*allocated)
+        .values(status='available', request_id=None, allocated_at=None)
+        .returning(BloodUnit.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if reserved:
+        inventory = get_inventory(blood_request.blood_group)
+        inventory.reserved_units -= reserved
+        inventory.available_units += len(returned)
+        inventory.total_units -= expired
+        db.session.flush()
+    _record_unit_supply(blood_request.blood_group, returned, 1)
+    return reserved
+
+def _record_unit_supply(blood_group, unit_ids, sign):
+    # Units leave (sign -1) or rejoin (+1) the supply of the city they were collected in
+    if not unit_ids:
+        return
+    from app.models.hospital import Hospital
+    from app.models.common import BloodDonationRecord, DonationAppointment
+
+    origins = db.session.execute(
+        db.select(Hospital.city, db.func.count())
+        .select_from(BloodUnit)
+        .join(BloodDonationRecord, BloodUnit.donation_record_id == BloodDonationRecord.id)
+        .join(DonationAppointment, BloodDonationRecord.appointment_id == DonationAppointment.id)
+        .join(Hospital, DonationAppointment.hospital_id == Hospital.id)
+        .where(BloodUnit.id.in_(unit_ids))
+        .group_by(Hospital.city)
+    ).all()
+    apply_shortage_deltas({(blood_group, city): (sign * count, 0) for city, count in origins})
+
+def expire_units(blood_group=None):
+    """Mark available units past their expiry date expired and take them out of stock
+
+    Each affected inventory row drops the units from available and total
+    stock with the versioned compare-and-swap, and the shortage counters
+    lose them as supply. Returns the number of units expired.
+    """
+    statement = (
+        db.update(BloodUnit)
+        .where(BloodUnit.status == 'available', BloodUnit.expiry_date < date.today())
+        .values(status='expired')
+        .returning(BloodUnit.id, BloodUnit.blood_group)
+        .execution_options(synchronize_session=False)
+    )
+    if blood_group:
+        statement = statement.where(BloodUnit.blood_group == blood_group)
+    expired = {}
+    for unit_id, unit_blood_group in db.session.execute(statement):
+        expired.setdefault(unit_blood_group, []).append(unit_id)
+
+    for unit_blood_group, unit_ids in expired.items():
+        inventory = get_inventory(unit_blood_group)
+        inventory.total_units -= len(unit_ids)
+        inventory.available_units -= len(unit_ids)
+        _record_unit_supply(unit_blood_group, unit_ids, -1)
+    db.session.flush()
+    return sum(len(unit_ids) for unit_ids in expired.values())
+
+@retry_on_conflict()
+def run_expiry_sweep():
+    """Expire every out-of-date unit in its own transaction; returns the count"""
+    with unit_of_work():
+        return expire_units()
+
+def init_inventory(app):
+    """Expire out-of-date units periodically (see start_periodic_job)"""
+    from app.utils.helpers import start_periodic_job
+
+    app.config.setdefault('EXPIRY_SWEEP_INTERVAL_MINUTES', int(os.getenv('EXPIRY_SWEEP_INTERVAL_MINUTES', 60)))
+    start_periodic_job(app, 'expiry-sweeper', app.config['EXPIRY_SWEEP_INTERVAL_MINUTES'], run_expiry_sweep)
+
+def get_available_units(blood_group=None):
+    """Count unexpired available units, per blood group"""
+    query = db.session.query(BloodUnit.blood_group, db.func.count()).filter(
+        BloodUnit.status == 'available',
+        BloodUnit.expiry_date >= date.today()
+    )
+    if blood_group:
+        query = query.filter(BloodUnit.blood_group == blood_group)
+    return dict(query.group_by(BloodUnit.blood_group).all())
@@ -0,0 +1,143 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for
+from app import db
+from app.utils.database import get_env_bool
+from app.utils.storage import acquire_file, release_file, store_upload
+from app.utils.transactions import after_commit
+
+# Square avatar variants, edge length in pixels (about twice the size they are displayed at)
+PHOTO_SIZES = {
+    'thumb': 64,
+    'small': 160,
+    'medium': 400
+}
+
+# Output formats: WebP for browsers that take it, JPEG as the fallback
+PHOTO_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})
+}
+
+ALLOWED_PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+_executor = None
+
+def photo_folder():
+    return os.path.join(current_app.config['STORAGE_FOLDER'], 'photos')
+
+def variant_filename(key, size, fmt):
+    return f'{key}_{size}.{fmt}'
+
+def render_photo_variants(source, folder, key):
+    """Decode ``source`` once and write every size and format variant into ``folder``
+
+    JPEGs are decoded at a reduced scale (draft mode) just large enough for
+    the biggest variant. The EXIF orientation is applied to the pixels and
+    no metadata is written out. Returns the written file paths.
+    """
+    # Only background workers decode images; web workers boot without Pillow
+    from PIL import Image, ImageOps
+
+    largest = max(PHOTO_SIZES.values())
+    with Image.open(source) as image:
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    paths = []
+    os.makedirs(folder, exist_ok=True)
+    # Largest first, so each smaller variant resamples the previous one
+    for size_name, size in sorted(PHOTO_SIZES.items(), key=lambda item: item[1], reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for fmt, (pil_format, options) in PHOTO_FORMATS.items():
+            path = os.path.join(folder, variant_filename(key, size_name, fmt))
+            # Write then rename, so a variant is never served half-written
+            image.save(f'{path}.tmp', pil_format, **options)
+            os.replace(f'{path}.tmp', path)
+            paths.append(path)
+    return paths
+
+def remove_photo(photo):
+    """Delete a stored photo's variants, or a legacy single-file upload"""
+    if not photo:
+        return
+    if os.path.splitext(photo)[1]:
+        paths = [os.path.join(current_app.config['UPLOAD_FOLDER'], photo)]
+    else:
+        paths = [os.path.join(photo_folder(), variant_filename(photo, size_name, fmt))
+                 for size_name in PHOTO_SIZES for fmt in PHOTO_FORMATS]
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _has_variants(key):
+    return all(os.path.exists(os.path.join(photo_folder(), variant_filename(key, size_name, fmt)))
+               for size_name in PHOTO_SIZES for fmt in PHOTO_FORMATS)
+
+def process_donor_photo(app, donor_id, sha256, source):
+    """Build variants for a stored upload and switch the donor over to them
+
+    Photos are keyed by the upload's content hash, so re-uploading the same
+    bytes reuses the variants already on disk. The donor's reference moves
+    from the old blob to the new one in a single commit; an upload that
+    fails to decode stays unreferenced and the storage sweeper removes it.
+    """
+    from app.models.donor import Donor
+
+    with app.app_context():
+        if not _has_variants(sha256):
+            try:
+                render_photo_variants(source, photo_folder(), sha256)
+            except Exception as e:
+                app.logger.error(f"Could not process photo for donor {donor_id}: {e}")
+                remove_photo(sha256)
+                return None
+
+        donor = db.session.get(Donor, donor_id)
+        if donor is None or donor.photo == sha256:
+            return sha256
+        old_photo, donor.photo = donor.photo, sha256
+        acquire_file(sha256)
+        # Photos stored before content addressing have no blob; delete their files directly
+        unmanaged = old_photo and not release_file(old_photo)
+        db.session.commit()
+        if unmanaged:
+            remove_photo(old_photo)
+        return sha256
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # One worker: decoding large photos is CPU-bound and should not starve requests
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='photo-worker')
+    return _executor
+
+def queue_donor_photo(donor, file):
+    """Store an upload and process it in the background once the request commits
+
+    The donor keeps their current photo until the new variants are ready.
+    """
+    sha256, path = store_upload(file)
+    app = current_app._get_current_object()
+    if app.config['PHOTO_PROCESSING_ASYNC']:
+        after_commit(_get_executor().submit, process_donor_photo, app, donor.id, sha256, path)
+    else:
+        after_commit(process_donor_photo, app, donor.id, sha256, path)
+
+def photo_url(photo, size='small', fmt='jpg'):
+    """URL of one variant of a stored photo (legacy uploads have a single file)"""
+    if not photo:
+        return None
+    if os.path.splitext(photo)[1]:
+        return url_for('static', filename=f'uploads/{photo}')
+    return url_for('donor.photo', filename=variant_filename(photo, size, fmt))
+
+def init_photos(app):
+    """Photo processing settings and the ``photo_url`` template helper"""
+    app.config.setdefault('PHOTO_PROCESSING_ASYNC', get_env_bool('PHOTO_PROCESSING_ASYNC', True))
+    # Variant filenames carry the upload's content hash, so they never change once written
+    app.config.setdefault('PHOTO_CACHE_MAX_AGE', int(os.getenv('PHOTO_CACHE_MAX_AGE', 31536000)))
+    os.makedirs(os.path.join(app.config['STORAGE_FOLDER'], 'photos'), exist_ok=True)
+    app.add_template_global(photo_url)
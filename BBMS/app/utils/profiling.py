@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app.utils.database import get_env_bool
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised when an endpoint runs more queries than its declared budget"""
+
+slow_query_logger = logging.getLogger('bbms.slow_queries')
+
+def get_query_stats():
+    """Return the current request's query stats, creating them if needed"""
+    if 'query_stats' not in g:
+        g.query_stats = {'count': 0, 'total_time': 0.0, 'slowest': []}
+    return g.query_stats
+
+def _record_query(statement, duration):
+    stats = get_query_stats()
+    stats['count'] += 1
+    stats['total_time'] += duration
+    slowest = stats['slowest']
+    limit = current_app.config['PROFILE_SLOWEST_QUERIES']
+    if len(slowest) < limit or duration > slowest[-1][0]:
+        slowest.append((duration, statement))
+        slowest.sort(key=lambda item: item[0], reverse=True)
+        del slowest[limit:]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the connection, which runs one statement at a time (``context``
+    # is None for some driver-level executions). A statement that raises
+    # never reaches after_cursor_execute; the next one overwrites its start.
+    conn.info['query_start'] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_start', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    if has_request_context() and current_app.config['PROFILE_QUERIES']:
+        _record_query(statement, duration)
+    if has_app_context():
+        threshold = current_app.config['SLOW_QUERY_THRESHOLD_MS']
+        if threshold is not None and duration * 1000 >= threshold:
+            _log_slow_query(statement, duration)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_NAMED_PLACEHOLDER = re.compile(r'%\(\w+\)s|:\w+|\$\d+|%s')
+
+def normalize_statement(statement):
+    """Strip literals and bind parameters so equal query shapes compare equal"""
+    normalized = ' '.join(statement.split())
+    normalized = _STRING_LITERAL.sub('?', normalized)
+    normalized = _NAMED_PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    return _PLACEHOLDER_LIST.sub('(?+)', normalized)
+
+def fingerprint_statement(normalized):
+    """Short stable hash of a statement already passed through normalize_statement"""
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+def _log_slow_query(statement, duration):
+    normalized = normalize_statement(statement)
+    # The JSON-lines file when SLOW_QUERY_LOG is set, else the app's own log
+    logger = slow_query_logger if slow_query_logger.handlers else current_app.logger
+    logger.warning(json.dumps({
+        'time': datetime.utcnow().isoformat(timespec='seconds'),
+        'endpoint': request.endpoint if has_request_context() else 'cli',
+        'duration_ms': round(duration * 1000, 3),
+        'fingerprint': fingerprint_statement(normalized),
+        'statement': normalized
+    }))
+
+def build_query_report(lines, sort_by='total', top=20):
+    """Aggregate slow-query log lines into per-fingerprint statistics
+
+    Returns rows with count, total/mean/p95 milliseconds and the endpoints
+    that issued each fingerprint, sorted by ``total``, ``count`` or ``p95``.
+    """
+    groups = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'statement': entry['statement'],
+            'durations': [],
+            'endpoints': {}
+        })
+        group['durations'].append(entry['duration_ms'])
+        endpoint = entry.get('endpoint') or 'unknown'
+        group['endpoints'][endpoint] = group['endpoints'].get(endpoint, 0) + 1
+
+    report = []
+    for group in groups.values():
+        durations = sorted(group.pop('durations'))
+        # Nearest-rank 95th percentile
+        p95 = durations[max(0, -(-len(durations) * 95 // 100) - 1)]
+        group.update({
+            'count': len(durations),
+            'total_ms': sum(durations),
+            'mean_ms': sum(durations) / len(durations),
+            'p95_ms': p95
+        })
+        report.append(group)
+
+    sort_keys = {'total': 'total_ms', 'count': 'count', 'p95': 'p95_ms'}
+    report.sort(key=lambda row: row[sort_keys[sort_by]], reverse=True)
+    return report[:top]
+
+def query_budget(max_queries):
+    """Decorator declaring the most SQL queries an endpoint may run per request"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g.query_budget = max_queries
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+def _report_request_queries(response):
+    stats = get_query_stats()
+    db_ms = stats['total_time'] * 1000
+    total_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats["count"]} queries"')
+    response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+
+    record = {
+        'event': 'request',
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': stats['count'],
+        'db_ms': round(db_ms, 2),
+        'total_ms': round(total_ms, 2),
+        'slowest': [{'ms': round(duration * 1000, 2), 'statement': ' '.join(statement.split())[:200]}
+                    for duration, statement in stats['slowest']]
+    }
+    # One JSON object per request; ``extra`` carries the same dict for structured handlers
+    current_app.logger.log(current_app.config['PROFILE_LOG_LEVEL'], json.dumps(record),
+                           extra={'request_metrics': record})
+
+    budget = g.get('query_budget')
+    if budget is not None and stats['count'] > budget:
+        message = f"{request.endpoint} ran {stats['count']} queries, budget is {budget}"
+        if current_app.config['QUERY_BUDGET_ENFORCE']:
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+def init_query_profiler(app):
+    """Record query count, DB time and slowest statements for every request"""
+    from app import db
+
+    app.config.setdefault('PROFILE_QUERIES', get_env_bool('PROFILE_QUERIES', True))
+    app.config.setdefault('PROFILE_SLOWEST_QUERIES', int(os.getenv('PROFILE_SLOWEST_QUERIES', 3)))
+    # Level of the per-request metrics record; the app logger is opened up to it
+    app.config.setdefault('PROFILE_LOG_LEVEL', logging.getLevelName(os.getenv('PROFILE_LOG_LEVEL', 'INFO')))
+    # Turn budget overruns into errors (enable in tests/CI)
+    app.config.setdefault('QUERY_BUDGET_ENFORCE', get_env_bool('QUERY_BUDGET_ENFORCE', False))
+    # Statements at or above this many milliseconds go to the slow-query log
+    threshold = os.getenv('SLOW_QUERY_THRESHOLD_MS', '100')
+    app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', float(threshold) if threshold else None)
+    # JSON-lines file for `flask query-report`; empty sends slow queries to the app logger
+    app.config.setdefault('SLOW_QUERY_LOG', os.getenv('SLOW_QUERY_LOG', ''))
+
+    if app.config['SLOW_QUERY_THRESHOLD_MS'] is not None:
+        if app.config['SLOW_QUERY_LOG']:
+            _configure_slow_query_log(app.config['SLOW_QUERY_LOG'])
+    elif not app.config['PROFILE_QUERIES']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    if app.config['PROFILE_QUERIES']:
+        if app.logger.getEffectiveLevel() > app.config['PROFILE_LOG_LEVEL']:
+            app.logger.setLevel(app.config['PROFILE_LOG_LEVEL'])
+        app.before_request(_start_request_timer)
+        app.after_request(_report_request_queries)
+
+def _configure_slow_query_log(path):
+    # One JSON object per line, appended by every worker process
+    path = os.path.abspath(path)
+    if any(getattr(handler, 'baseFilename', None) == path for handler in slow_query_logger.handlers):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.FileHandler(path, delay=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.WARNING)
+    slow_query_logger.propagate = False
@@ -0,0 +1,181 @@
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from app import db
+
+# "SCAN <table>" with nothing after the table (or its alias) is a full table
+# scan. "SCAN ... USING [COVERING] INDEX" and FTS5 virtual table lookups are fine.
+TABLE_SCAN = re.compile(r'^SCAN (?!\()(\w+)(?: AS \w+)?$')
+
+def get_hot_queries():
+    """Statements mirroring the hot filters in ``routes/`` and ``api/``
+
+    A quick check against any database. The tests also explain the
+    statements the routes actually run (see capture_statements).
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import (OTPVerification, DonationAppointment, BloodDonationRecord,
+                                   BloodTransfusionRequest, Recipient, Notification, BloodUnit,
+                                   DonationSlot, StoredFile)
+
+    now = datetime.now()
+    month_ago = now - timedelta(days=30)
+    appointment_tabs = [
+        DonationAppointment.status,
+        db.func.count(),
+        db.func.sum(db.case((db.and_(DonationAppointment.status.in_(['pending', 'confirmed']),
+                                     DonationAppointment.appointment_date >= now), 1), else_=0))
+    ]
+
+    return {
+        'login user by email': db.select(User).where(User.email == 'donor@example.com'),
+        'users by role': db.select(User).where(User.role == 'donor'),
+        'donor by user': db.select(Donor).where(Donor.user_id == 1),
+        'hospital by user': db.select(Hospital).where(Hospital.user_id == 1),
+        'active otp': db.select(OTPVerification).where(
+            OTPVerification.email == 'donor@example.com', OTPVerification.type == 'email_verification',
+            OTPVerification.is_used == False, OTPVerification.expires_at > now),
+        'expired otps': db.select(OTPVerification).where(OTPVerification.expires_at < now),
+
+        'available donors by blood group': db.select(db.func.count()).select_from(Donor).where(
+            Donor.blood_group == 'O+', Donor.is_available == True),
+        'suggested donors in city': db.select(Donor).where(
+            Donor.blood_group == 'O+', Donor.is_available == True, Donor.city == 'Pune'),
+        'admin donors by city': db.select(Donor).where(Donor.city == 'Pune')
+            .order_by(Donor.created_at.desc()).limit(20),
+        'donors newly eligible': db.select(Donor.id).where(
+            Donor.last_donation_date.between(date.today() - timedelta(days=63), date.today() - timedelta(days=56))),
+        'admin donors page': db.select(Donor).order_by(Donor.created_at.desc()).limit(20),
+        'verified hospitals by city': db.select(Hospital).where(
+            Hospital.city == 'Pune', Hospital.is_verified == True),
+        'admin hospitals page': db.select(Hospital).order_by(Hospital.created_at.desc()).limit(20),
+
+        'donor recent appointments': db.select(DonationAppointment).where(DonationAppointment.donor_id == 1)
+            .order_by(DonationAppointment.appointment_date.desc()).limit(5),
+        'donor upcoming appointments': db.select(DonationAppointment).where(
+            DonationAppointment.donor_id == 1, DonationAppointment.status.in_(['pending', 'confirmed']),
+            DonationAppointment.appointment_date >= now)
+            .order_by(DonationAppointment.appointment_date.desc()).limit(5),
+        'donor appointment tab counts': db.select(*appointment_tabs)
+            .where(DonationAppointment.donor_id == 1).group_by(DonationAppointment.status),
+        'hospital appointments page': db.select(DonationAppointment).where(DonationAppointment.hospital_id == 1)
+            .order_by(DonationAppointment.appointment_date.desc()).limit(5),
+        'hospital appointments by status': db.select(DonationAppointment).where(
+            DonationAppointment.hospital_id == 1, DonationAppointment.status == 'completed')
+            .order_by(DonationAppointment.appointment_date.desc()).limit(5),
+        'hospital appointment tab counts': db.select(*appointment_tabs)
+            .where(DonationAppointment.hospital_id == 1).group_by(DonationAppointment.status),
+        'appointments due a reminder': db.select(DonationAppointment.id).where(
+            DonationAppointment.status == 'confirmed', DonationAppointment.appointment_date > now,
+            DonationAppointment.appointment_date <= now + timedelta(hours=24),
+            DonationAppointment.reminder_sent_at.is_(None)),
+        'admin appointments by status': db.select(DonationAppointment).where(DonationAppointment.status == 'pending')
+            .order_by(DonationAppointment.appointment_date.desc()).limit(20),
+        'admin recent appointments': db.select(DonationAppointment)
+            .order_by(DonationAppointment.created_at.desc()).limit(5),
+
+        'available slots': db.select(DonationSlot).where(
+            DonationSlot.hospital_id == 1, DonationSlot.slot_start >= now,
+            DonationSlot.slot_start < now + timedelta(days=7), DonationSlot.booked < DonationSlot.capacity)
+            .order_by(DonationSlot.slot_start),
+        'appointments by slot': db.select(DonationAppointment).where(DonationAppointment.slot_id == 1),
+
+        'donor donation history': db.select(BloodDonationRecord).where(BloodDonationRecord.donor_id == 1)
+            .order_by(BloodDonationRecord.donation_date.desc()).limit(10),
+        'donation records by appointment': db.select(BloodDonationRecord)
+            .where(BloodDonationRecord.appointment_id == 1),
+        'recent donations by blood group': db.select(db.func.count()).select_from(BloodDonationRecord).where(
+            BloodDonationRecord.blood_group == 'O+', BloodDonationRecord.donation_date >= month_ago),
+        'monthly donations': db.select(db.func.count()).select_from(BloodDonationRecord).where(
+            BloodDonationRecord.donation_date >= month_ago, BloodDonationRecord.donation_date <= now),
+
+        'hospital recent requests': db.select(BloodTransfusionRequest)
+            .where(BloodTransfusionRequest.hospital_id == 1)
+            .order_by(BloodTransfusionRequest.created_at.desc()).limit(5),
+        'hospital request counts': db.select(BloodTransfusionRequest.status, db.func.count())
+            .where(BloodTransfusionRequest.hospital_id == 1).group_by(BloodTransfusionRequest.status),
+        'admin requests by status and urgency': db.select(BloodTransfusionRequest).where(
+            BloodTransfusionRequest.status == 'pending', BloodTransfusionRequest.urgency == 'emergency')
+            .order_by(BloodTransfusionRequest.created_at.desc()).limit(20),
+        'pending requests by blood group': db.select(db.func.count()).select_from(BloodTransfusionRequest).where(
+            BloodTransfusionRequest.blood_group == 'O+', BloodTransfusionRequest.status == 'pending'),
+        'monthly requests': db.select(db.func.count()).select_from(BloodTransfusionRequest).where(
+            BloodTransfusionRequest.created_at >= month_ago, BloodTransfusionRequest.created_at <= now),
+        'requests by recipient': db.select(BloodTransfusionRequest)
+            .where(BloodTransfusionRequest.recipient_id == 1),
+        'hospital recipients page': db.select(Recipient).where(Recipient.hospital_id == 1)
+            .order_by(Recipient.created_at.desc()).limit(10),
+
+        'fefo unit allocation': db.select(BloodUnit.id).where(
+            BloodUnit.blood_group == 'O+', BloodUnit.status == 'available',
+            BloodUnit.component_type == 'whole_blood', BloodUnit.expiry_date >= now.date())
+            .order_by(BloodUnit.expiry_date).limit(2),
+        'units by request': db.select(BloodUnit).where(BloodUnit.request_id == 1),
+
+        'unread notifications': db.select(Notification).where(
+            Notification.user_id == 1, Notification.is_read == False)
+            .order_by(Notification.created_at.desc()).limit(5),
+        'unread notification count': db.select(db.func.count()).select_from(Notification).where(
+            Notification.user_id == 1, Notification.is_read == False),
+        'notifications page': db.select(Notification).where(Notification.user_id == 1)
+            .order_by(Notification.created_at.desc()).limit(20),
+        'admin notifications page': db.select(Notification).order_by(Notification.created_at.desc()).limit(50),
+
+        'stored file by hash': db.select(StoredFile).where(StoredFile.sha256 == '0' * 64),
+        'unreferenced stored files': db.select(StoredFile.sha256).where(
+            StoredFile.ref_count <= 0, StoredFile.updated_at < now - timedelta(hours=1))
+    }
+
+def explain_query_plan(connection, statement):
+    """Return the detail lines of SQLite's EXPLAIN QUERY PLAN for a statement"""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}').all()
+    return [row[-1] for row in rows]
+
+def find_table_scans(plan):
+    """Return the tables that a query plan reads with a full table scan"""
+    return [match.group(1) for match in map(TABLE_SCAN.match, plan) if match]
+
+def check_query_plans():
+    """Explain every hot query and report the ones that scan a whole table"""
+    results = []
+    with db.engine.connect() as connection:
+        for name, statement in get_hot_queries().items():
+            plan = explain_query_plan(connection, statement)
+            results.append({'name': name, 'plan': plan, 'table_scans': find_table_scans(plan)})
+    return results
+
+@contextmanager
+def capture_statements(engine):
+    """Collect every SELECT run on ``engine`` in the block as ``(statement, parameters)``
+
+    Lets the plans of the queries that views really issue be checked,
+    rather than copies of them.
+    """
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+def explain_statements(connection, statements):
+    """Explain captured ``(statement, parameters)`` pairs, once per distinct statement"""
+    results = []
+    seen = set()
+    for statement, parameters in statements:
+        if statement in seen:
+            continue
+        seen.add(statement)
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        plan = [row[-1] for row in rows]
+        results.append({'name': ' '.join(statement.split()), 'plan': plan, 'table_scans': find_table_scans(plan)})
+    return results
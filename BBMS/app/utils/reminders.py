@@ -0,0 +1,161 @@
+import os
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import aliased
+from app import db
+from app.utils.database import get_env_bool
+from app.utils.email import send_notification_emails
+from app.utils.helpers import start_periodic_job
+from app.utils.transactions import after_commit, unit_of_work
+
+# Minimum days between whole-blood donations
+DONATION_INTERVAL_DAYS = 56
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _deliver(notifications, email):
+    """Insert ``(user_id, email, title, message, type)`` notifications and queue their emails"""
+    from app.models.common import Notification
+
+    if not notifications:
+        return 0
+    db.session.execute(db.insert(Notification), [
+        {'user_id': user_id, 'title': title, 'message': message, 'type': notification_type}
+        for user_id, _, title, message, notification_type in notifications
+    ])
+    if email:
+        after_commit(send_notification_emails, [
+            (address, title, message, notification_type)
+            for _, address, title, message, notification_type in notifications
+        ])
+    return len(notifications)
+
+def send_appointment_reminders(lead_hours=24, chunk_size=1000, email=True, blood_group=None):
+    """Remind donors of confirmed appointments starting within ``lead_hours``
+
+    Due appointments come from one range scan of
+    ix_donation_appointments_status_date. Each chunk is claimed by setting
+    reminder_sent_at with a conditional UPDATE ... RETURNING in its own
+    transaction, so reruns and overlapping runs never send a reminder twice.
+    ``blood_group`` limits the run to donors of one group.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import DonationAppointment
+
+    now = datetime.now()
+    hospital_user = aliased(User)
+    query = (
+        db.select(DonationAppointment.id, User.id, User.email, DonationAppointment.appointment_date,
+                  hospital_user.name)
+        .join(Donor, DonationAppointment.donor_id == Donor.id)
+        .join(User, Donor.user_id == User.id)
+        .join(Hospital, DonationAppointment.hospital_id == Hospital.id)
+        .join(hospital_user, Hospital.user_id == hospital_user.id)
+        .where(DonationAppointment.status == 'confirmed',
+               DonationAppointment.appointment_date > now,
+               DonationAppointment.appointment_date <= now + timedelta(hours=lead_hours),
+               DonationAppointment.reminder_sent_at.is_(None))
+        .order_by(DonationAppointment.id)
+    )
+    if blood_group:
+        query = query.where(Donor.blood_group == blood_group)
+    due = db.session.execute(query).all()
+
+    sent = 0
+    for chunk in _chunks(due, chunk_size):
+        with unit_of_work():
+            claimed = set(db.session.scalars(
+                db.update(DonationAppointment)
+                .where(DonationAppointment.id.in_([row[0] for row in chunk]),
+                       DonationAppointment.reminder_sent_at.is_(None))
+                .values(reminder_sent_at=now)
+                .returning(DonationAppointment.id)
+                .execution_options(synchronize_session=False)
+            ))
+            sent += _deliver([(
+                user_id,
+                address,
+                "Appointment Reminder",
+                f"Reminder: your blood donation appointment at {hospital_name} is on "
+                f"{appointment_date.strftime('%B %d, %Y at %I:%M %p')}.",
+                "info"
+            ) for appointment_id, user_id, address, appointment_date, hospital_name in chunk
+                if appointment_id in claimed], email)
+    return sent
+
+def send_eligibility_notices(lookback_days=7, chunk_size=1000, email=True, blood_group=None):
+    """Tell donors whose waiting period since their last donation has just ended
+
+    Only donors who became eligible in the last ``lookback_days`` are read,
+    via a range scan of ix_donors_last_donation_date, so a run costs the
+    same however many donors exist. eligibility_notified_on records the
+    donation each notice was for, so the next donation re-arms it.
+    ``blood_group`` limits the run to donors of one group.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+
+    newest = date.today() - timedelta(days=DONATION_INTERVAL_DAYS)
+    oldest = newest - timedelta(days=lookback_days)
+    not_notified = db.or_(Donor.eligibility_notified_on.is_(None),
+                          Donor.eligibility_notified_on < Donor.last_donation_date)
+    query = (
+        db.select(Donor.id, User.id, User.email)
+        .join(User, Donor.user_id == User.id)
+        .where(Donor.last_donation_date.between(oldest, newest),
+               Donor.is_available == True,
+               not_notified)
+        .order_by(Donor.id)
+    )
+    if blood_group:
+        query = query.where(Donor.blood_group == blood_group)
+    due = db.session.execute(query).all()
+
+    sent = 0
+    for chunk in _chunks(due, chunk_size):
+        with unit_of_work():
+            claimed = set(db.session.scalars(
+                db.update(Donor)
+                .where(Donor.id.in_([row[0] for row in chunk]), not_notified)
+                .values(eligibility_notified_on=Donor.last_donation_date)
+                .returning(Donor.id)
+                .execution_options(synchronize_session=False)
+            ))
+            sent += _deliver([(
+                user_id,
+                address,
+                "You Can Donate Again",
+                f"It has been {DONATION_INTERVAL_DAYS} days since your last donation, so you are eligible "
+                "to donate blood again. Book an appointment whenever you are ready.",
+                "success"
+            ) for donor_id, user_id, address in chunk if donor_id in claimed], email)
+    return sent
+
+def run_reminders(email=None):
+    """Send every due appointment reminder and re-eligibility notice"""
+    config = current_app.config
+    if email is None:
+        email = config['REMINDER_EMAILS']
+    return {
+        'appointment_reminders': send_appointment_reminders(config['REMINDER_LEAD_HOURS'],
+                                                            config['REMINDER_CHUNK_SIZE'], email),
+        'eligibility_notices': send_eligibility_notices(config['REMINDER_LOOKBACK_DAYS'],
+                                                        config['REMINDER_CHUNK_SIZE'], email)
+    }
+
+def init_reminders(app):
+    """Read reminder settings and start the in-process scheduler if enabled"""
+    app.config.setdefault('REMINDER_LEAD_HOURS', int(os.getenv('REMINDER_LEAD_HOURS', 24)))
+    # Days of missed runs a re-eligibility notice can still catch up on
+    app.config.setdefault('REMINDER_LOOKBACK_DAYS', int(os.getenv('REMINDER_LOOKBACK_DAYS', 7)))
+    app.config.setdefault('REMINDER_CHUNK_SIZE', int(os.getenv('REMINDER_CHUNK_SIZE', 1000)))
+    app.config.setdefault('REMINDER_EMAILS', get_env_bool('REMINDER_EMAILS', True))
+    # Minutes between in-process runs; 0 leaves scheduling to cron running `flask run-reminders`
+    app.config.setdefault('REMINDER_INTERVAL_MINUTES', int(os.getenv('REMINDER_INTERVAL_MINUTES', 0)))
+
+    # Runs are idempotent, so several worker processes each scheduling is safe
+    start_periodic_job(app, 'reminder-scheduler', app.config['REMINDER_INTERVAL_MINUTES'], run_reminders)
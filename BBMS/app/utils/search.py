@@ -0,0 +1,264 @@
+import logging
+import re
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Full-text indexes: index name -> (model path, indexed columns).
+# On SQLite each index is an FTS5 virtual table whose rowid is the entity id.
+# On PostgreSQL the columns get pg_trgm GIN indexes and are searched with ILIKE.
+SEARCH_INDEXES = {
+    'users': ('app.models.user.User', ['name', 'email']),
+    'hospitals': ('app.models.hospital.Hospital', ['address', 'city']),
+    'recipients': ('app.models.common.Recipient', ['name'])
+}
+
+# Whether the FTS5 tables exist, cached per database URL
+_fts_enabled = {}
+# Database URLs already warned about falling back to LIKE
+_fallback_warned = set()
+_events_registered = False
+
+def _get_model(index):
+    module_path, class_name = SEARCH_INDEXES[index][0].rsplit('.', 1)
+    module = __import__(module_path, fromlist=[class_name])
+    return getattr(module, class_name)
+
+def _table_name(index):
+    return f'search_{index}'
+
+def _sqlite_tables(connection):
+    return set(connection.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+
+def fts_enabled(connection):
+    """Check whether the FTS5 search tables are available on this connection"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _fts_enabled:
+        tables = {_table_name(index) for index in SEARCH_INDEXES}
+        _fts_enabled[key] = tables <= _sqlite_tables(connection)
+    return _fts_enabled[key]
+
+def create_search_index(connection):
+    """Create the search index for the connected database and backfill it"""
+    if connection.dialect.name == 'sqlite':
+        existing = _sqlite_tables(connection)
+        for index, (_, columns) in SEARCH_INDEXES.items():
+            table = _table_name(index)
+            if table in existing:
+                continue
+            try:
+                connection.execute(db.text(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5("
+                    f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+            except Exception as e:
+                logger.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+                return
+            _rebuild_index(connection, index)
+        _fts_enabled.pop(str(connection.engine.url), None)
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        for index, (_, columns) in SEARCH_INDEXES.items():
+            table = _get_model(index).__tablename__
+            for column in columns:
+                connection.execute(db.text(
+                    f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm '
+                    f'ON {table} USING gin ({column} gin_trgm_ops)'
+                ))
+
+def _rebuild_index(connection, index):
+    _, columns = SEARCH_INDEXES[index]
+    table = _table_name(index)
+    source = _get_model(index).__tablename__
+    connection.execute(db.text(f'DELETE FROM {table}'))
+    connection.execute(db.text(
+        f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+        f"SELECT id, {', '.join(columns)} FROM {source}"
+    ))
+
+def rebuild_search_index():
+    """Repopulate every FTS5 table from its source table"""
+    with db.engine.begin() as connection:
+        if not fts_enabled(connection):
+            create_search_index(connection)
+            return
+        for index in SEARCH_INDEXES:
+            _rebuild_index(connection, index)
+
+def build_match_query(search_query):
+    """Turn free text into an FTS5 query that prefix-matches every word"""
+    tokens = re.findall(r'\w+', search_query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def search_filter(index, id_column, search_query):
+    """Build a filter restricting ``id_column`` to entities matching the query
+
+    ``id_column`` must hold ids of the index's model, e.g. ``Hospital.user_id``
+    for the ``users`` index.
+    """
+    connection = db.session.connection()
+    _, columns = SEARCH_INDEXES[index]
+    if fts_enabled(connection):
+        match = build_match_query(search_query)
+        # Punctuation-only text has no tokens to MATCH; LIKE still matches it literally
+        if match:
+            table = _table_name(index)
+            ids = db.text(f'SELECT rowid FROM {table} WHERE {table} MATCH :match') \
+                .bindparams(match=match).columns(db.column('rowid', db.Integer))
+            return id_column.in_(ids)
+    elif connection.dialect.name == 'sqlite' and str(connection.engine.url) not in _fallback_warned:
+        _fallback_warned.add(str(connection.engine.url))
+        logger.warning("Search tables are missing, falling back to LIKE search; "
+                       "run `flask db upgrade` or `flask rebuild-search-index`")
+
+    model = _get_model(index)
+    # The text is matched literally, so % and _ in it are not wildcards
+    escaped = re.sub(r'([\\%_])', r'\\\1', search_query)
+    pattern = f'%{escaped}%'
+    matches = db.select(model.id).where(db.or_(*[getattr(model, column).ilike(pattern, escape='\\')
+                                                  for column in columns]))
+    return id_column.in_(matches)
+
+def _sync_row(index, connection, target, delete=False):
+    if not fts_enabled(connection):
+        return
+    _, columns = SEARCH_INDEXES[index]
+    table = _table_name(index)
+    connection.execute(db.text(f'DELETE FROM {table} WHERE rowid = :id'), {'id': target.id})
+    if not delete:
+        values = {column: getattr(target, column) for column in columns}
+        connection.execute(db.text(
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+            f"VALUES (:id, {', '.join(':' + column for column in columns)})"
+        ), {'id': target.id, **values})
+
+def _make_listeners(index):
+    _, columns = SEARCH_INDEXES[index]
+
+    def after_insert(mapper, connection, target):
+        _sync_row(index, connection, target)
+
+    def after_update(mapper, connection, target):
+        state = db.inspect(target)
+        if any(state.attrs[column].history.has_changes() for column in columns):
+            _sync_row(index, connection, target)
+
+    def after_delete(mapper, connection, target):
+        _sync_row(index, connection, target, delete=True)
+
+    return after_insert, after_update, after_delete
+
+def _after_create(target, connection, **kw):
+    create_search_index(connection)
+
+def register_search_events():
+    """Keep the search index in sync with model writes"""
+    global _events_registered
+    if _events_registered:
+        return
+    for index in SEARCH_INDEXES:
+        after_insert, after_update, after_delete = _make_listeners(index)
+        model = _get_model(index)
+        db.event.listen(model, 'after_insert', after_insert)
+        db.event.listen(model, 'after_update', after_update)
+        db.event.listen(model, 'after_delete', after_delete)
+    db.event.listen(db.metadata, 'after_create', _after_create)
+    _events_registered = True
+
+def facet_counts(query, facets):
+    """Count matching rows per value of each facet column in one round trip
+
+    ``facets`` maps facet names to columns reachable from ``query``. Returns
+    ``{facet: {value: count}}``.
+    """
+    counts = {name: {} for name in facets}
+    if not facets:
+        return counts
+    selects = [
+        query.with_entities(db.literal(name).label('facet'), column.label('value'), db.func.count().label('count'))
+        .group_by(column).order_by(None).statement
+        for name, column in facets.items()
+    ]
+    statement = selects[0] if len(selects) == 1 else db.union_all(*selects)
+    for facet, value, count in db.session.execute(statement):
+        counts[facet][value] = count
+    return counts
+
+def global_search(search_query, limit=5, filters=None):
+    """Search donors, hospitals, recipients and requests at once
+
+    Returns the top ``limit`` hits per entity type together with blood group,
+    city and status facet counts over all matches. ``filters`` may narrow the
+    results by ``blood_group``, ``city`` or ``status`` wherever the entity has
+    that attribute.
+    """
+    from app.models.user import User
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.common import Recipient, BloodTransfusionRequest
+
+    filters = {key: value for key, value in (filters or {}).items() if value}
+    results = {}
+
+    def narrow(query, columns):
+        for key, column in columns.items():
+            if key in filters:
+                query = query.filter(column == filters[key])
+        return query
+
+    def collect(name, query, facets, columns, order_by):
+        counts = facet_counts(query, facets)
+        first_facet = next(iter(counts.values()))
+        rows = query.with_entities(*columns).order_by(order_by).limit(limit).all()
+        results[name] = {
+            'total': sum(first_facet.values()),
+            'hits': [row._asdict() for row in rows],
+            'facets': counts
+        }
+
+    donors = Donor.query.join(Donor.user).filter(search_filter('users', Donor.user_id, search_query))
+    donors = narrow(donors, {'blood_group': Donor.blood_group, 'city': Donor.city})
+    collect('donors', donors,
+            {'blood_group': Donor.blood_group, 'city': Donor.city},
+            [Donor.id, User.name, User.email, Donor.blood_group, Donor.city, Donor.is_available],
+            Donor.created_at.desc())
+
+    hospitals = Hospital.query.join(Hospital.user).filter(db.or_(
+        search_filter('users', Hospital.user_id, search_query),
+        search_filter('hospitals', Hospital.id, search_query)
+    ))
+    hospitals = narrow(hospitals, {'city': Hospital.city})
+    collect('hospitals', hospitals,
+            {'city': Hospital.city},
+            [Hospital.id, User.name, User.email, Hospital.city, Hospital.is_verified],
+            Hospital.created_at.desc())
+
+    recipients = Recipient.query.join(Recipient.hospital).filter(
+        search_filter('recipients', Recipient.id, search_query))
+    recipients = narrow(recipients, {'blood_group': Recipient.blood_group, 'city': Hospital.city})
+    collect('recipients', recipients,
+            {'blood_group': Recipient.blood_group, 'city': Hospital.city},
+            [Recipient.id, Recipient.name, Recipient.blood_group, Hospital.city],
+            Recipient.created_at.desc())
+
+    requests = BloodTransfusionRequest.query.join(BloodTransfusionRequest.hospital).join(Hospital.user) \
+        .outerjoin(BloodTransfusionRequest.recipient).filter(db.or_(
+            search_filter('recipients', BloodTransfusionRequest.recipient_id, search_query),
+            search_filter('users', Hospital.user_id, search_query)
+        ))
+    requests = narrow(requests, {
+        'blood_group': BloodTransfusionRequest.blood_group,
+        'city': Hospital.city,
+        'status': BloodTransfusionRequest.status
+    })
+    collect('requests', requests,
+            {'blood_group': BloodTransfusionRequest.blood_group, 'city': Hospital.city,
+             'status': BloodTransfusionRequest.status},
+            [BloodTransfusionRequest.id, User.name.label('hospital'), Recipient.name.label('recipient'),
+             BloodTransfusionRequest.blood_group, BloodTransfusionRequest.quantity,
+             BloodTransfusionRequest.urgency, BloodTransfusionRequest.status],
+            BloodTransfusionRequest.created_at.desc())
+
+    return results
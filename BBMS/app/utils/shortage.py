@@ -0,0 +1,183 @@
+import os
+from datetime import date, datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from app import db
+from app.utils.database import dialect_insert, get_env_bool, RoutingSession
+
+def shortage_alerts_enabled():
+    return has_app_context() and current_app.config.get('SHORTAGE_ALERTS', False)
+
+def _upsert_counters(deltas):
+    """Atomically add ``(supply, demand)`` deltas to each (blood_group, city) counter"""
+    from app.models.common import ShortageCounter
+
+    table = ShortageCounter.__table__
+    for (blood_group, city), (supply, demand) in deltas.items():
+        statement = dialect_insert(table).values(
+            blood_group=blood_group, city=city, supply_units=supply, demand_units=demand,
+            alert_active=False, updated_at=datetime.utcnow()
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['blood_group', 'city'],
+            set_={
+                'supply_units': table.c.supply_units + statement.excluded.supply_units,
+                'demand_units': table.c.demand_units + statement.excluded.demand_units,
+                'updated_at': statement.excluded.updated_at
+            }
+        ))
+
+def _notify_admins(title, message, notification_type):
+    from app.models.user import User
+    from app.models.common import Notification
+
+    for admin_id in db.session.scalars(db.select(User.id).where(User.role == 'admin')):
+        db.session.add(Notification(user_id=admin_id, title=title, message=message, type=notification_type))
+
+def _evaluate_counters(keys):
+    """Raise or clear alerts for counters whose shortage state flipped
+
+    An alert raises when pending demand exceeds supply and only clears once
+    supply is SHORTAGE_CLEAR_MARGIN units ahead again, so a counter hovering
+    around the threshold does not flap. Each transition is a conditional
+    UPDATE on alert_active; only the transaction that flips it notifies.
+    """
+    from app.models.common import ShortageCounter
+
+    clear_margin = current_app.config['SHORTAGE_CLEAR_MARGIN']
+    now = datetime.utcnow()
+    for blood_group, city in keys:
+        key = (ShortageCounter.blood_group == blood_group, ShortageCounter.city == city)
+        raised = db.session.execute(
+            db.update(ShortageCounter)
+            .where(*key, ShortageCounter.alert_active == False,
+                   ShortageCounter.demand_units > ShortageCounter.supply_units)
+            .values(alert_active=True, last_alert_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        cleared = not raised and db.session.execute(
+            db.update(ShortageCounter)
+            .where(*key, ShortageCounter.alert_active == True,
+                   ShortageCounter.supply_units - ShortageCounter.demand_units >= clear_margin)
+            .values(alert_active=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not (raised or cleared):
+            continue
+
+        supply, demand = db.session.execute(
+            db.select(ShortageCounter.supply_units, ShortageCounter.demand_units).where(*key)
+        ).one()
+        if raised:
+            _notify_admins(
+                f"Blood Shortage: {blood_group} in {city}",
+                f"Pending requests need {demand:g} units of {blood_group} in {city}, "
+                f"but only {supply:g} are available.",
+                "warning"
+            )
+        else:
+            _notify_admins(
+                f"Shortage Resolved: {blood_group} in {city}",
+                f"{blood_group} supply in {city} is back to {supply:g} units for {demand:g} requested.",
+                "success"
+            )
+
+def apply_shortage_deltas(deltas):
+    """Update supply/demand counters by ``{(blood_group, city): (supply, demand)}`` and evaluate alerts"""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta) and key[1]}
+    if not deltas or not shortage_alerts_enabled():
+        return
+    with db.session.no_autoflush:
+        _upsert_counters(deltas)
+        _evaluate_counters(deltas.keys())
+
+def record_supply_change(blood_group, city, units):
+    """Adjust available supply for a blood group in a city"""
+    apply_shortage_deltas({(blood_group, city): (units, 0)})
+
+def _pending_quantity(status, quantity):
+    # New requests have no status until the column default applies at insert
+    return (quantity or 0) if status in (None, 'pending') else 0
+
+def _request_city(blood_request):
+    from app.models.hospital import Hospital
+    hospital = blood_request.hospital or db.session.get(Hospital, blood_request.hospital_id)
+    return hospital.city if hospital else None
+
+def _track_demand_changes(db_session, flush_context, instances):
+    """Turn pending-request inserts, updates and deletes into demand deltas"""
+    from app.models.common import BloodTransfusionRequest
+
+    if not shortage_alerts_enabled():
+        return
+
+    deltas = {}
+    def add(blood_request, blood_group, amount):
+        if amount:
+            key = (blood_group, _request_city(blood_request))
+            supply, demand = deltas.get(key, (0, 0))
+            deltas[key] = (supply, demand + amount)
+
+    with db_session.no_autoflush:
+        for obj in db_session.new:
+            if isinstance(obj, BloodTransfusionRequest):
+                add(obj, obj.blood_group, _pending_quantity(obj.status, obj.quantity))
+
+        for obj in db_session.deleted:
+            if isinstance(obj, BloodTransfusionRequest):
+                add(obj, obj.blood_group, -_pending_quantity(obj.status, obj.quantity))
+
+        for obj in db_session.dirty:
+            if not isinstance(obj, BloodTransfusionRequest) or not db_session.is_modified(obj):
+                continue
+            state = inspect(obj)
+            old = {}
+            for name in ('status', 'quantity', 'blood_group'):
+                history = state.attrs[name].history
+                old[name] = history.deleted[0] if history.deleted else getattr(obj, name)
+            add(obj, old['blood_group'], -_pending_quantity(old['status'], old['quantity']))
+            add(obj, obj.blood_group, _pending_quantity(obj.status, obj.quantity))
+
+    apply_shortage_deltas(deltas)
+
+def rebuild_shortage_counters():
+    """Recompute every counter from requests and units (expired units drop out)"""
+    from app.models.hospital import Hospital
+    from app.models.common import (ShortageCounter, BloodTransfusionRequest, BloodUnit,
+                                   BloodDonationRecord, DonationAppointment)
+
+    totals = {}
+    demand = (
+        db.session.query(BloodTransfusionRequest.blood_group, Hospital.city, db.func.sum(BloodTransfusionRequest.quantity))
+        .join(Hospital, BloodTransfusionRequest.hospital_id == Hospital.id)
+        .filter(BloodTransfusionRequest.status == 'pending')
+        .group_by(BloodTransfusionRequest.blood_group, Hospital.city)
+    )
+    supply = (
+        db.session.query(BloodUnit.blood_group, Hospital.city, db.func.count(BloodUnit.id))
+        .join(BloodDonationRecord, BloodUnit.donation_record_id == BloodDonationRecord.id)
+        .join(DonationAppointment, BloodDonationRecord.appointment_id == DonationAppointment.id)
+        .join(Hospital, DonationAppointment.hospital_id == Hospital.id)
+        .filter(BloodUnit.status == 'available', BloodUnit.expiry_date >= date.today())
+        .group_by(BloodUnit.blood_group, Hospital.city)
+    )
+    for blood_group, city, units in supply:
+        totals[(blood_group, city)] = (float(units), 0.0)
+    for blood_group, city, units in demand:
+        totals[(blood_group, city)] = (totals.get((blood_group, city), (0.0, 0.0))[0], float(units))
+
+    with db.session.no_autoflush:
+        keys = set(db.session.execute(db.select(ShortageCounter.blood_group, ShortageCounter.city)).tuples())
+        db.session.execute(db.update(ShortageCounter).values(supply_units=0, demand_units=0))
+        _upsert_counters(totals)
+        _evaluate_counters(keys | set(totals))
+    db.session.commit()
+    return len(totals)
+
+def init_shortage_alerts(app):
+    """Keep shortage counters current on every flush and alert admins on changes"""
+    app.config.setdefault('SHORTAGE_ALERTS', get_env_bool('SHORTAGE_ALERTS', True))
+    # Units of spare supply needed before an active alert clears (hysteresis)
+    app.config.setdefault('SHORTAGE_CLEAR_MARGIN', float(os.getenv('SHORTAGE_CLEAR_MARGIN', 2)))
+    if not event.contains(RoutingSession, 'before_flush', _track_demand_changes):
+        event.listen(RoutingSession, 'before_flush', _track_demand_changes)
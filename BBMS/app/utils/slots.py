@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.common import DonationSlot
+
+class SlotUnavailableError(RuntimeError):
+    """Raised when a booking does not match a free slot"""
+
+def generate_slots(hospital_id, day, first_start, last_start, length_minutes, capacity):
+    """Create slots every ``length_minutes`` from ``first_start`` to ``last_start`` on ``day``
+
+    Start times that already have a slot are skipped. Returns the new slots.
+    """
+    length = timedelta(minutes=length_minutes)
+    starts = []
+    start = datetime.combine(day, first_start)
+    while start <= datetime.combine(day, last_start):
+        starts.append(start)
+        start += length
+    if not starts:
+        return []
+
+    existing = set(db.session.scalars(
+        db.select(DonationSlot.slot_start).where(DonationSlot.hospital_id == hospital_id,
+                                                 DonationSlot.slot_start.between(starts[0], starts[-1]))
+    ))
+    slots = [
+        DonationSlot(hospital_id=hospital_id, slot_start=start, slot_end=start + length,
+                     capacity=capacity, booked=0)
+        for start in starts if start not in existing
+    ]
+    db.session.add_all(slots)
+    return slots
+
+def get_available_slots(hospital_id, start, end):
+    """Future slots with free capacity, from one (hospital_id, slot_start) range scan"""
+    return DonationSlot.query.filter(
+        DonationSlot.hospital_id == hospital_id,
+        DonationSlot.slot_start >= max(start, datetime.now()),
+        DonationSlot.slot_start < end,
+        DonationSlot.booked < DonationSlot.capacity
+    ).order_by(DonationSlot.slot_start).all()
+
+def hospital_has_slots(hospital_id):
+    """Whether a hospital publishes any future slots (and so only takes slot bookings)"""
+    return db.session.query(DonationSlot.query.filter(
+        DonationSlot.hospital_id == hospital_id,
+        DonationSlot.slot_start >= datetime.now()
+    ).exists()).scalar()
+
+def claim_slot(hospital_id, slot_start):
+    """Take one place in the slot starting at ``slot_start``
+
+    A single conditional UPDATE (``booked < capacity``) both checks and
+    decrements the remaining capacity, so concurrent donors can never
+    overbook a slot. Returns the slot id, or None if the slot is missing,
+    past or full.
+    """
+    return db.session.execute(
+        db.update(DonationSlot)
+        .where(DonationSlot.hospital_id == hospital_id,
+               DonationSlot.slot_start == slot_start,
+               DonationSlot.slot_start > datetime.now(),
+               DonationSlot.booked < DonationSlot.capacity)
+        .values(booked=DonationSlot.booked + 1)
+        .returning(DonationSlot.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+def release_slot(slot_id):
+    """Give back the place held by a cancelled appointment"""
+    db.session.execute(
+        db.update(DonationSlot)
+        .where(DonationSlot.id == slot_id, DonationSlot.booked > 0)
+        .values(booked=DonationSlot.booked - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def release_slots(slot_ids):
+    """Give back the places held by a batch of cancelled appointments, in one UPDATE"""
+    counts = {}
+    for slot_id in slot_ids:
+        if slot_id:
+            counts[slot_id] = counts.get(slot_id, 0) + 1
+    if not counts:
+        return
+    released = db.case(counts, value=DonationSlot.id)
+    db.session.execute(
+        db.update(DonationSlot)
+        .where(DonationSlot.id.in_(counts))
+        .values(booked=db.case((DonationSlot.booked > released, DonationSlot.booked - released), else_=0))
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.utils.database import dialect_insert
+from app.utils.helpers import get_file_extension, start_periodic_job
+
+# Bytes read per chunk while streaming an upload to disk
+CHUNK_SIZE = 64 * 1024
+
+def blob_folder():
+    return os.path.join(current_app.config['STORAGE_FOLDER'], 'blobs')
+
+def blob_path(sha256, extension=''):
+    """Where a blob lives: sharded by the first two hex digits of its hash"""
+    return os.path.join(blob_folder(), sha256[:2], f'{sha256}{extension}')
+
+def store_upload(file):
+    """Store an upload by content hash and return ``(sha256, path)``
+
+    The upload is streamed to a temp file and hashed in the same pass, then
+    renamed into place, so identical bytes always land on one blob. Its
+    stored_files row is created (or touched, keeping it from the sweeper)
+    in the current transaction with no reference; callers take one with
+    acquire_file when something starts using the blob.
+    """
+    from app.models.common import StoredFile
+
+    extension = get_file_extension(file.filename)
+    os.makedirs(blob_folder(), exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    temp = tempfile.NamedTemporaryFile(dir=blob_folder(), suffix='.part', delete=False)
+    try:
+        with temp:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        now = datetime.utcnow()
+        statement = dialect_insert(StoredFile.__table__).values(
+            sha256=sha256, extension=extension, size=size, ref_count=0, created_at=now, updated_at=now
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['sha256'], set_={'updated_at': statement.excluded.updated_at}
+        ))
+
+        # Same hash, same bytes: replacing an existing blob changes nothing
+        path = blob_path(sha256, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp.name, path)
+    except Exception:
+        os.remove(temp.name)
+        raise
+    return sha256, path
+
+def acquire_file(sha256):
+    """Add a reference to a stored blob"""
+    from app.models.common import StoredFile
+    return db.session.execute(
+        db.update(StoredFile).where(StoredFile.sha256 == sha256)
+        .values(ref_count=StoredFile.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+def release_file(sha256):
+    """Drop a reference to a stored blob; returns False if ``sha256`` is not a stored blob
+
+    A blob left with no references is deleted by the sweeper once
+    STORAGE_SWEEP_GRACE_MINUTES have passed.
+    """
+    from app.models.common import StoredFile
+    return bool(db.session.execute(
+        db.update(StoredFile).where(StoredFile.sha256 == sha256)
+        .values(ref_count=StoredFile.ref_count - 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount)
+
+def sweep_unreferenced_files(grace_minutes=None):
+    """Delete blobs (and their photo variants) nobody has referenced for a while
+
+    Each row is removed with a DELETE that re-checks it is still
+    unreferenced and stale, so a concurrent upload of the same bytes keeps
+    it. The files go before that DELETE commits: an upload of the same bytes
+    waits on the row until then, so it always writes its blob and variants
+    after they were removed, never before. Returns ``(files, bytes)`` freed.
+    """
+    from app.models.common import StoredFile
+    from app.utils.photos import remove_photo
+
+    if grace_minutes is None:
+        grace_minutes = current_app.config['STORAGE_SWEEP_GRACE_MINUTES']
+    cutoff = datetime.utcnow() - timedelta(minutes=grace_minutes)
+    stale = (StoredFile.ref_count <= 0, StoredFile.updated_at < cutoff)
+    candidates = db.session.execute(
+        db.select(StoredFile.sha256, StoredFile.extension, StoredFile.size).where(*stale)
+    ).all()
+
+    files = freed = 0
+    for sha256, extension, size in candidates:
+        deleted = db.session.execute(
+            db.delete(StoredFile).where(StoredFile.sha256 == sha256, *stale)
+        ).rowcount
+        if not deleted:
+            db.session.rollback()
+            continue
+        try:
+            try:
+                os.remove(blob_path(sha256, extension))
+            except FileNotFoundError:
+                pass
+            remove_photo(sha256)
+        except OSError:
+            db.session.rollback()
+            raise
+        db.session.commit()
+        files += 1
+        freed += size
+    return files, freed
+
+def move_public_uploads():
+    """Move blobs and photo variants stored under UPLOAD_FOLDER into STORAGE_FOLDER
+
+    Earlier versions kept them in the static folder, where anyone could
+    fetch them. Files already in STORAGE_FOLDER are kept. Returns how many
+    files were moved.
+    """
+    moved = 0
+    for name in ('blobs', 'photos'):
+        source = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+        target = os.path.join(current_app.config['STORAGE_FOLDER'], name)
+        for directory, _, filenames in os.walk(source):
+            destination = os.path.join(target, os.path.relpath(directory, source))
+            os.makedirs(destination, exist_ok=True)
+            for filename in filenames:
+                if not os.path.exists(os.path.join(destination, filename)):
+                    shutil.move(os.path.join(directory, filename), os.path.join(destination, filename))
+                    moved += 1
+                else:
+                    os.remove(os.path.join(directory, filename))
+        if os.path.isdir(source):
+            shutil.rmtree(source)
+    return moved
+
+def _release_donor_photo(mapper, connection, donor):
+    # Deleted donors give up their photo; the statement joins the flush's transaction
+    from app.models.common import StoredFile
+    if donor.photo:
+        connection.execute(
+            db.update(StoredFile).where(StoredFile.sha256 == donor.photo)
+            .values(ref_count=StoredFile.ref_count - 1, updated_at=datetime.utcnow())
+        )
+
+def init_storage(app):
+    """Storage settings, reference tracking and the background sweeper"""
+    from app.models.donor import Donor
+
+    # Minutes an unreferenced blob is kept, so an in-flight upload of the same bytes can still claim it
+    app.config.setdefault('STORAGE_SWEEP_GRACE_MINUTES', int(os.getenv('STORAGE_SWEEP_GRACE_MINUTES', 60)))
+    # Minutes between in-process sweeps; 0 leaves sweeping to `flask sweep-uploads`
+    app.config.setdefault('STORAGE_SWEEP_INTERVAL_MINUTES', int(os.getenv('STORAGE_SWEEP_INTERVAL_MINUTES', 60)))
+    if not event.contains(Donor, 'after_delete', _release_donor_photo):
+        event.listen(Donor, 'after_delete', _release_donor_photo)
+    start_periodic_job(app, 'upload-sweeper', app.config['STORAGE_SWEEP_INTERVAL_MINUTES'], sweep_unreferenced_files)
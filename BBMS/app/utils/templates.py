@@ -0,0 +1,37 @@
+import os
+import time
+from jinja2 import FileSystemBytecodeCache, TemplateError
+from app.utils.database import get_env_bool
+
+def warm_up_templates(app):
+    """Compile every template into the environment's cache; returns ``(count, seconds)``
+
+    With the bytecode cache in place only the first worker after a deploy
+    compiles from source; the others load the stored bytecode.
+    """
+    started = time.perf_counter()
+    count = 0
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            count += 1
+        except TemplateError as e:
+            # A broken template should fail its own page, not every worker's boot
+            app.logger.warning(f"Could not precompile template {name}: {e}")
+    return count, time.perf_counter() - started
+
+def init_templates(app):
+    """Share compiled templates between workers and precompile them at boot"""
+    # Directory for compiled template bytecode, shared by every worker; empty disables it
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE',
+                          os.getenv('TEMPLATE_BYTECODE_CACHE', os.path.join(app.instance_path, 'jinja_cache')))
+    app.config.setdefault('TEMPLATE_WARMUP', get_env_bool('TEMPLATE_WARMUP', True))
+
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        os.makedirs(app.config['TEMPLATE_BYTECODE_CACHE'], exist_ok=True)
+        # Entries are keyed by template name and source checksum, so edited templates recompile
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_BYTECODE_CACHE'])
+    # The debug server recompiles edited templates anyway, so skip the boot cost there
+    if app.config['TEMPLATE_WARMUP'] and not app.debug:
+        count, seconds = warm_up_templates(app)
+        app.logger.info(f"Precompiled {count} templates in {seconds * 1000:.0f}ms")
@@ -0,0 +1,105 @@
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.exc import StaleDataError
+from app.utils.database import RoutingSession
+
+# PostgreSQL SQLSTATEs worth retrying: serialization failure, deadlock, lock not available
+CONFLICT_SQLSTATES = {'40001', '40P01', '55P03'}
+# SQLite refuses to upgrade a stale read snapshot to a write with "database is locked"
+CONFLICT_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+class ConcurrentUpdateError(RuntimeError):
+    """Raised when a unit of work keeps losing a concurrent update race"""
+
+def is_conflict(error):
+    """Whether ``error`` means a concurrent writer won, so the work can simply be retried
+
+    A versioned row changed under us (StaleDataError), or the database
+    reports a lock, busy or serialization failure. Anything else (missing
+    tables, I/O errors, lost connections) is not a conflict.
+    """
+    if isinstance(error, StaleDataError):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    sqlstate = getattr(error.orig, 'pgcode', None) or getattr(error.orig, 'sqlstate', None)
+    if sqlstate in CONFLICT_SQLSTATES:
+        return True
+    message = str(error.orig).lower()
+    return any(conflict in message for conflict in CONFLICT_MESSAGES)
+
+def after_commit(callback, *args, **kwargs):
+    """Run ``callback(*args, **kwargs)`` once the current transaction commits
+
+    Hooks are dropped if the transaction rolls back. They run after the
+    write lock is released, so slow side effects (emails) never hold it.
+    """
+    from app import db
+    db.session.info.setdefault('after_commit_hooks', []).append((callback, args, kwargs))
+
+def _run_after_commit_hooks(db_session):
+    for callback, args, kwargs in db_session.info.pop('after_commit_hooks', []):
+        try:
+            callback(*args, **kwargs)
+        except Exception as e:
+            # The data is already committed; a failed side effect must not undo the request
+            current_app.logger.error(f"After-commit hook {callback.__name__} failed: {e}")
+
+def _discard_after_commit_hooks(db_session):
+    db_session.info.pop('after_commit_hooks', None)
+
+event.listen(RoutingSession, 'after_commit', _run_after_commit_hooks)
+event.listen(RoutingSession, 'after_rollback', _discard_after_commit_hooks)
+
+@contextmanager
+def unit_of_work():
+    """Commit every write made in the block together, exactly once
+
+    Rolls back and re-raises on error. Nested blocks join the outermost
+    one, so workflows can be composed without committing early.
+    """
+    from app import db
+    session = db.session
+    depth = session.info.get('unit_of_work_depth', 0)
+    session.info['unit_of_work_depth'] = depth + 1
+    try:
+        yield session
+        if depth == 0:
+            session.commit()
+    except Exception:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info['unit_of_work_depth'] = depth
+
+def retry_on_conflict(attempts=8, backoff=0.02):
+    """Decorator re-running a unit of work that lost a compare-and-swap race
+
+    The failed attempt has already been rolled back by unit_of_work(). Waits
+    a jittered, exponentially growing delay between attempts and raises
+    ConcurrentUpdateError once ``attempts`` runs have all conflicted. Inside
+    an enclosing unit of work it runs once; the outermost caller retries.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from app import db
+            if db.session.info.get('unit_of_work_depth', 0):
+                return f(*args, **kwargs)
+            for attempt in range(attempts):
+                try:
+                    return f(*args, **kwargs)
+                except (StaleDataError, DBAPIError) as e:
+                    if not is_conflict(e):
+                        raise
+                    if attempt == attempts - 1:
+                        raise ConcurrentUpdateError(f"{f.__name__} conflicted {attempts} times") from e
+                    time.sleep(backoff * 2 ** attempt * random.random())
+        return decorated_function
+    return decorator
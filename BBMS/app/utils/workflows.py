@@ -0,0 +1,319 @@
+from datetime import datetime
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.common import BloodDonationRecord, DonationAppointment, Notification
+from app.models.donor import Donor
+from app.utils.database import dialect_insert
+from app.utils.email import send_notification_email, send_notification_emails
+from app.utils.inventory import (add_units_for_donation, add_units_for_donations, allocate_units, expire_units,
+                                 fulfil_reservation, release_reservation, reserve_stock)
+from app.utils.slots import SlotUnavailableError, claim_slot, hospital_has_slots, release_slot, release_slots
+from app.utils.transactions import after_commit, retry_on_conflict, unit_of_work
+
+# Each workflow below is one business operation: its state changes and the
+# in-app notification commit together, and the email is sent after commit.
+
+# Statuses covered by the one-active-appointment-per-donor unique index
+ACTIVE_APPOINTMENT_STATUSES = ('pending', 'confirmed')
+
+class DuplicateAppointmentError(RuntimeError):
+    """Raised when a donor with an active appointment books another"""
+
+class AppointmentBatchError(ValueError):
+    """Raised when a batch names appointments that cannot take the requested action"""
+
+    def __init__(self, appointment_ids):
+        super().__init__(f"Appointments not available for this action: {', '.join(map(str, appointment_ids))}")
+        self.appointment_ids = appointment_ids
+
+class InvalidStatusError(ValueError):
+    """Raised when a row has already moved out of the status a workflow starts from"""
+
+    def __init__(self, row, statuses):
+        super().__init__(f"{type(row).__name__} {row.id} is {row.status}, expected {' or '.join(statuses)}")
+        self.status = row.status
+
+def notify_user(user, title, message, notification_type="info", email=True):
+    """Add an in-app notification and queue the matching email for after commit"""
+    db.session.add(Notification(
+        user_id=user.id,
+        title=title,
+        message=message,
+        type=notification_type
+    ))
+    if email:
+        after_commit(send_notification_email, user.email, title, message, notification_type)
+
+def notify_users(notifications, email=True):
+    """Batch notify_user for ``(user, title, message, notification_type)`` tuples
+
+    The notifications go in with one multi-row INSERT and the emails are
+    sent over a single SMTP connection after commit.
+    """
+    if not notifications:
+        return
+    db.session.execute(db.insert(Notification), [
+        {'user_id': user.id, 'title': title, 'message': message, 'type': notification_type}
+        for user, title, message, notification_type in notifications
+    ])
+    if email:
+        after_commit(send_notification_emails, [
+            (user.email, title, message, notification_type)
+            for user, title, message, notification_type in notifications
+        ])
+
+def _check_status(row, statuses):
+    """Re-read ``row`` in the current attempt and check it is still in one of ``statuses``
+
+    Retried workflows call this first: a row another request moved on while
+    this one waited or retried must not be transitioned again.
+    """
+    db.session.refresh(row, with_for_update=True)
+    if row.status not in statuses:
+        raise InvalidStatusError(row, statuses)
+
+@retry_on_conflict()
+def book_appointment(donor, hospital_id, appointment_date, notes=None):
+    """Book a donation appointment, taking a place in the matching slot
+
+    Hospitals that publish slots only accept bookings at a slot start with
+    free capacity; raises SlotUnavailableError otherwise. Hospitals without
+    slots still accept any future time.
+
+    The row is written with INSERT ... ON CONFLICT DO NOTHING against
+    ix_donation_appointments_donor_id_active, so of two simultaneous
+    submissions exactly one inserts and the other gets
+    DuplicateAppointmentError straight away, its slot claim rolled back.
+    """
+    with unit_of_work():
+        slot_id = claim_slot(hospital_id, appointment_date)
+        if slot_id is None and hospital_has_slots(hospital_id):
+            raise SlotUnavailableError("That time slot is full or not offered by this hospital.")
+        appointment_id = db.session.execute(
+            dialect_insert(DonationAppointment.__table__)
+            .values(donor_id=donor.id, hospital_id=hospital_id, slot_id=slot_id,
+                    appointment_date=appointment_date, status='pending', notes=notes)
+            .on_conflict_do_nothing(index_elements=['donor_id'],
+                                    index_where=DonationAppointment.status.in_(ACTIVE_APPOINTMENT_STATUSES))
+            .returning(DonationAppointment.id)
+        ).scalar()
+        if appointment_id is None:
+            raise DuplicateAppointmentError("You already have an upcoming appointment. "
+                                            "Cancel it before booking another.")
+    return db.session.get(DonationAppointment, appointment_id)
+
+@retry_on_conflict()
+def confirm_appointment(appointment):
+    """Confirm a pending donation appointment"""
+    with unit_of_work():
+        _check_status(appointment, ['pending'])
+        appointment.status = 'confirmed'
+        notify_user(
+            appointment.donor.user,
+            "Appointment Confirmed",
+            f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been confirmed.",
+            "success"
+        )
+
+@retry_on_conflict()
+def complete_appointment(appointment, quantity):
+    """Complete a confirmed appointment and record the donation"""
+    donor = appointment.donor
+    with unit_of_work():
+        _check_status(appointment, ['confirmed'])
+        appointment.status = 'completed'
+        donation_record = BloodDonationRecord(
+            appointment_id=appointment.id,
+            donor_id=donor.id,
+            quantity=quantity,
+            blood_group=donor.blood_group,
+            donation_date=datetime.now()
+        )
+        db.session.add(donation_record)
+        add_units_for_donation(donation_record, location=appointment.hospital.user.name,
+                               city=appointment.hospital.city)
+        donor.last_donation_date = datetime.now().date()
+        notify_user(
+            donor.user,
+            "Donation Completed",
+            f"Thank you for your blood donation! {quantity} units of {donor.blood_group} blood have been recorded.",
+            "success"
+        )
+    return donation_record
+
+@retry_on_conflict()
+def cancel_appointment(appointment, cancelled_by):
+    """Cancel a pending or confirmed appointment and notify the other party"""
+    with unit_of_work():
+        _check_status(appointment, ['pending', 'confirmed'])
+        appointment.status = 'cancelled'
+        if appointment.slot_id:
+            release_slot(appointment.slot_id)
+        if cancelled_by == 'donor':
+            user = appointment.hospital.user
+            message = f"Blood donation appointment with {appointment.donor.user.name} has been cancelled."
+        else:
+            user = appointment.donor.user
+            message = f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been cancelled."
+        notify_user(user, "Appointment Cancelled", message, "warning", email=False)
+
+@retry_on_conflict()
+def approve_request(blood_request):
+    """Approve a pending request, reserving stock and allocating its units
+
+    Raises InsufficientStockError, with nothing changed, if stock is short,
+    and InvalidStatusError if the request is no longer pending.
+    """
+    with unit_of_work():
+        _check_status(blood_request, ['pending'])
+        # Out-of-date units must not count as available stock
+        expire_units(blood_request.blood_group)
+        reserve_stock(blood_request)
+        allocate_units(blood_request)
+        blood_request.status = 'approved'
+        notify_user(
+            blood_request.hospital.user,
+            "Blood Request Approved",
+            f"Your blood request for {blood_request.blood_group} has been approved.",
+            "success"
+        )
+
+@retry_on_conflict()
+def fulfil_request(blood_request):
+    """Mark an approved request fulfilled, handing its reserved units over"""
+    with unit_of_work():
+        _check_status(blood_request, ['approved'])
+        fulfil_reservation(blood_request)
+        blood_request.status = 'fulfilled'
+        notify_user(
+            blood_request.hospital.user,
+            "Blood Request Fulfilled",
+            f"Your blood request for {blood_request.blood_group} has been fulfilled.",
+            "success"
+        )
+
+@retry_on_conflict()
+def reject_request(blood_request, remarks):
+    """Reject a pending or approved request; an approved one returns its units to stock"""
+    with unit_of_work():
+        _check_status(blood_request, ['pending', 'approved'])
+        if blood_request.status == 'approved':
+            release_reservation(blood_request)
+        blood_request.status = 'rejected'
+        blood_request.admin_remarks = remarks
+        notify_user(
+            blood_request.hospital.user,
+            "Blood Request Rejected",
+            f"Your blood request for {blood_request.blood_group} has been rejected. Reason: {remarks}",
+            "error"
+        )
+
+def verify_hospital(hospital):
+    """Mark a hospital as verified"""
+    with unit_of_work():
+        hospital.is_verified = True
+        notify_user(
+            hospital.user,
+            "Hospital Verification Approved",
+            "Your hospital has been verified by the admin. You can now submit blood requests.",
+            "success"
+        )
+
+def _load_batch(hospital_id, appointment_ids, statuses):
+    """Load a hospital's appointments for a batch action in one query
+
+    Raises AppointmentBatchError naming every id that is not this hospital's
+    or not in one of ``statuses``, so a batch applies entirely or not at all.
+    """
+    appointment_ids = set(appointment_ids)
+    appointments = DonationAppointment.query.options(
+        joinedload(DonationAppointment.donor).joinedload(Donor.user)
+    ).filter(
+        DonationAppointment.id.in_(appointment_ids),
+        DonationAppointment.hospital_id == hospital_id,
+        DonationAppointment.status.in_(statuses)
+    ).all()
+    invalid = appointment_ids - {appointment.id for appointment in appointments}
+    if not appointment_ids or invalid:
+        raise AppointmentBatchError(sorted(invalid))
+    return appointments
+
+def _set_batch_status(appointments, statuses, status):
+    # Conditional on the old status: a concurrent change to any row fails the whole batch
+    updated = db.session.execute(
+        db.update(DonationAppointment)
+        .where(DonationAppointment.id.in_([appointment.id for appointment in appointments]),
+               DonationAppointment.status.in_(statuses))
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if updated != len(appointments):
+        raise AppointmentBatchError([appointment.id for appointment in appointments])
+
+def bulk_confirm_appointments(hospital, appointment_ids):
+    """Confirm a batch of a hospital's pending appointments"""
+    with unit_of_work():
+        appointments = _load_batch(hospital.id, appointment_ids, ['pending'])
+        _set_batch_status(appointments, ['pending'], 'confirmed')
+        notify_users([(
+            appointment.donor.user,
+            "Appointment Confirmed",
+            f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been confirmed.",
+            "success"
+        ) for appointment in appointments])
+    return len(appointments)
+
+@retry_on_conflict()
+def bulk_complete_appointments(hospital, quantities):
+    """Complete a batch of confirmed appointments, ``{appointment_id: quantity}``
+
+    Status changes, donation records, blood units, inventory and each
+    donor's last donation date are written with bulk statements in one
+    transaction.
+    """
+    now = datetime.now()
+    with unit_of_work():
+        appointments = _load_batch(hospital.id, quantities, ['confirmed'])
+        _set_batch_status(appointments, ['confirmed'], 'completed')
+        record_ids = db.session.scalars(
+            db.insert(BloodDonationRecord).returning(BloodDonationRecord.id, sort_by_parameter_order=True),
+            [{
+                'appointment_id': appointment.id,
+                'donor_id': appointment.donor_id,
+                'quantity': quantities[appointment.id],
+                'blood_group': appointment.donor.blood_group,
+                'donation_date': now
+            } for appointment in appointments]
+        ).all()
+        add_units_for_donations(
+            [(record_id, appointment.donor.blood_group, quantities[appointment.id], now)
+             for record_id, appointment in zip(record_ids, appointments)],
+            location=hospital.user.name, city=hospital.city
+        )
+        db.session.execute(
+            db.update(Donor)
+            .where(Donor.id.in_({appointment.donor_id for appointment in appointments}))
+            .values(last_donation_date=now.date())
+            .execution_options(synchronize_session=False)
+        )
+        notify_users([(
+            appointment.donor.user,
+            "Donation Completed",
+            f"Thank you for your blood donation! {quantities[appointment.id]} units of {appointment.donor.blood_group} blood have been recorded.",
+            "success"
+        ) for appointment in appointments])
+    return len(appointments)
+
+def bulk_cancel_appointments(hospital, appointment_ids):
+    """Cancel a batch of a hospital's pending or confirmed appointments"""
+    with unit_of_work():
+        appointments = _load_batch(hospital.id, appointment_ids, ['pending', 'confirmed'])
+        _set_batch_status(appointments, ['pending', 'confirmed'], 'cancelled')
+        release_slots([appointment.slot_id for appointment in appointments])
+        notify_users([(
+            appointment.donor.user,
+            "Appointment Cancelled",
+            f"Your blood donation appointment on {appointment.appointment_date.strftime('%B %d, %Y at %I:%M %p')} has been cancelled.",
+            "warning"
+        ) for appointment in appointments], email=False)
+    return len(appointments)
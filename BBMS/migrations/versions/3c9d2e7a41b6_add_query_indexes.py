@@ -0,0 +1,86 @@
+"""Add indexes for hot filters and foreign keys
+
+Revision ID: 3c9d2e7a41b6
+Revises: 895f08111f81
+Create Date: 2026-10-19 10:12:44.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d2e7a41b6'
+down_revision = '895f08111f81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Indexes are also declared on the models, so databases built with
+    # db.create_all() may already have them.
+    op.create_index('ix_feedback_created_at', 'feedback', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_otp_verifications_email_type_is_used', 'otp_verifications', ['email', 'type', 'is_used'], unique=False, if_not_exists=True)
+    op.create_index('ix_otp_verifications_expires_at', 'otp_verifications', ['expires_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_users_role', 'users', ['role'], unique=False, if_not_exists=True)
+    op.create_index('ix_admins_user_id', 'admins', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_donors_blood_group_is_available_city', 'donors', ['blood_group', 'is_available', 'city'], unique=False, if_not_exists=True)
+    op.create_index('ix_donors_city', 'donors', ['city'], unique=False, if_not_exists=True)
+    op.create_index('ix_donors_created_at', 'donors', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_donors_user_id', 'donors', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_hospitals_city_is_verified', 'hospitals', ['city', 'is_verified'], unique=False, if_not_exists=True)
+    op.create_index('ix_hospitals_created_at', 'hospitals', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_hospitals_user_id', 'hospitals', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_notifications_created_at', 'notifications', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_notifications_user_id_created_at', 'notifications', ['user_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_notifications_user_id_is_read_created_at', 'notifications', ['user_id', 'is_read', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_donation_appointments_created_at', 'donation_appointments', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_donation_appointments_donor_id_status_date', 'donation_appointments', ['donor_id', 'status', 'appointment_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_donation_appointments_hospital_id_date', 'donation_appointments', ['hospital_id', 'appointment_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_donation_appointments_hospital_id_status_date', 'donation_appointments', ['hospital_id', 'status', 'appointment_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_donation_appointments_status_date', 'donation_appointments', ['status', 'appointment_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_recipients_hospital_id_created_at', 'recipients', ['hospital_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_donation_records_appointment_id', 'blood_donation_records', ['appointment_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_donation_records_blood_group_date', 'blood_donation_records', ['blood_group', 'donation_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_donation_records_donation_date', 'blood_donation_records', ['donation_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_donation_records_donor_id_date', 'blood_donation_records', ['donor_id', 'donation_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_blood_group_status', 'blood_transfusion_requests', ['blood_group', 'status'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_created_at', 'blood_transfusion_requests', ['created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_hospital_id_created_at', 'blood_transfusion_requests', ['hospital_id', 'created_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_hospital_id_status', 'blood_transfusion_requests', ['hospital_id', 'status'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_recipient_id', 'blood_transfusion_requests', ['recipient_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_transfusion_requests_status_urgency_created_at', 'blood_transfusion_requests', ['status', 'urgency', 'created_at'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_blood_transfusion_requests_status_urgency_created_at', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_transfusion_requests_recipient_id', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_transfusion_requests_hospital_id_status', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_transfusion_requests_hospital_id_created_at', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_transfusion_requests_created_at', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_transfusion_requests_blood_group_status', table_name='blood_transfusion_requests', if_exists=True)
+    op.drop_index('ix_blood_donation_records_donor_id_date', table_name='blood_donation_records', if_exists=True)
+    op.drop_index('ix_blood_donation_records_donation_date', table_name='blood_donation_records', if_exists=True)
+    op.drop_index('ix_blood_donation_records_blood_group_date', table_name='blood_donation_records', if_exists=True)
+    op.drop_index('ix_blood_donation_records_appointment_id', table_name='blood_donation_records', if_exists=True)
+    op.drop_index('ix_recipients_hospital_id_created_at', table_name='recipients', if_exists=True)
+    op.drop_index('ix_donation_appointments_status_date', table_name='donation_appointments', if_exists=True)
+    op.drop_index('ix_donation_appointments_hospital_id_status_date', table_name='donation_appointments', if_exists=True)
+    op.drop_index('ix_donation_appointments_hospital_id_date', table_name='donation_appointments', if_exists=True)
+    op.drop_index('ix_donation_appointments_donor_id_status_date', table_name='donation_appointments', if_exists=True)
+    op.drop_index('ix_donation_appointments_created_at', table_name='donation_appointments', if_exists=True)
+    op.drop_index('ix_notifications_user_id_is_read_created_at', table_name='notifications', if_exists=True)
+    op.drop_index('ix_notifications_user_id_created_at', table_name='notifications', if_exists=True)
+    op.drop_index('ix_notifications_created_at', table_name='notifications', if_exists=True)
+    op.drop_index('ix_hospitals_user_id', table_name='hospitals', if_exists=True)
+    op.drop_index('ix_hospitals_created_at', table_name='hospitals', if_exists=True)
+    op.drop_index('ix_hospitals_city_is_verified', table_name='hospitals', if_exists=True)
+    op.drop_index('ix_donors_user_id', table_name='donors', if_exists=True)
+    op.drop_index('ix_donors_created_at', table_name='donors', if_exists=True)
+    op.drop_index('ix_donors_city', table_name='donors', if_exists=True)
+    op.drop_index('ix_donors_blood_group_is_available_city', table_name='donors', if_exists=True)
+    op.drop_index('ix_admins_user_id', table_name='admins', if_exists=True)
+    op.drop_index('ix_users_role', table_name='users', if_exists=True)
+    op.drop_index('ix_otp_verifications_expires_at', table_name='otp_verifications', if_exists=True)
+    op.drop_index('ix_otp_verifications_email_type_is_used', table_name='otp_verifications', if_exists=True)
+    op.drop_index('ix_feedback_created_at', table_name='feedback', if_exists=True)
@@ -0,0 +1,60 @@
+"""Add the full-text search index
+
+Revision ID: 5a2d8e6f1b47
+Revises: 9e4b7c1a3f62
+Create Date: 2026-10-19 17:05:31.882406
+
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a2d8e6f1b47'
+down_revision = '9e4b7c1a3f62'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Mirrors SEARCH_INDEXES in app/utils/search.py: index name -> (source table, columns)
+SEARCH_INDEXES = {
+    'users': ('users', ['name', 'email']),
+    'hospitals': ('hospitals', ['address', 'city']),
+    'recipients': ('recipients', ['name'])
+}
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        # FTS5 tables whose rowid is the entity id; create_all() builds the same ones
+        for index, (source, columns) in SEARCH_INDEXES.items():
+            table = f'search_{index}'
+            try:
+                op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                           f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+            except sa.exc.OperationalError as e:
+                logger.warning(f"FTS5 unavailable, search will use LIKE: {e}")
+                return
+            op.execute(f'DELETE FROM {table}')
+            op.execute(f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+                       f"SELECT id, {', '.join(columns)} FROM {source}")
+    elif connection.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for source, columns in SEARCH_INDEXES.values():
+            for column in columns:
+                op.execute(f'CREATE INDEX IF NOT EXISTS ix_{source}_{column}_trgm '
+                           f'ON {source} USING gin ({column} gin_trgm_ops)')
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        for index in SEARCH_INDEXES:
+            op.execute(f'DROP TABLE IF EXISTS search_{index}')
+    elif connection.dialect.name == 'postgresql':
+        for source, columns in SEARCH_INDEXES.values():
+            for column in columns:
+                op.execute(f'DROP INDEX IF EXISTS ix_{source}_{column}_trgm')
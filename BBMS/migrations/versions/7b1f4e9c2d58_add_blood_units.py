@@ -0,0 +1,78 @@
+"""Add blood_units table for per-bag inventory
+
+Revision ID: 7b1f4e9c2d58
+Revises: 3c9d2e7a41b6
+Create Date: 2026-10-19 14:05:12.604118
+
+"""
+import math
+from datetime import datetime, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1f4e9c2d58'
+down_revision = '3c9d2e7a41b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blood_units',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('donation_record_id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.Integer(), nullable=True),
+    sa.Column('blood_group', sa.String(length=5), nullable=False),
+    sa.Column('component_type', sa.String(length=20), nullable=False),
+    sa.Column('collection_date', sa.Date(), nullable=False),
+    sa.Column('expiry_date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('location', sa.String(length=100), nullable=True),
+    sa.Column('allocated_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['donation_record_id'], ['blood_donation_records.id'], ),
+    sa.ForeignKeyConstraint(['request_id'], ['blood_transfusion_requests.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_blood_units_blood_group_status_expiry_date', 'blood_units', ['blood_group', 'status', 'expiry_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_units_donation_record_id', 'blood_units', ['donation_record_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_blood_units_request_id', 'blood_units', ['request_id'], unique=False, if_not_exists=True)
+
+    # One whole-blood bag (35-day shelf life) per started unit of every past
+    # donation; most are already expired and only kept for traceability.
+    donations = sa.table('blood_donation_records',
+        sa.column('id', sa.Integer), sa.column('blood_group', sa.String),
+        sa.column('quantity', sa.Float), sa.column('donation_date', sa.DateTime))
+    units = sa.table('blood_units',
+        sa.column('donation_record_id', sa.Integer), sa.column('blood_group', sa.String),
+        sa.column('component_type', sa.String), sa.column('collection_date', sa.Date),
+        sa.column('expiry_date', sa.Date), sa.column('status', sa.String),
+        sa.column('created_at', sa.DateTime))
+    already_stocked = sa.select(units.c.donation_record_id)
+
+    rows = []
+    now = datetime.utcnow()
+    for record in op.get_bind().execute(
+            sa.select(donations).where(donations.c.id.not_in(already_stocked))):
+        collection_date = record.donation_date.date()
+        expiry_date = collection_date + timedelta(days=35)
+        rows.extend({
+            'donation_record_id': record.id,
+            'blood_group': record.blood_group,
+            'component_type': 'whole_blood',
+            'collection_date': collection_date,
+            'expiry_date': expiry_date,
+            'status': 'available' if expiry_date >= now.date() else 'expired',
+            'created_at': now
+        } for _ in range(max(1, math.ceil(record.quantity))))
+    if rows:
+        op.bulk_insert(units, rows)
+
+
+def downgrade():
+    op.drop_index('ix_blood_units_request_id', table_name='blood_units', if_exists=True)
+    op.drop_index('ix_blood_units_donation_record_id', table_name='blood_units', if_exists=True)
+    op.drop_index('ix_blood_units_blood_group_status_expiry_date', table_name='blood_units', if_exists=True)
+    op.drop_table('blood_units')
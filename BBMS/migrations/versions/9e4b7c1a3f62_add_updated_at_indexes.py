@@ -0,0 +1,26 @@
+"""Index donors and hospitals on updated_at for the activity stats
+
+Revision ID: 9e4b7c1a3f62
+Revises: d3f8a1c5e792
+Create Date: 2026-10-19 16:40:12.503114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7c1a3f62'
+down_revision = 'd3f8a1c5e792'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_donors_updated_at', 'donors', ['updated_at'], unique=False, if_not_exists=True)
+    op.create_index('ix_hospitals_updated_at', 'hospitals', ['updated_at'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_hospitals_updated_at', table_name='hospitals', if_exists=True)
+    op.drop_index('ix_donors_updated_at', table_name='donors', if_exists=True)
@@ -0,0 +1,36 @@
+"""Track sent appointment reminders and re-eligibility notices
+
+Revision ID: a8d4c2f7e153
+Revises: f5b3c8d2a917
+Create Date: 2026-10-19 21:12:47.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4c2f7e153'
+down_revision = 'f5b3c8d2a917'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return [column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)]
+
+
+def upgrade():
+    if 'reminder_sent_at' not in _columns('donation_appointments'):
+        op.add_column('donation_appointments', sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+    if 'eligibility_notified_on' not in _columns('donors'):
+        op.add_column('donors', sa.Column('eligibility_notified_on', sa.Date(), nullable=True))
+    op.create_index('ix_donors_last_donation_date', 'donors', ['last_donation_date'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_donors_last_donation_date', table_name='donors', if_exists=True)
+    with op.batch_alter_table('donors') as batch_op:
+        batch_op.drop_column('eligibility_notified_on')
+    with op.batch_alter_table('donation_appointments') as batch_op:
+        batch_op.drop_column('reminder_sent_at')
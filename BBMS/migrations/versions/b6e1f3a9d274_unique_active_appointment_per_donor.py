@@ -0,0 +1,55 @@
+"""Allow one active appointment per donor
+
+Revision ID: b6e1f3a9d274
+Revises: a8d4c2f7e153
+Create Date: 2026-10-19 22:04:13.582716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1f3a9d274'
+down_revision = 'a8d4c2f7e153'
+branch_labels = None
+depends_on = None
+
+ACTIVE = "status IN ('pending', 'confirmed')"
+
+
+def upgrade():
+    appointments = sa.table('donation_appointments',
+                            sa.column('id', sa.Integer),
+                            sa.column('donor_id', sa.Integer),
+                            sa.column('slot_id', sa.Integer),
+                            sa.column('status', sa.String))
+    slots = sa.table('donation_slots', sa.column('id', sa.Integer), sa.column('booked', sa.Integer))
+
+    # Keep each donor's confirmed (else earliest) active booking and cancel
+    # the rest, giving back their slot places
+    kept = appointments.alias('kept')
+    def rank(table):
+        return sa.case((table.c.status == 'confirmed', 0), else_=1)
+    duplicates = op.get_bind().execute(
+        sa.select(appointments.c.id, appointments.c.slot_id).where(
+            appointments.c.status.in_(['pending', 'confirmed']),
+            sa.exists().where(kept.c.donor_id == appointments.c.donor_id,
+                              kept.c.status.in_(['pending', 'confirmed']),
+                              sa.tuple_(rank(kept), kept.c.id) < sa.tuple_(rank(appointments), appointments.c.id))
+        )
+    ).all()
+    for _, slot_id in duplicates:
+        if slot_id:
+            op.execute(slots.update().where(slots.c.id == slot_id, slots.c.booked > 0)
+                       .values(booked=slots.c.booked - 1))
+    if duplicates:
+        op.execute(appointments.update().where(appointments.c.id.in_([row[0] for row in duplicates]))
+                   .values(status='cancelled'))
+
+    op.create_index('ix_donation_appointments_donor_id_active', 'donation_appointments', ['donor_id'], unique=True,
+                    sqlite_where=sa.text(ACTIVE), postgresql_where=sa.text(ACTIVE), if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_donation_appointments_donor_id_active', table_name='donation_appointments', if_exists=True)
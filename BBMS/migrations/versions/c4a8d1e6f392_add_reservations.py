@@ -0,0 +1,73 @@
+"""Add reservations table and inventory version column
+
+Revision ID: c4a8d1e6f392
+Revises: 7b1f4e9c2d58
+Create Date: 2026-10-19 16:31:47.218553
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8d1e6f392'
+down_revision = '7b1f4e9c2d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.Integer(), nullable=False),
+    sa.Column('blood_group', sa.String(length=5), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['request_id'], ['blood_transfusion_requests.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_reservations_request_id', 'reservations', ['request_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_reservations_blood_group_status', 'reservations', ['blood_group', 'status'], unique=False, if_not_exists=True)
+
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('blood_inventory')]
+    if 'version' not in columns:
+        op.add_column('blood_inventory', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # Seed inventory counters from the per-bag stock
+    units = sa.table('blood_units',
+        sa.column('blood_group', sa.String), sa.column('status', sa.String), sa.column('expiry_date', sa.Date))
+    inventory = sa.table('blood_inventory',
+        sa.column('blood_group', sa.String), sa.column('total_units', sa.Float),
+        sa.column('available_units', sa.Float), sa.column('reserved_units', sa.Float),
+        sa.column('version', sa.Integer), sa.column('last_updated', sa.DateTime))
+    connection = op.get_bind()
+    counts = connection.execute(
+        sa.select(
+            units.c.blood_group,
+            sa.func.sum(sa.case((sa.and_(units.c.status == 'available', units.c.expiry_date >= date.today()), 1), else_=0)),
+            sa.func.sum(sa.case((units.c.status == 'allocated', 1), else_=0))
+        ).group_by(units.c.blood_group)
+    ).all()
+    existing = set(connection.execute(sa.select(inventory.c.blood_group)).scalars())
+    for blood_group, available, reserved in counts:
+        values = {
+            'total_units': available + reserved,
+            'available_units': available,
+            'reserved_units': reserved,
+            'last_updated': datetime.utcnow()
+        }
+        if blood_group in existing:
+            connection.execute(inventory.update().where(inventory.c.blood_group == blood_group).values(values))
+        else:
+            connection.execute(inventory.insert().values(blood_group=blood_group, version=1, **values))
+
+
+def downgrade():
+    with op.batch_alter_table('blood_inventory') as batch_op:
+        batch_op.drop_column('version')
+    op.drop_index('ix_reservations_blood_group_status', table_name='reservations', if_exists=True)
+    op.drop_index('ix_reservations_request_id', table_name='reservations', if_exists=True)
+    op.drop_table('reservations')
@@ -0,0 +1,38 @@
+"""Add content-addressed stored files
+
+Revision ID: d3f8a1c5e792
+Revises: b6e1f3a9d274
+Create Date: 2026-10-19 23:18:47.206513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a1c5e792'
+down_revision = 'b6e1f3a9d274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('extension', sa.String(length=10), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_stored_files_sha256', 'stored_files', ['sha256'], unique=True, if_not_exists=True)
+    op.create_index('ix_stored_files_ref_count_updated_at', 'stored_files', ['ref_count', 'updated_at'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_stored_files_ref_count_updated_at', table_name='stored_files', if_exists=True)
+    op.drop_index('ix_stored_files_sha256', table_name='stored_files', if_exists=True)
+    op.drop_table('stored_files')
@@ -0,0 +1,85 @@
+"""Add shortage_counters table
+
+Revision ID: e2f7a9b4c6d1
+Revises: c4a8d1e6f392
+Create Date: 2026-10-19 18:12:09.734120
+
+"""
+from datetime import date, datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7a9b4c6d1'
+down_revision = 'c4a8d1e6f392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shortage_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('blood_group', sa.String(length=5), nullable=False),
+    sa.Column('city', sa.String(length=100), nullable=False),
+    sa.Column('supply_units', sa.Float(), nullable=False),
+    sa.Column('demand_units', sa.Float(), nullable=False),
+    sa.Column('alert_active', sa.Boolean(), nullable=False),
+    sa.Column('last_alert_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('blood_group', 'city', name='uq_shortage_counters_blood_group_city'),
+    if_not_exists=True
+    )
+
+    # Seed the counters once; afterwards they are maintained incrementally
+    hospitals = sa.table('hospitals', sa.column('id', sa.Integer), sa.column('city', sa.String))
+    appointments = sa.table('donation_appointments', sa.column('id', sa.Integer), sa.column('hospital_id', sa.Integer))
+    records = sa.table('blood_donation_records', sa.column('id', sa.Integer), sa.column('appointment_id', sa.Integer))
+    units = sa.table('blood_units',
+        sa.column('donation_record_id', sa.Integer), sa.column('blood_group', sa.String),
+        sa.column('status', sa.String), sa.column('expiry_date', sa.Date))
+    requests = sa.table('blood_transfusion_requests',
+        sa.column('hospital_id', sa.Integer), sa.column('blood_group', sa.String),
+        sa.column('quantity', sa.Float), sa.column('status', sa.String))
+    counters = sa.table('shortage_counters',
+        sa.column('blood_group', sa.String), sa.column('city', sa.String),
+        sa.column('supply_units', sa.Float), sa.column('demand_units', sa.Float),
+        sa.column('alert_active', sa.Boolean), sa.column('updated_at', sa.DateTime))
+
+    connection = op.get_bind()
+    totals = {}
+    supply = connection.execute(
+        sa.select(units.c.blood_group, hospitals.c.city, sa.func.count())
+        .select_from(units.join(records, units.c.donation_record_id == records.c.id)
+                     .join(appointments, records.c.appointment_id == appointments.c.id)
+                     .join(hospitals, appointments.c.hospital_id == hospitals.c.id))
+        .where(units.c.status == 'available', units.c.expiry_date >= date.today())
+        .group_by(units.c.blood_group, hospitals.c.city)
+    )
+    for blood_group, city, count in supply:
+        totals[(blood_group, city)] = [float(count), 0.0]
+    demand = connection.execute(
+        sa.select(requests.c.blood_group, hospitals.c.city, sa.func.sum(requests.c.quantity))
+        .select_from(requests.join(hospitals, requests.c.hospital_id == hospitals.c.id))
+        .where(requests.c.status == 'pending')
+        .group_by(requests.c.blood_group, hospitals.c.city)
+    )
+    for blood_group, city, quantity in demand:
+        totals.setdefault((blood_group, city), [0.0, 0.0])[1] = float(quantity)
+
+    existing = set(connection.execute(sa.select(counters.c.blood_group, counters.c.city)).tuples())
+    rows = [{
+        'blood_group': blood_group,
+        'city': city,
+        'supply_units': supply_units,
+        'demand_units': demand_units,
+        'alert_active': False,
+        'updated_at': datetime.utcnow()
+    } for (blood_group, city), (supply_units, demand_units) in totals.items() if (blood_group, city) not in existing]
+    if rows:
+        op.bulk_insert(counters, rows)
+
+
+def downgrade():
+    op.drop_table('shortage_counters')
@@ -0,0 +1,48 @@
+"""Add donation slots with capacity
+
+Revision ID: f5b3c8d2a917
+Revises: e2f7a9b4c6d1
+Create Date: 2026-10-19 19:40:26.502871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b3c8d2a917'
+down_revision = 'e2f7a9b4c6d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('donation_slots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('hospital_id', sa.Integer(), nullable=False),
+    sa.Column('slot_start', sa.DateTime(), nullable=False),
+    sa.Column('slot_end', sa.DateTime(), nullable=False),
+    sa.Column('capacity', sa.Integer(), nullable=False),
+    sa.Column('booked', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('booked >= 0 AND booked <= capacity', name='ck_donation_slots_booked'),
+    sa.ForeignKeyConstraint(['hospital_id'], ['hospitals.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_donation_slots_hospital_id_slot_start', 'donation_slots', ['hospital_id', 'slot_start'], unique=True, if_not_exists=True)
+
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('donation_appointments')]
+    if 'slot_id' not in columns:
+        with op.batch_alter_table('donation_appointments') as batch_op:
+            batch_op.add_column(sa.Column('slot_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_donation_appointments_slot_id', 'donation_slots', ['slot_id'], ['id'])
+    op.create_index('ix_donation_appointments_slot_id', 'donation_appointments', ['slot_id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_donation_appointments_slot_id', table_name='donation_appointments', if_exists=True)
+    with op.batch_alter_table('donation_appointments') as batch_op:
+        batch_op.drop_column('slot_id')
+    op.drop_index('ix_donation_slots_hospital_id_slot_start', table_name='donation_slots', if_exists=True)
+    op.drop_table('donation_slots')
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+
+# Configure before the app reads its environment (load_dotenv never overrides these)
+_instance = tempfile.mkdtemp(prefix='bbms-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_instance, 'test.db')}",
+    'ADMIN_EMAIL': 'admin@test.invalid',
+    'ADMIN_PASSWORD': 'admin-password',
+    'CACHE_DIR': os.path.join(_instance, 'cache'),
+    'UPLOAD_FOLDER': os.path.join(_instance, 'uploads'),
+    'STORAGE_FOLDER': os.path.join(_instance, 'storage'),
+    'TEMPLATE_BYTECODE_CACHE': '',
+    'TEMPLATE_WARMUP': 'False',
+    'SLOW_QUERY_LOG': '',
+    'REMINDER_INTERVAL_MINUTES': '0',
+    'STORAGE_SWEEP_INTERVAL_MINUTES': '0',
+    'EXPIRY_SWEEP_INTERVAL_MINUTES': '0',
+    'PHOTO_PROCESSING_ASYNC': 'False',
+    # Fail on lazy loads in templates and on @query_budget overruns
+    'SQLALCHEMY_RAISE_ON_LAZY': 'True',
+    'QUERY_BUDGET_ENFORCE': 'True'
+})
+
+from app import create_app, db  # noqa: E402
+
+@pytest.fixture(scope='session')
+def app():
+    """The app on a fresh database, bootstrapped as in a deploy
+
+    `flask bootstrap` runs in its own process, so the app under test boots
+    exactly like a worker: without the imports the bootstrap code makes.
+    """
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'run', 'bootstrap'], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True)
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    """Create a verified user with password ``password``, plus their donor or hospital profile
+
+    Returns ``user_id``, ``email`` and ``profile_id`` (the donor/hospital id).
+    """
+    from app.models.donor import Donor
+    from app.models.hospital import Hospital
+    from app.models.user import User
+
+    created = []
+
+    def make(role='donor', city='Pune', blood_group='O+', **fields):
+        with app.app_context():
+            user = User(name=fields.pop('name', f'Test {role}'),
+                        email=fields.pop('email', f'{role}{len(created)}-{os.urandom(4).hex()}@test.invalid'),
+                        role=role, is_verified=True)
+            user.set_password('password')
+            db.session.add(user)
+            db.session.flush()
+            profile = None
+            if role == 'donor':
+                profile = Donor(user_id=user.id, blood_group=blood_group, city=city, **fields)
+            elif role == 'hospital':
+                profile = Hospital(user_id=user.id, phone='1', address='MG Road', city=city, is_verified=True, **fields)
+            if profile is not None:
+                db.session.add(profile)
+                db.session.flush()
+            db.session.commit()
+            created.append(user.id)
+            return SimpleNamespace(user_id=user.id, email=user.email, profile_id=profile.id if profile else None)
+
+    return make
+
+@pytest.fixture
+def busy_donor_and_hospital(app, make_user):
+    """A donor and a hospital with enough history that an N+1 query would blow the budgets"""
+    from app.models.common import BloodTransfusionRequest, DonationAppointment, Recipient
+
+    donor = make_user('donor')
+    hospital = make_user('hospital')
+    others = [make_user('donor') for _ in range(3)]
+    with app.app_context():
+        recipient = Recipient(hospital_id=hospital.profile_id, name='Asha Rao', blood_group='O+')
+        db.session.add(recipient)
+        db.session.flush()
+        now = datetime.now()
+        for i, status in enumerate(['completed', 'cancelled', 'completed', 'pending']):
+            db.session.add(DonationAppointment(donor_id=donor.profile_id, hospital_id=hospital.profile_id,
+                                               status=status, appointment_date=now + timedelta(days=(i - 3) * 60)))
+        for other in others:
+            db.session.add(DonationAppointment(donor_id=other.profile_id, hospital_id=hospital.profile_id,
+                                               status='confirmed', appointment_date=now + timedelta(days=2)))
+        for status in ['pending', 'approved', 'rejected']:
+            db.session.add(BloodTransfusionRequest(hospital_id=hospital.profile_id, recipient_id=recipient.id,
+                                                   blood_group='O+', quantity=2, status=status))
+        db.session.commit()
+    return donor, hospital
+
+def login(client, email, password='password'):
+    return client.post('/login', data={'email': email, 'password': password})
@@ -0,0 +1,69 @@
+from datetime import date, time, timedelta
+import pytest
+from app import db
+from app.models.common import DonationAppointment, DonationSlot
+from app.models.donor import Donor
+from app.utils import workflows
+from app.utils.slots import generate_slots
+from tests.conftest import login
+
+@pytest.fixture
+def booked_slot(app, make_user):
+    """A capacity-2 slot with two pending bookings; returns (slot_id, [appointment_ids])"""
+    hospital = make_user('hospital')
+    donors = [make_user('donor') for _ in range(2)]
+    with app.app_context():
+        slot = generate_slots(hospital.profile_id, date.today() + timedelta(days=2), time(9), time(9), 30, 2)[0]
+        db.session.commit()
+        appointment_ids = [workflows.book_appointment(db.session.get(Donor, donor.profile_id),
+                                                      hospital.profile_id, slot.slot_start).id
+                           for donor in donors]
+        return slot.id, appointment_ids
+
+def _cancel_elsewhere(appointment_id, slot_id):
+    """What a concurrent cancel commits, behind this session's back"""
+    with db.engine.begin() as connection:
+        connection.execute(db.update(DonationAppointment).where(DonationAppointment.id == appointment_id)
+                           .values(status='cancelled'))
+        connection.execute(db.update(DonationSlot).where(DonationSlot.id == slot_id)
+                           .values(booked=DonationSlot.booked - 1))
+
+def _booked(slot_id):
+    db.session.expire_all()
+    return db.session.get(DonationSlot, slot_id).booked
+
+def test_second_cancel_does_not_release_the_slot_again(app, booked_slot):
+    slot_id, (first, second) = booked_slot
+    with app.app_context():
+        stale = db.session.get(DonationAppointment, first)
+        assert stale.status == 'pending'
+        _cancel_elsewhere(first, slot_id)
+
+        with pytest.raises(workflows.InvalidStatusError):
+            workflows.cancel_appointment(stale, 'donor')
+        assert _booked(slot_id) == 1
+
+        workflows.cancel_appointment(db.session.get(DonationAppointment, second), 'hospital')
+        assert _booked(slot_id) == 0
+
+def test_cancelled_appointment_is_not_confirmed(app, booked_slot):
+    slot_id, (first, _) = booked_slot
+    with app.app_context():
+        stale = db.session.get(DonationAppointment, first)
+        _cancel_elsewhere(first, slot_id)
+
+        with pytest.raises(workflows.InvalidStatusError):
+            workflows.confirm_appointment(stale)
+        db.session.expire_all()
+        assert db.session.get(DonationAppointment, first).status == 'cancelled'
+
+@pytest.mark.parametrize('hospital_id', ['abc', '1.5', '999999'])
+def test_booking_rejects_a_tampered_hospital_id(client, make_user, hospital_id):
+    login(client, make_user('donor').email)
+    response = client.post('/donor/book-appointment', data={
+        'hospital_id': hospital_id,
+        'appointment_date': (date.today() + timedelta(days=3)).isoformat(),
+        'appointment_time': '10:00'
+    })
+    assert response.status_code == 200
+    assert b'Please choose a hospital from the list.' in response.data
@@ -0,0 +1,28 @@
+from app.models.user import User
+from tests.conftest import login
+
+def test_bootstrap_is_idempotent(app):
+    from app.utils.bootstrap import create_schema, seed_admin
+
+    with app.app_context():
+        assert create_schema() == []
+        assert seed_admin() is False
+        admin = User.query.filter_by(email='admin@test.invalid').one()
+        assert admin.admin is not None
+
+def test_admin_logs_in(client):
+    response = login(client, 'admin@test.invalid', 'admin-password')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/admin/dashboard')
+
+def test_donor_logs_in_and_sees_dashboard(client, make_user):
+    email = make_user('donor').email
+    response = login(client, email)
+    assert response.status_code == 302
+    assert client.get(response.headers['Location']).status_code == 200
+
+def test_wrong_password_is_rejected(client, make_user):
+    email = make_user('donor').email
+    response = login(client, email, 'not-the-password')
+    assert response.status_code == 200
+    assert b'Invalid email or password' in response.data
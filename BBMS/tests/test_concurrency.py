@@ -0,0 +1,17 @@
+"""The ``flask stress-*`` checks at CI size: real processes racing on the test database"""
+from app.utils.benchmarks import stress_duplicate_booking, stress_reservations, stress_slot_booking
+
+def test_concurrent_approvals_never_over_allocate(app):
+    result = stress_reservations(app, approvers=4, stock=6, requests_per_approver=3)
+    assert not result['over_allocated'], result
+    assert result['approved'] + result['conflicts'] + result['insufficient'] == result['requests']
+    assert result['approved'] <= 6
+
+def test_concurrent_bookings_never_overfill_a_slot(app):
+    result = stress_slot_booking(app, donors=8, capacity=3)
+    assert not result['overbooked'], result
+    assert result['booked'] <= 3
+
+def test_parallel_submissions_leave_one_booking(app):
+    result = stress_duplicate_booking(app, submissions=6)
+    assert result['booked'] == 1 and result['active'] == 1, result
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.common import DonationAppointment
+from app.models.user import User
+from app.utils.cache import get_cache
+from app.utils.fragments import ALL_OWNERS, _version_key
+from tests.conftest import login
+
+def _global_version(app):
+    with app.app_context():
+        return get_cache().get(_version_key(ALL_OWNERS))
+
+def _update_user(app, user_id, **fields):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for name, value in fields.items():
+            if name == 'password':
+                user.set_password(value)
+            else:
+                setattr(user, name, value)
+        db.session.commit()
+
+def test_renamed_hospital_shows_on_cached_donor_dashboard(app, client, make_user):
+    donor = make_user('donor')
+    hospital = make_user('hospital', name='Old Name Hospital')
+    with app.app_context():
+        db.session.add(DonationAppointment(donor_id=donor.profile_id, hospital_id=hospital.profile_id,
+                                           status='pending', appointment_date=datetime.now() + timedelta(days=3)))
+        db.session.commit()
+    login(client, donor.email)
+    assert b'Old Name Hospital' in client.get('/donor/dashboard').data
+
+    _update_user(app, hospital.user_id, name='New Name Hospital')
+    page = client.get('/donor/dashboard').data
+    assert b'New Name Hospital' in page and b'Old Name Hospital' not in page
+
+def test_user_writes_that_change_no_shown_column_keep_fragments(app, make_user):
+    user_id = make_user('hospital').user_id
+    before = _global_version(app)
+    _update_user(app, user_id, password='another-password', is_verified=False)
+    assert _global_version(app) == before
@@ -0,0 +1,165 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.models.common import BloodInventory, BloodTransfusionRequest, BloodUnit, DonationAppointment, Reservation
+from app.utils import workflows
+from app.utils.inventory import InsufficientStockError, release_reservation, run_expiry_sweep
+
+@pytest.fixture
+def stock(app, make_user):
+    """``stock(blood_group, units)``: collect ``units`` bags of ``blood_group``; returns the hospital id"""
+    def collect(blood_group, units):
+        donor = make_user('donor', blood_group=blood_group)
+        hospital = make_user('hospital')
+        with app.app_context():
+            appointment = DonationAppointment(donor_id=donor.profile_id, hospital_id=hospital.profile_id,
+                                              status='confirmed', appointment_date=datetime.now())
+            db.session.add(appointment)
+            db.session.commit()
+            workflows.complete_appointment(appointment, units)
+        return hospital.profile_id
+    return collect
+
+def _request(hospital_id, blood_group, quantity):
+    blood_request = BloodTransfusionRequest(hospital_id=hospital_id, blood_group=blood_group, quantity=quantity)
+    db.session.add(blood_request)
+    db.session.commit()
+    return blood_request
+
+def _inventory(blood_group):
+    db.session.expire_all()
+    inventory = BloodInventory.query.filter_by(blood_group=blood_group).one()
+    return inventory.total_units, inventory.available_units, inventory.reserved_units
+
+def _unit_statuses(blood_group):
+    return dict(db.session.query(BloodUnit.status, db.func.count())
+                .filter(BloodUnit.blood_group == blood_group).group_by(BloodUnit.status).all())
+
+def test_fulfilled_request_uses_its_reserved_units(app, stock):
+    hospital_id = stock('A-', 5)
+    with app.app_context():
+        blood_request = _request(hospital_id, 'A-', 3)
+        workflows.approve_request(blood_request)
+        assert _inventory('A-') == (5, 2, 3)
+
+        workflows.fulfil_request(blood_request)
+        assert _inventory('A-') == (2, 2, 0)
+        assert _unit_statuses('A-') == {'available': 2, 'used': 3}
+        assert Reservation.query.filter_by(request_id=blood_request.id).one().status == 'fulfilled'
+        assert blood_request.status == 'fulfilled'
+
+def test_rejecting_an_approved_request_returns_its_units(app, stock):
+    hospital_id = stock('B-', 4)
+    with app.app_context():
+        blood_request = _request(hospital_id, 'B-', 4)
+        workflows.approve_request(blood_request)
+        assert _inventory('B-') == (4, 0, 4)
+
+        workflows.reject_request(blood_request, 'Patient transferred')
+        assert _inventory('B-') == (4, 4, 0)
+        assert _unit_statuses('B-') == {'available': 4}
+        assert Reservation.query.filter_by(request_id=blood_request.id).one().status == 'released'
+
+        # The returned units can be reserved again
+        workflows.approve_request(_request(hospital_id, 'B-', 4))
+        assert _inventory('B-') == (4, 0, 4)
+
+def test_settled_reservation_is_not_settled_twice(app, stock):
+    hospital_id = stock('AB-', 2)
+    with app.app_context():
+        blood_request = _request(hospital_id, 'AB-', 2)
+        workflows.approve_request(blood_request)
+        workflows.fulfil_request(blood_request)
+        assert release_reservation(blood_request) == 0
+        db.session.commit()
+        assert _inventory('AB-') == (0, 0, 0)
+
+def _expire(blood_group, count):
+    ids = [unit.id for unit in BloodUnit.query.filter_by(blood_group=blood_group).limit(count)]
+    BloodUnit.query.filter(BloodUnit.id.in_(ids)).update({'expiry_date': date.today() - timedelta(days=1)})
+    db.session.commit()
+
+def test_approval_ignores_expired_units(app, stock):
+    hospital_id = stock('O-', 3)
+    with app.app_context():
+        _expire('O-', 2)
+        with pytest.raises(InsufficientStockError):
+            workflows.approve_request(_request(hospital_id, 'O-', 2))
+        workflows.approve_request(_request(hospital_id, 'O-', 1))
+        assert _inventory('O-') == (1, 0, 1)
+        assert _unit_statuses('O-') == {'allocated': 1, 'expired': 2}
+
+def test_expiry_sweep_lowers_the_counters(app, stock):
+    stock('A+', 4)
+    with app.app_context():
+        before = _inventory('A+')
+        _expire('A+', 3)
+        assert run_expiry_sweep() >= 3
+        total, available, reserved = _inventory('A+')
+        assert (before[0] - total, before[1] - available) == (3, 3)
+        assert run_expiry_sweep() == 0
+
+def _set_status_elsewhere(blood_request, status):
+    """Change the status the way another worker would, behind this session's back"""
+    with db.engine.begin() as connection:
+        connection.execute(db.update(BloodTransfusionRequest).where(BloodTransfusionRequest.id == blood_request.id)
+                           .values(status=status))
+
+def test_workflow_rechecks_a_stale_status(app, stock):
+    hospital_id = stock('B+', 3)
+    with app.app_context():
+        blood_request = _request(hospital_id, 'B+', 2)
+        before = _inventory('B+')
+        blood_request = db.session.get(BloodTransfusionRequest, blood_request.id)
+        _set_status_elsewhere(blood_request, 'rejected')
+        assert blood_request.status == 'pending'  # stale copy
+
+        with pytest.raises(workflows.InvalidStatusError):
+            workflows.approve_request(blood_request)
+        assert _inventory('B+') == before
+        assert Reservation.query.filter_by(request_id=blood_request.id).count() == 0
+
+def test_retry_rechecks_the_status(app, stock, monkeypatch):
+    hospital_id = stock('AB+', 3)
+    with app.app_context():
+        blood_request = _request(hospital_id, 'AB+', 2)
+        before = _inventory('AB+')
+        expire_units = workflows.expire_units
+
+        def lose_the_race(blood_group):
+            # Another worker rejects the request and this attempt's write conflicts
+            monkeypatch.setattr(workflows, 'expire_units', expire_units)
+            _set_status_elsewhere(blood_request, 'rejected')
+            raise StaleDataError('version mismatch')
+
+        monkeypatch.setattr(workflows, 'expire_units', lose_the_race)
+        with pytest.raises(workflows.InvalidStatusError):
+            workflows.approve_request(blood_request)
+        assert _inventory('AB+') == before
+
+def test_inventory_row_created_concurrently_is_reused(app, monkeypatch):
+    from types import SimpleNamespace
+    from app.utils.inventory import get_inventory
+
+    with app.app_context():
+        # Another worker creates the row after this one looked for it
+        with db.engine.begin() as connection:
+            connection.execute(db.insert(BloodInventory).values(blood_group='RACE', total_units=0,
+                                                                available_units=0, reserved_units=0, version=1))
+        query = BloodInventory.query
+        misses = []
+
+        def filter_by(**criteria):
+            if not misses:
+                misses.append(criteria)
+                return SimpleNamespace(first=lambda: None)
+            return query.filter_by(**criteria)
+
+        monkeypatch.setattr(BloodInventory, 'query', SimpleNamespace(filter_by=filter_by))
+        inventory = get_inventory('RACE')
+        monkeypatch.undo()
+        inventory.available_units += 1
+        db.session.commit()
+        assert BloodInventory.query.filter_by(blood_group='RACE').count() == 1
+        assert inventory.version == 2
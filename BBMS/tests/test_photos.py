@@ -0,0 +1,71 @@
+import io
+import os
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app import db
+from app.utils.photos import photo_folder, process_donor_photo, variant_filename
+from app.utils.storage import blob_path, move_public_uploads, store_upload
+from tests.conftest import login
+
+def _jpeg(color=(200, 30, 30)):
+    stream = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(stream, 'JPEG')
+    stream.seek(0)
+    return FileStorage(stream, filename='me.jpg')
+
+def _files_under(folder):
+    return {filename for _, _, filenames in os.walk(folder) for filename in filenames}
+
+def test_photos_are_stored_privately_and_served_to_signed_in_users(app, client, make_user):
+    donor = make_user('donor')
+    with app.app_context():
+        sha256, path = store_upload(_jpeg())
+        db.session.commit()
+        assert process_donor_photo(app, donor.profile_id, sha256, path) == sha256
+        stored = _files_under(app.config['STORAGE_FOLDER'])
+        public = _files_under(app.static_folder)
+        assert os.path.basename(blob_path(sha256, '.jpg')) in stored
+        assert not {name for name in public if name.startswith(sha256)}
+
+    url = f"/photos/{variant_filename(sha256, 'small', 'jpg')}"
+    assert client.get(url).status_code == 302
+    login(client, donor.email)
+    assert client.get(url).status_code == 200
+
+def test_move_public_uploads(app):
+    with app.app_context():
+        legacy = os.path.join(app.config['UPLOAD_FOLDER'], 'photos')
+        os.makedirs(legacy, exist_ok=True)
+        with open(os.path.join(legacy, 'moved_thumb.jpg'), 'wb') as stream:
+            stream.write(b'jpeg')
+        assert move_public_uploads() == 1
+        assert not os.path.exists(legacy)
+        assert os.path.exists(os.path.join(photo_folder(), 'moved_thumb.jpg'))
+
+def test_sweeper_removes_files_before_the_row_delete_commits(app, monkeypatch):
+    from datetime import datetime, timedelta
+    from app.models.common import StoredFile
+    from app.utils import photos
+    from app.utils.storage import sweep_unreferenced_files
+
+    seen = []
+    remove_photo = photos.remove_photo
+
+    def check_row_still_committed(photo):
+        # Another connection (an upload of the same bytes) must still find the row
+        with db.engine.connect() as connection:
+            seen.append(connection.execute(db.select(StoredFile.sha256).where(StoredFile.sha256 == photo)).scalar())
+        remove_photo(photo)
+
+    with app.app_context():
+        sha256, path = store_upload(_jpeg((30, 30, 200)))
+        db.session.execute(db.update(StoredFile).where(StoredFile.sha256 == sha256)
+                           .values(updated_at=datetime.utcnow() - timedelta(days=1)))
+        db.session.commit()
+
+        monkeypatch.setattr(photos, 'remove_photo', check_row_still_committed)
+        files, _ = sweep_unreferenced_files(grace_minutes=60)
+        assert files >= 1
+        assert sha256 in seen
+        assert not os.path.exists(path)
+        assert db.session.get(StoredFile, sha256) is None
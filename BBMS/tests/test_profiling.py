@@ -0,0 +1,110 @@
+import json
+import logging
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.utils.profiling import build_query_report, fingerprint_statement, get_query_stats, normalize_statement
+from tests.conftest import login
+
+def test_failed_statement_does_not_skew_the_next_timing(app):
+    with app.test_request_context():
+        with pytest.raises(OperationalError):
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        time.sleep(0.2)
+        db.session.execute(text('SELECT 1'))
+        stats = get_query_stats()
+        assert stats['count'] == 1
+        assert stats['total_time'] < 0.1
+
+def test_request_metrics_are_logged_as_json(app, client, caplog):
+    caplog.set_level(logging.INFO, logger=app.logger.name)
+    client.get('/login')
+    records = [json.loads(record.getMessage()) for record in caplog.records
+               if getattr(record, 'request_metrics', None)]
+    assert records[-1]['endpoint'] == 'auth.login'
+    assert records[-1]['status'] == 200
+    assert {'queries', 'db_ms', 'total_ms', 'slowest'} <= records[-1].keys()
+
+@pytest.mark.parametrize('role, paths', [
+    ('donor', ['/donor/dashboard', '/donor/appointments', '/donor/appointments?status=all', '/donor/donations']),
+    ('hospital', ['/hospital/dashboard', '/hospital/appointments', '/hospital/appointments?status=all'])
+])
+def test_pages_stay_within_query_budget_without_lazy_loads(app, client, busy_donor_and_hospital, role, paths):
+    # QUERY_BUDGET_ENFORCE and SQLALCHEMY_RAISE_ON_LAZY are on (see conftest), so either failure raises
+    donor, hospital = busy_donor_and_hospital
+    login(client, donor.email if role == 'donor' else hospital.email)
+    for path in paths:
+        assert client.get(path).status_code == 200, path
+
+@pytest.mark.parametrize('statement, normalized', [
+    ("SELECT *\n  FROM users WHERE name = 'O''Brien' AND id = 42 AND score > 3.5",
+     "SELECT * FROM users WHERE name = ? AND id = ? AND score > ?"),
+    ("SELECT users_1.id FROM users AS users_1 WHERE users_1.id = :id_1 OR email = %(email)s OR role = $2",
+     "SELECT users_1.id FROM users AS users_1 WHERE users_1.id = ? OR email = ? OR role = ?"),
+    ("SELECT id FROM donors WHERE id IN (?, ?, ?)", "SELECT id FROM donors WHERE id IN (?+)"),
+    ("SELECT id FROM donors WHERE id IN (1,2) AND city IN ('Pune')",
+     "SELECT id FROM donors WHERE id IN (?+) AND city IN (?+)")
+])
+def test_normalize_statement(statement, normalized):
+    assert normalize_statement(statement) == normalized
+
+def test_in_lists_of_any_length_share_a_fingerprint():
+    short = normalize_statement("SELECT id FROM donors WHERE id IN (?)")
+    long = normalize_statement("SELECT id FROM donors WHERE id IN (?, ?, ?, ?)")
+    assert fingerprint_statement(short) == fingerprint_statement(long)
+
+def _log_line(statement, duration_ms, endpoint):
+    normalized = normalize_statement(statement)
+    return json.dumps({'endpoint': endpoint, 'duration_ms': duration_ms, 'statement': normalized,
+                       'fingerprint': fingerprint_statement(normalized)})
+
+@pytest.fixture
+def slow_log():
+    # Many fast donor lookups, a few slow exports and one unparseable line
+    lines = [_log_line(f"SELECT * FROM donors WHERE id = {i}", 10, 'donor.dashboard') for i in range(1, 21)]
+    lines += [_log_line("SELECT * FROM blood_units", duration, endpoint)
+              for duration, endpoint in [(150, 'admin.export_data'), (90, 'admin.export_data'), (60, 'cli')]]
+    lines.append('not json')
+    return lines
+
+def test_query_report_groups_by_fingerprint(slow_log):
+    report = {row['statement']: row for row in build_query_report(slow_log)}
+    assert len(report) == 2
+    donors = report['SELECT * FROM donors WHERE id = ?']
+    assert (donors['count'], donors['total_ms'], donors['mean_ms'], donors['p95_ms']) == (20, 200, 10, 10)
+    assert donors['endpoints'] == {'donor.dashboard': 20}
+    units = report['SELECT * FROM blood_units']
+    assert (units['count'], units['total_ms'], units['mean_ms'], units['p95_ms']) == (3, 300, 100, 150)
+    assert units['endpoints'] == {'admin.export_data': 2, 'cli': 1}
+
+@pytest.mark.parametrize('sort_by, first', [('total', 'blood_units'), ('count', 'donors'), ('p95', 'blood_units')])
+def test_query_report_ordering(slow_log, sort_by, first):
+    report = build_query_report(slow_log, sort_by=sort_by)
+    assert first in report[0]['statement']
+
+def test_query_report_keeps_the_top_rows(slow_log):
+    report = build_query_report(slow_log, sort_by='count', top=1)
+    assert len(report) == 1 and report[0]['count'] == 20
+
+def test_query_report_command(app, slow_log, tmp_path):
+    log_path = tmp_path / 'slow_queries.log'
+    log_path.write_text('\n'.join(slow_log) + '\n')
+    result = app.test_cli_runner().invoke(args=['query-report', '--log', str(log_path), '--sort', 'count'])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert lines[0].startswith('fingerprint')
+    assert lines[1].split()[1] == '20' and 'donor.dashboard (20)' in lines[1]
+    assert lines[2].strip() == 'SELECT * FROM donors WHERE id = ?'
+
+def test_executions_without_a_context_are_timed(app):
+    from app.utils.profiling import _after_cursor_execute, _before_cursor_execute
+
+    with app.test_request_context(), db.engine.connect() as connection:
+        statement = 'SELECT 1'
+        _before_cursor_execute(connection, None, statement, (), None, False)
+        _after_cursor_execute(connection, None, statement, (), None, False)
+        connection.exec_driver_sql(statement)
+        assert get_query_stats()['count'] == 2
@@ -0,0 +1,39 @@
+import pytest
+from app import db
+from app.utils.query_plans import capture_statements, check_query_plans, explain_statements
+from tests.conftest import login
+
+ROUTES = {
+    'donor': ['/donor/dashboard', '/donor/appointments', '/donor/appointments?status=all', '/donor/donations',
+              '/donor/notifications', '/api/notifications/unread-count',
+              '/api/notifications/recent', '/api/cities', '/api/hospitals/Pune', '/api/search/cities?q=Pu',
+              '/api/hospitals/{hospital_id}/slots'],
+    'hospital': ['/hospital/dashboard', '/hospital/appointments', '/hospital/appointments?status=all',
+                 '/hospital/notifications'],
+    'admin': ['/api/stats/inventory', '/api/stats/requests', '/api/stats/donations', '/api/stats/city-stats',
+              '/api/stats/user-activity', '/api/stats/forecast', '/admin/search?q=Pu']
+}
+
+@pytest.mark.parametrize('role', ROUTES)
+def test_hot_routes_do_not_scan_tables(app, client, busy_donor_and_hospital, role):
+    donor, hospital = busy_donor_and_hospital
+    if role == 'admin':
+        login(client, 'admin@test.invalid', 'admin-password')
+    else:
+        login(client, donor.email if role == 'donor' else hospital.email)
+    with app.app_context():
+        engine = db.engine
+    # No app context around the requests: each must get its own ``g`` and query budget
+    with capture_statements(engine) as statements:
+        for path in ROUTES[role]:
+            assert client.get(path.format(hospital_id=hospital.profile_id)).status_code == 200, path
+    assert statements
+    with engine.connect() as connection:
+        scans = {result['name']: result['table_scans'] for result in explain_statements(connection, statements)
+                 if result['table_scans']}
+    assert not scans, scans
+
+def test_hot_query_list_does_not_scan_tables(app):
+    with app.app_context():
+        scans = [result for result in check_query_plans() if result['table_scans']]
+    assert not scans
@@ -0,0 +1,47 @@
+import threading
+import click
+import pytest
+from app.utils.helpers import start_periodic_job
+
+def _started(app, name, enabled, command=None, params=None, debug=False):
+    app.config['SCHEDULER_ENABLED'] = enabled
+    was_debug, app.debug = app.debug, debug
+    try:
+        if command:
+            with click.Context(click.Command(command), info_name=command) as context:
+                context.params.update(params or {})
+                start_periodic_job(app, name, 60, lambda: None)
+        else:
+            start_periodic_job(app, name, 60, lambda: None)
+    finally:
+        app.config['SCHEDULER_ENABLED'] = False
+        app.debug = was_debug
+    return any(thread.name == name for thread in threading.enumerate())
+
+def test_jobs_stay_off_unless_enabled(app):
+    assert not _started(app, 'test-job-disabled', enabled=False)
+
+def test_jobs_start_in_a_server_process_when_enabled(app):
+    assert _started(app, 'test-job-server', enabled=True)
+
+@pytest.mark.parametrize('command', ['db', 'bootstrap', 'run-reminders'])
+def test_flask_commands_never_start_jobs(app, command):
+    assert not _started(app, f'test-job-{command}', enabled=True, command=command)
+
+def test_flask_run_starts_jobs(app):
+    assert _started(app, 'test-job-flask-run', enabled=True, command='run')
+
+@pytest.mark.parametrize('reload, debug, child, started', [
+    (None, True, False, False),   # flask --debug run: the watcher process
+    (None, True, True, True),     # ... and its serving child
+    (False, True, False, True),   # flask --debug run --no-reload
+    (None, False, False, True),   # flask run
+    (True, False, False, False),  # flask run --reload: the watcher process
+])
+def test_only_the_reloader_watcher_skips_jobs(app, monkeypatch, reload, debug, child, started):
+    if child:
+        monkeypatch.setenv('WERKZEUG_RUN_MAIN', 'true')
+    else:
+        monkeypatch.delenv('WERKZEUG_RUN_MAIN', raising=False)
+    name = f'test-job-reload-{reload}-{debug}-{child}'
+    assert _started(app, name, enabled=True, command='run', params={'reload': reload}, debug=debug) == started
@@ -0,0 +1,45 @@
+import pytest
+from tests.conftest import login
+
+@pytest.mark.parametrize('limit, hits', [('-1', 1), ('0', 1), ('2', 2), ('500', 3)])
+def test_search_limit_is_clamped(client, make_user, limit, hits):
+    for _ in range(3):
+        make_user('donor', name=f'Clampton {limit}')
+    login(client, 'admin@test.invalid', 'admin-password')
+    response = client.get(f'/admin/search?q=Clampton {limit}&limit={limit}')
+    assert response.status_code == 200
+    assert len(response.get_json()['results']['donors']['hits']) == hits
+
+def test_like_fallback_is_logged_once(app, make_user, monkeypatch, caplog):
+    from app import db
+    from app.models.donor import Donor
+    from app.utils import search
+
+    make_user('donor', name='Fallbackson')
+    with app.app_context():
+        key = str(db.engine.url)
+        monkeypatch.setitem(search._fts_enabled, key, False)
+        monkeypatch.setattr(search, '_fallback_warned', set())
+        search_filter = search.search_filter('users', Donor.user_id, 'Fallbackson')
+        search.search_filter('users', Donor.user_id, 'Fallbackson')
+        assert Donor.query.filter(search_filter).count() == 1
+    warnings = [record for record in caplog.records if 'falling back to LIKE' in record.getMessage()]
+    assert len(warnings) == 1
+
+@pytest.mark.parametrize('search_query', ['@@', '%', '_', '!?'])
+def test_punctuation_query_does_not_match_everything(app, make_user, search_query):
+    from app import db
+    from app.models.donor import Donor
+    from app.utils.search import search_filter
+
+    make_user('donor', name='Plain Name')
+    with app.app_context():
+        total = Donor.query.count()
+        matched = Donor.query.filter(search_filter('users', Donor.user_id, search_query)).count()
+        assert matched < total
+
+@pytest.mark.parametrize('search_query', ['@@', '-', '%25'])
+def test_admin_search_rejects_queries_without_words(client, search_query):
+    login(client, 'admin@test.invalid', 'admin-password')
+    response = client.get(f'/admin/search?q={search_query}')
+    assert response.status_code == 400
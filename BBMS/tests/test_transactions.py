@@ -0,0 +1,35 @@
+import sqlite3
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from app.utils.transactions import ConcurrentUpdateError, is_conflict, retry_on_conflict
+
+def _operational_error(message):
+    return OperationalError('UPDATE blood_inventory ...', {}, sqlite3.OperationalError(message))
+
+def _failing(error, calls):
+    @retry_on_conflict(attempts=3, backoff=0)
+    def work():
+        calls.append(1)
+        raise error
+    return work
+
+@pytest.mark.parametrize('error', [StaleDataError('version mismatch'), _operational_error('database is locked')])
+def test_conflicts_are_retried(app, error):
+    calls = []
+    with app.app_context(), pytest.raises(ConcurrentUpdateError):
+        _failing(error, calls)()
+    assert len(calls) == 3
+
+@pytest.mark.parametrize('message', ['no such table: blood_inventory', 'disk I/O error', 'unable to open database file'])
+def test_other_database_errors_are_raised_at_once(app, message):
+    calls = []
+    with app.app_context(), pytest.raises(OperationalError):
+        _failing(_operational_error(message), calls)()
+    assert len(calls) == 1
+
+def test_postgres_serialization_failure_is_a_conflict():
+    class SerializationFailure(Exception):
+        pgcode = '40001'
+
+    assert is_conflict(OperationalError('UPDATE ...', {}, SerializationFailure('could not serialize access')))